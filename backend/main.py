@@ -1,20 +1,148 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from modules.database import init_db, init_available_dates, close_connection, _aggregate_hourly_data_for_date, calculate_average_fullness
-from routes.data import router as data_router, update_prediction
+from modules.database import init_db, init_datapoint_buffer, init_available_dates, close_connection, _aggregate_hourly_data_for_date, calculate_average_fullness, publish_latest_datapoint, sync_shared_state
+from routes.data import router as data_router, update_prediction, sync_predictions
+from routes.admin import router as admin_router
+from routes.ingest import router as ingest_router, schedule_refresh
+from modules.broadcaster import BROADCASTER
+from modules.snapshots import SNAPSHOTS, PRODUCER_LOCK, SNAPSHOT_POLL_INTERVAL
+from modules.leader import LEADER
+from data.storage import get_storage
+from data.storage.retention import RETENTION_INTERVAL, retention_loop
 from datetime import datetime
+from typing import List
+import asyncio
+import os
+import sys
+import time
+
+# Seconds between checks for a newly activated model release (0 disables the watcher)
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "60"))
+# Worker processes when started with `python main.py` (one of them produces the snapshots, see snapshots.py)
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+# Seconds between a follower replica's reads of what the leader stored (see leader.py)
+LEADER_SYNC_INTERVAL = float(os.getenv("LEADER_SYNC_INTERVAL", "30"))
+# Seconds between the producer's own checks for new datapoints, in case an ingest notification
+# never arrived (0 leaves it to the ingest hook)
+REFRESH_INTERVAL = float(os.getenv("REFRESH_INTERVAL", "60"))
+
+# Background tasks of the producer worker
+_producer_tasks: List[asyncio.Task] = []
+# Background tasks that only run while this replica is the leader
+_leader_tasks: List[asyncio.Task] = []
+
+async def start_producer():
+    """Publish the serving state for every worker, computing it if this replica leads or reading it from storage if not"""
+    BROADCASTER.on_publish = SNAPSHOTS.record_event
+    await init_datapoint_buffer()
+    if await LEADER.try_acquire():
+        print(f"Replica {LEADER.owner} is the leader")
+        # Renewing starts first, leader startup can take longer than the lease
+        _producer_tasks.append(asyncio.create_task(LEADER.run(start_leader, stop_leader)))
+        await start_leader()
+    else:
+        print(f"Replica {LEADER.owner} follows the leader")
+        await sync_shared_state()
+        await sync_predictions()
+        await publish_latest_datapoint()
+        _producer_tasks.append(asyncio.create_task(LEADER.run(start_leader, stop_leader)))
+    _producer_tasks.append(asyncio.create_task(_sync_from_leader()))
+
+async def start_leader():
+    """Load the models, run the scheduled jobs and store their results for the follower replicas"""
+    # Imported here so that the other workers never load TensorFlow
+    from data.forecasting.model_registry import MODEL_REGISTRY
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Initialize MongoDB and available dates on startup
-    await init_db()
     await update_prediction()
     await init_available_dates()
     await _aggregate_hourly_data_for_date(datetime.now().strftime("%Y-%m-%d"))
     await calculate_average_fullness()  # Calculate average fullness on startup
+    await publish_latest_datapoint()  # First event /api/stream subscribers get
+
+    if not LEADER.is_leader:
+        # Lost the lease during startup, stop_leader already ran
+        return
+    # Hot-reload new model releases; the forecast is recomputed with the new models right after the swap
+    loop = asyncio.get_running_loop()
+    if MODEL_WATCH_INTERVAL > 0:
+        MODEL_REGISTRY.start_watcher(
+            MODEL_WATCH_INTERVAL,
+            on_swap=lambda model_set: asyncio.run_coroutine_threadsafe(update_prediction(), loop)
+        )
+    # Archive and compact raw datapoints past the retention period, so the hot collection stays bounded
+    if RETENTION_INTERVAL > 0:
+        _leader_tasks.append(asyncio.create_task(retention_loop(get_storage())))
+
+async def stop_leader():
+    """Stop the scheduled jobs once another replica took over the lease"""
+    for task in _leader_tasks:
+        task.cancel()
+    _leader_tasks.clear()
+    if "data.forecasting.model_registry" in sys.modules:
+        sys.modules["data.forecasting.model_registry"].MODEL_REGISTRY.stop_watcher()
+
+async def _sync_from_leader():
+    """Keep a follower replica's snapshots up to date with what the leader stores"""
+    while True:
+        await asyncio.sleep(LEADER_SYNC_INTERVAL)
+        if LEADER.is_leader:
+            continue
+        try:
+            await sync_shared_state()
+            await sync_predictions()
+        except Exception as e:
+            print(f"Leader sync error: {e}")
+
+async def _follow_producer():
+    """
+    The producer picks up refresh requests that other workers received, and checks for new
+    datapoints every REFRESH_INTERVAL seconds on its own. The other workers relay
+    the producer's events to their own /api/stream subscribers, and take over once its lock is released.
+    """
+    last_request = SNAPSHOTS.refresh_requested_at()
+    last_refresh = time.monotonic()
+    while True:
+        try:
+            if PRODUCER_LOCK.held:
+                requested = SNAPSHOTS.refresh_requested_at()
+                due = REFRESH_INTERVAL > 0 and time.monotonic() - last_refresh >= REFRESH_INTERVAL
+                if requested != last_request or due:
+                    last_request = requested
+                    last_refresh = time.monotonic()
+                    schedule_refresh()
+            elif PRODUCER_LOCK.acquire():
+                print(f"Worker {os.getpid()} took over producing the snapshots")
+                await start_producer()
+            else:
+                for _, event, data in SNAPSHOTS.new_events():
+                    BROADCASTER.publish(event, data)
+        except Exception as e:
+            print(f"Snapshot follower error: {e}")
+        await asyncio.sleep(SNAPSHOT_POLL_INTERVAL)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Initialize MongoDB on startup, the producer worker computes everything else
+    await init_db()
+    if PRODUCER_LOCK.acquire():
+        print(f"Worker {os.getpid()} produces the snapshots")
+        await start_producer()
+    else:
+        print(f"Worker {os.getpid()} serves the snapshots of worker {PRODUCER_LOCK.holder()}")
+        # Relay the events recorded from now on, not the producer's backlog
+        SNAPSHOTS.new_events()
+    follower = asyncio.create_task(_follow_producer())
     yield
-    
+
+    follower.cancel()
+    for task in _producer_tasks:
+        task.cancel()
+    if PRODUCER_LOCK.held:
+        await stop_leader()
+        # The next replica takes over without waiting for the lease to run out
+        await LEADER.release()
+        PRODUCER_LOCK.release()
     # Close MongoDB connection on shutdown
     await close_connection()
 
@@ -36,6 +164,8 @@ app.add_middleware(
 
 # Include routers
 app.include_router(data_router) # Prefix "/api", tag "data"
+app.include_router(admin_router) # Prefix "/api/admin", tag "admin"
+app.include_router(ingest_router) # Prefix "/api/ingest", tag "ingest"
 
 @app.get("/")
 async def root():
@@ -43,4 +173,8 @@ async def root():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if API_WORKERS > 1:
+        # Workers import the app themselves
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=API_WORKERS, app_dir=os.path.dirname(os.path.abspath(__file__)))
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,107 @@
+from typing import Any, Callable, Dict, Optional, Set
+import asyncio
+import json
+import os
+
+# Events a subscriber may fall behind by before it is dropped (it reconnects and gets a fresh snapshot)
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "32"))
+# Seconds between keep-alive comments on an idle stream, so proxies don't close it
+STREAM_PING_INTERVAL = float(os.getenv("STREAM_PING_INTERVAL", "15"))
+
+
+class Subscriber:
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+
+class Broadcaster:
+    """
+    Fans server-sent events out to every subscribed /api/stream client.
+
+    Each event is encoded once and put on every subscriber's bounded queue. A subscriber
+    whose queue is full is too slow to keep up and is dropped instead of slowing down the
+    publisher or buffering without bound. The latest event of each type is kept, so a new
+    (or reconnecting) subscriber starts from the current state.
+    """
+
+    def __init__(self, queue_size: int = STREAM_QUEUE_SIZE, ping_interval: float = STREAM_PING_INTERVAL):
+        self.queue_size = queue_size
+        self.ping_interval = ping_interval
+        self._subscribers: Set[Subscriber] = set()
+        self._latest: Dict[str, str] = {}
+        self._next_id = 0
+        self._pinger: Optional[asyncio.Task] = None
+        self.dropped = 0
+        # Called with every published event, the producer worker hands them to the other workers (see snapshots.py)
+        self.on_publish: Optional[Callable[[str, Any], None]] = None
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event: str, data: Any) -> int:
+        """
+        Send an event to every subscriber. Must be called from the event loop.
+
+        Returns:
+            int: Subscribers the event was queued for
+        """
+        self._next_id += 1
+        frame = f"id: {self._next_id}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+        self._latest[event] = frame
+        if self.on_publish is not None:
+            self.on_publish(event, data)
+        return self._fan_out(frame)
+
+    def _fan_out(self, frame: str) -> int:
+        delivered = 0
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.queue.put_nowait(frame)
+                delivered += 1
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+        return delivered
+
+    def subscribe(self) -> Subscriber:
+        """New subscriber, must be called from the event loop"""
+        if self._pinger is None or self._pinger.done():
+            self._pinger = asyncio.get_running_loop().create_task(self._ping_loop())
+        subscriber = Subscriber(self.queue_size)
+        for frame in self._latest.values():
+            subscriber.queue.put_nowait(frame)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    def _drop(self, subscriber: Subscriber) -> None:
+        subscriber.dropped = True
+        self._subscribers.discard(subscriber)
+        self.dropped += 1
+        print(f"Dropped a slow stream subscriber ({len(self._subscribers)} left)")
+
+    async def _ping_loop(self) -> None:
+        # One timer for all subscribers instead of a timeout per idle stream
+        while self._subscribers:
+            await asyncio.sleep(self.ping_interval)
+            self._fan_out(": ping\n\n")
+
+    async def stream(self, subscriber: Subscriber):
+        """Server-sent event frames for one subscriber, until it is dropped or disconnects"""
+        try:
+            # Tell EventSource how long to wait before reconnecting
+            yield "retry: 5000\n\n"
+            while True:
+                frame = await subscriber.queue.get()
+                if subscriber.dropped:
+                    # Its queued events are stale by now, the reconnect starts from the latest state
+                    return
+                yield frame
+        finally:
+            self.unsubscribe(subscriber)
+
+
+# Process-wide broadcaster behind /api/stream
+BROADCASTER = Broadcaster()
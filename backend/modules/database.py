@@ -1,31 +1,39 @@
-from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, date, timedelta
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 from dotenv import load_dotenv
 import os
+import sys
 import asyncio
 from pydantic import BaseModel
-from bson import ObjectId
 import pandas as pd
 import requests
 import time
 
-load_dotenv()
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
 
-MONGO_URI = os.getenv("MONGO_URI")
-DATABASE_NAME = "sjparking"
+from data.storage import get_storage, bind_storage_loop
+from data.forecasting.datapoint_buffer import DATAPOINT_BUFFER
+from data.forecasting.time_grid import TimeGrid, rollup_values
+from modules.broadcaster import BROADCASTER
+from modules.snapshots import SNAPSHOTS, PRODUCER_LOCK, SNAPSHOT_POLL_INTERVAL
+from modules.leader import LEADER
+from modules.date_index import DateIndex
 
-# Initialize MongoDB client
-client = AsyncIOMotorClient(MONGO_URI)
-db = client[DATABASE_NAME]
+load_dotenv()
 
-collection = db["datapoints"]
-averaged_collection = db["hourly_aggregates"]
-prediction_collection = db["predictions"]
+# Storage backend (mongo, sqlite or memory), selected with the STORAGE_BACKEND env variable
+storage = get_storage()
 
-AVAILABLE_DATES = []
+# Days with rollups, kept up to date by the producer worker and published as the "dates" snapshot
+DATE_INDEX = DateIndex()
 MOST_RECENT_TIMESTAMP = None
+_refresh_lock = asyncio.Lock()
+# When this worker last asked the producer to refresh, and the newest timestamp it saw published
+_last_refresh_request = 0.0
+_seen_latest = None
 
 # Mapping of garage identifiers to their status fields
 GARAGE_MAPPING = {
@@ -72,51 +80,48 @@ async def init_db():
     try:
         global MOST_RECENT_TIMESTAMP
         
-        # Check if the time series collection exists
-        collections = await db.list_collection_names()
-        if "datapoints" not in collections:
-            # Create time series collection
-            await db.create_collection(
-                "datapoints",
-                timeseries={
-                    "timeField": "timestamp",
-                    "metaField": "metadata",
-                    "granularity": "minutes"
-                }
-            )
-            # Create index on timestamp
-            await db.datapoints.create_index([("timestamp", 1)])
+        # Create collections/tables and indexes
+        bind_storage_loop(asyncio.get_running_loop())
+        await storage.init()
         
         # Get the most recent timestamp
-        most_recent = await collection.find_one(
-            sort=[("timestamp", -1)]
-        )
+        most_recent = await storage.get_latest_timestamp()
         if most_recent:
-            MOST_RECENT_TIMESTAMP = most_recent["timestamp"]
+            MOST_RECENT_TIMESTAMP = most_recent
         
     except Exception as e:
         print(f"Error initializing database: {e}")
 
+async def init_datapoint_buffer():
+    """Fill the in-memory ring buffer of recent datapoints that forecasts read their windows from"""
+    docs = await storage.get_recent_datapoints(datetime.max, DATAPOINT_BUFFER.capacity)
+    DATAPOINT_BUFFER.fill(docs)
+    print(f"Loaded {len(DATAPOINT_BUFFER)} recent datapoints into the forecast buffer")
+
+async def _append_new_datapoints():
+    """Append datapoints stored since the newest buffered one to the ring buffer"""
+    latest = DATAPOINT_BUFFER.latest_timestamp
+    if latest is None:
+        await init_datapoint_buffer()
+        return
+    docs = await storage.get_datapoints(latest + timedelta(microseconds=1), datetime.max)
+    DATAPOINT_BUFFER.extend(docs)
+
 async def get_database():
-    """Get database connection"""
-    return db
+    """Get the storage backend"""
+    return storage
 
 async def _aggregate_till_today():
         # Get today's date
     today = datetime.now().date()
     
     # Find the most recent complete aggregated date
-    pipeline = [
-        {"$match": { "complete": True}},
-        {"$sort": {"day": -1}},
-        {"$limit": 1}]
-    
-    result = await averaged_collection.aggregate(pipeline).to_list(length=1)
+    latest_complete = await storage.get_latest_complete_day()
     
-    if not result or result[0]["day"] == today.strftime("%Y-%m-%d"):
+    if not latest_complete or latest_complete == today.strftime("%Y-%m-%d"):
         return
     
-    most_recent_complete = datetime.strptime(result[0]["day"], "%Y-%m-%d").date()
+    most_recent_complete = datetime.strptime(latest_complete, "%Y-%m-%d").date()
     
     # Generate all dates between most_recent_complete and today (inclusive)
     current_date = most_recent_complete + timedelta(days=1)
@@ -127,29 +132,80 @@ async def _aggregate_till_today():
         dates_to_aggregate.append(date_str)
         current_date += timedelta(days=1)
     
-    # Aggregate data for each missing date
-    for date_str in dates_to_aggregate:
-        await _aggregate_hourly_data_for_date(date_str)
+    # Aggregate data for the missing dates
+    await _aggregate_days(dates_to_aggregate)
+
+async def _load_date_index():
+    """Rebuild the date index from the stored rollups: one distinct query and one for the complete rollups"""
+    global DATE_INDEX
+    complete_garages = {}
+    for doc in await storage.get_complete_rollups():
+        complete_garages[doc["day"]] = complete_garages.get(doc["day"], 0) + 1
+    DATE_INDEX = DateIndex(
+        (day, complete_garages.get(day, 0) == len(GARAGE_ID_MAPPING))
+        for day in await storage.get_rollup_days()
+    )
+    SNAPSHOTS.publish("dates", DATE_INDEX.to_snapshot())
 
 async def init_available_dates():
-    global averaged_collection
-    global AVAILABLE_DATES
     await _aggregate_till_today()
-    # Update available dates
-    AVAILABLE_DATES = await averaged_collection.distinct("day")
+    await _load_date_index()
+
+# Version of the "dates" snapshot and the index built from it, on the workers that don't produce it
+_published_dates = (0, DateIndex())
+
+def _date_index() -> DateIndex:
+    global _published_dates
+    if PRODUCER_LOCK.held:
+        return DATE_INDEX
+    # Published by the producer worker (see snapshots.py), rebuilt only when it changed
+    version = SNAPSHOTS.version("dates")
+    if version != _published_dates[0]:
+        _published_dates = (version, DateIndex.from_snapshot(SNAPSHOTS.read("dates")))
+    return _published_dates[1]
+
+async def get_available_dates(
+    start: Optional[str] = None, end: Optional[str] = None, limit: Optional[int] = None
+) -> List[str]:
+    """
+    Days with data in [start, end] (either bound optional), oldest first, plus tomorrow for its forecast.
     
-    # Add tomorrow's date to available dates
+    Args:
+        start (str): First day (YYYY-MM-DD) to include
+        end (str): Last day (YYYY-MM-DD) to include
+        limit (int): Most days to return, pass the day after the last one as `start` for the next page
+        
+    Returns:
+        List[str]: Days in YYYY-MM-DD format
+    """
+    days = _date_index().days(start, end, limit)
     tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
-    if tomorrow not in AVAILABLE_DATES:
-        AVAILABLE_DATES.append(tomorrow)
+    in_range = (not start or start <= tomorrow) and (not end or tomorrow <= end)
+    if in_range and (limit is None or len(days) < limit) and (not days or days[-1] < tomorrow):
+        days.append(tomorrow)
+    return days
+
+async def get_date_status(
+    start: Optional[str] = None, end: Optional[str] = None, limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Days with data in [start, end] with whether every garage's rollup of the day is complete"""
+    return [{"date": day, "complete": complete} for day, complete in _date_index().entries(start, end, limit)]
 
-async def get_available_dates() -> List[str]:
-    return AVAILABLE_DATES
+def has_data(date_str: str) -> bool:
+    """Whether a day (YYYY-MM-DD) has rollups, without touching storage"""
+    return _date_index().has_data(date_str)
+
+def may_be_unindexed(date_str: str) -> bool:
+    """
+    Whether a day missing from the date index may still have datapoints: a day after the last
+    indexed one, up to today, whose datapoints arrived before the producer's next refresh.
+    Earlier days and future days can be rejected without asking storage.
+    """
+    latest = _date_index().latest
+    return (latest is None or date_str > latest) and date_str <= datetime.now().strftime("%Y-%m-%d")
 
 async def get_datapoint(timestamp: datetime) -> Optional[Datapoint]:
-    collection = db["datapoints"]
-    query = {"timestamp": timestamp}
-    datapoint = await collection.find_one(query)
+    datapoint = await storage.get_datapoint(timestamp)
     if datapoint:
         return Datapoint(**datapoint)
     else:
@@ -162,12 +218,17 @@ async def insert_datapoint(data: Datapoint):
     Args:
         data (Datapoint): Datapoint object containing the datapoint information
     """
-    collection = db["datapoints"]
-    await collection.insert_one(data.model_dump())
+    doc = data.model_dump()
+    await storage.insert_datapoint(doc)
+    DATAPOINT_BUFFER.extend([doc])
 
 async def close_connection():
-    """Close the MongoDB connection"""
-    client.close()
+    """Close the storage connection"""
+    await storage.close()
+
+def _day_bounds(query_date: datetime):
+    # Same window as the original Mongo queries: [00:00:00, 23:59:59)
+    return query_date, query_date.replace(hour=23, minute=59, second=59)
 
 async def get_garage_data(date: str, garage_id: str) -> List[Dict[str, Any]]:
     """
@@ -180,8 +241,6 @@ async def get_garage_data(date: str, garage_id: str) -> List[Dict[str, Any]]:
     Returns:
         List of dictionaries containing time and garage status value
     """
-    collection = db["datapoints"]
-    
     # Get the corresponding status field from the mapping
     status_field = GARAGE_MAPPING.get(garage_id.lower())
     if not status_field:
@@ -190,42 +249,65 @@ async def get_garage_data(date: str, garage_id: str) -> List[Dict[str, Any]]:
     # Convert date string to datetime object
     query_date = datetime.strptime(date, "%Y-%m-%d")
     
-    # Pipeline for MongoDB aggregation
-    # $gte: greater than or equal to
-    # $lt: less than
-    # $project: project the fields to include in the output
-    # $sort: sort the results by the time field
-    
-    pipeline = [
-        {
-            "$match": {
-                "timestamp": {
-                    "$gte": query_date,
-                    "$lt": query_date.replace(hour=23, minute=59, second=59)
-                },
-                "metadata": "sjparking"
-            }
-        },
-        {
-            "$project": {
-                "time": {
-                    "$dateToString": {
-                        "format": "%H:%M",
-                        "date": "$timestamp"
-                    }
-                },
-                "value": f"${status_field}"
-            }
-        },
-        {
-            "$sort": {"time": 1}
-        }
-    ]
-    
-    cursor = collection.aggregate(pipeline)
-    results = await cursor.to_list(length=None)
+    series = await storage.get_garage_series(*_day_bounds(query_date), status_field)
+    if not series:
+        # Days past the retention period only have hourly summaries left (see data/storage/retention.py)
+        series = [
+            {"time": doc["hour"].strftime("%H:%M"), "value": round(doc[f"{status_field}_mean"])}
+            for doc in await storage.get_compacted(*_day_bounds(query_date))
+        ]
+    return series
+
+async def _day_grid(first_day: datetime, last_day: datetime) -> TimeGrid:
+    """
+    Datapoints of first_day..last_day (inclusive) on the regular time grid, from the
+    in-memory buffer when it still holds them, otherwise with one storage query.
+    """
+    start, end = first_day, _day_bounds(last_day)[1]
+    grid = DATAPOINT_BUFFER.grid(start, end)
+    if grid is None:
+        grid = TimeGrid.from_datapoints(await storage.get_datapoints(start, end), start, end)
+    return grid
+
+async def _aggregate_days(date_strs: List[str], verbose: bool = True) -> Dict[str, List[List[int | None]]]:
+    """
+    Aggregate the hourly averages of every garage for the given days and store them.
+    All days are read into one time grid, so catching up costs one query instead of one per day and garage.
     
-    return results
+    Returns:
+        Dict of day -> the 24 hourly values of each garage (GARAGE_NAMES order)
+    """
+    rollups = {}
+    if not date_strs:
+        return rollups
+    days = sorted(datetime.strptime(date_str, "%Y-%m-%d") for date_str in date_strs)
+    hourly = (await _day_grid(days[0], days[-1])).daily_hourly_means()
+    changed = False
+
+    for date_str in date_strs:
+        # Grid columns are in GARAGE_ID_MAPPING order (south, west, north, south_campus)
+        rollups[date_str] = rollup_values(hourly[date_str])
+        for garage_id_int, values in enumerate(rollups[date_str], start=1):
+            # Check if all hours have data
+            is_complete = values[23] is not None
+
+            # Create document for this day and garage
+            doc = {
+                "day": date_str,
+                "garage_id": garage_id_int,
+                "values": values,
+                "complete": is_complete
+            }
+
+            # Replace any existing document for this day and garage
+            await storage.replace_rollup(doc)
+
+            if verbose:
+                print(f"Aggregated data for {date_str} - Garage {garage_id_int}: {values}")
+        changed = DATE_INDEX.add(date_str, complete=all(values[23] is not None for values in rollups[date_str])) or changed
+    if changed:
+        SNAPSHOTS.publish("dates", DATE_INDEX.to_snapshot())
+    return rollups
 
 async def _aggregate_hourly_data():
     """
@@ -233,103 +315,140 @@ async def _aggregate_hourly_data():
     Each document contains 24 hourly values for a specific day and garage.
     Skips days that are already present and marked as complete in the aggregate collection.
     """
-    collection = db["datapoints"]
-    hourly_collection = db["hourly_aggregates"]
-    
     # First, get all unique dates from datapoints
-    pipeline = [
-        {
-            "$group": {
-                "_id": {
-                    "$dateToString": {
-                        "format": "%Y-%m-%d",
-                        "date": "$timestamp"
-                    }
-                }
+    dates = await storage.get_datapoint_days()
+    
+    # Days where any garage's rollup is missing or incomplete
+    pending = []
+    for date_str in dates:
+        for garage_id in GARAGE_ID_MAPPING.values():
+            existing_doc = await storage.get_rollup(date_str, garage_id)
+            if not existing_doc or existing_doc["complete"] is not True:
+                pending.append(date_str)
+                break
+
+    await _aggregate_days(pending, verbose=False)
+
+async def refresh_new_datapoints() -> Optional[datetime]:
+    """
+    Bring the watermark, the forecast buffer, the rollups and the available dates up to date
+    with the datapoints stored since the last refresh. Called by the ingest hook right after
+    new datapoints are flushed, and as a fallback by get_data_per_hour.
+    Only the producer worker refreshes. The others ask it to (at most once per snapshot poll
+    interval) and report what it published. On a follower replica the rollups are the leader's
+    job, so this only picks up what the leader stored.
+    
+    Returns:
+        datetime: The new latest timestamp, None if there was no new data
+    """
+    global MOST_RECENT_TIMESTAMP, _last_refresh_request, _seen_latest
+    
+    if not PRODUCER_LOCK.held:
+        now = time.monotonic()
+        if now - _last_refresh_request >= SNAPSHOT_POLL_INTERVAL:
+            _last_refresh_request = now
+            SNAPSHOTS.request_refresh()
+        latest = SNAPSHOTS.read("latest")
+        if latest is None or latest == _seen_latest:
+            return None
+        _seen_latest = latest
+        return datetime.fromisoformat(latest)
+    if not LEADER.is_leader:
+        return await sync_shared_state()
+
+    # Concurrent callers would otherwise re-aggregate the same days
+    async with _refresh_lock:
+        most_recent = await storage.get_latest_timestamp()
+        if not most_recent or most_recent == MOST_RECENT_TIMESTAMP:
+            return None
+        
+        # New data found, update the global timestamp and the forecast buffer
+        previous = MOST_RECENT_TIMESTAMP
+        MOST_RECENT_TIMESTAMP = most_recent
+        await _append_new_datapoints()
+        
+        # Re-aggregate every day the new data can fall on (more than one after an ingest outage)
+        first_day = (previous or most_recent).date()
+        new_dates = [
+            (first_day + timedelta(days=offset)).strftime("%Y-%m-%d")
+            for offset in range((most_recent.date() - first_day).days + 1)
+        ]
+        # Also adds the new days to the date index
+        rollups = await _aggregate_days(new_dates)
+        print(f"Aggregated data for {', '.join(new_dates)}")
+
+        # Push the new state to /api/stream subscribers
+        await publish_latest_datapoint()
+        for date_str, values in rollups.items():
+            BROADCASTER.publish("hourly", {"date": date_str, "values": dict(zip(GARAGE_NAMES, values))})
+        return most_recent
+
+async def publish_latest_datapoint():
+    """Send the newest datapoint to /api/stream subscribers (the dashboard header shows its time)"""
+    if MOST_RECENT_TIMESTAMP is None:
+        return
+    SNAPSHOTS.publish("latest", MOST_RECENT_TIMESTAMP.isoformat())
+    doc = await storage.get_datapoint(MOST_RECENT_TIMESTAMP)
+    data = {"timestamp": MOST_RECENT_TIMESTAMP.isoformat()}
+    if doc:
+        data.update({garage: doc[GARAGE_MAPPING[garage]] for garage in GARAGE_NAMES})
+    BROADCASTER.publish("datapoint", data)
+
+async def sync_shared_state() -> Optional[datetime]:
+    """
+    Publish the state the leader replica stored (available dates, averages, the newest datapoint
+    and the rollups of the days it touched) to this replica's workers. Follower replicas only.
+    
+    Returns:
+        datetime: The new latest timestamp, None if there was no new data
+    """
+    global MOST_RECENT_TIMESTAMP
+    
+    async with _refresh_lock:
+        if not len(DATE_INDEX):
+            await _load_date_index()
+        # Days the leader added since the last sync
+        pending = {day for day in await storage.get_rollup_days() if day not in DATE_INDEX}
+        
+        averages = {garage: await storage.get_averages(garage) for garage in GARAGE_NAMES}
+        averages = {garage: values for garage, values in averages.items() if values}
+        if averages and averages != SNAPSHOTS.read("averages"):
+            SNAPSHOTS.publish("averages", averages)
+        
+        most_recent = await storage.get_latest_timestamp()
+        new_data = bool(most_recent) and most_recent != MOST_RECENT_TIMESTAMP
+        touched = set()
+        if new_data:
+            # The leader re-aggregated every day the new datapoints fall on
+            first_day = (MOST_RECENT_TIMESTAMP or most_recent).date()
+            MOST_RECENT_TIMESTAMP = most_recent
+            touched = {
+                (first_day + timedelta(days=offset)).strftime("%Y-%m-%d")
+                for offset in range((most_recent.date() - first_day).days + 1)
             }
-        }
-    ]
-    cursor = collection.aggregate(pipeline)
-    dates = await cursor.to_list(length=None)
-    
-    # For each date and garage, aggregate hourly data
-    for date_doc in dates:
-        date_str = date_doc["_id"]
-        query_date = datetime.strptime(date_str, "%Y-%m-%d")
+            await publish_latest_datapoint()
         
-        # Process each garage
-        for garage_id, status_field in GARAGE_MAPPING.items():
-            # Skip duplicate mappings (like "1" and "south" mapping to same field)
-            if garage_id.isdigit():
-                # Check if document exists and is complete
-                existing_doc = await hourly_collection.find_one({
-                    "day": date_str,
-                    "garage_id": int(garage_id) if garage_id.isdigit() else garage_id
+        changed = False
+        for date_str in sorted(pending | touched):
+            rollups = [await storage.get_rollup(date_str, garage_id) for garage_id in GARAGE_ID_MAPPING.values()]
+            if not any(rollups):
+                continue
+            changed = DATE_INDEX.add(date_str, complete=all(rollup and rollup["complete"] for rollup in rollups)) or changed
+            if date_str in touched and all(rollups):
+                BROADCASTER.publish("hourly", {
+                    "date": date_str,
+                    "values": {garage: rollup["values"] for garage, rollup in zip(GARAGE_NAMES, rollups)}
                 })
-                
-                if existing_doc and existing_doc["complete"] is True:
-                    # print(f"Skipping {date_str} for garage {garage_id} - already complete")
-                    continue
-                
-                pipeline = [
-                    {
-                        "$match": {
-                            "timestamp": {
-                                "$gte": query_date,
-                                "$lt": query_date.replace(hour=23, minute=59, second=59)
-                            },
-                            "metadata": "sjparking"
-                        }
-                    },
-                    {
-                        "$group": {
-                            "_id": {
-                                "$hour": "$timestamp"
-                            },
-                            "avg_value": {
-                                "$avg": f"${status_field}"
-                            }
-                        }
-                    },
-                    {
-                        "$sort": {"_id": 1}
-                    }
-                ]
-                
-                cursor = collection.aggregate(pipeline)
-                hourly_data = await cursor.to_list(length=None)
-                
-                # Create array of 24 values, filling missing hours with None
-                values = [None] * 24
-                for hour_data in hourly_data:
-                    hour = hour_data["_id"]
-                    values[hour] = round(hour_data["avg_value"])
-                
-                # Check if all hours have data
-                if (values[23] is not None):
-                    is_complete = True
-                else:
-                    is_complete = False
-                
-                # Create document for this day and garage
-                doc = {
-                    "day": date_str,
-                    "garage_id": int(garage_id) if garage_id.isdigit() else garage_id,
-                    "values": values,
-                    "complete": is_complete
-                }
-                
-                # Upsert the document
-                await hourly_collection.update_one(
-                    {"day": date_str, "garage_id": doc["garage_id"]},
-                    {"$set": doc},
-                    upsert=True
-                )
+        if changed:
+            SNAPSHOTS.publish("dates", DATE_INDEX.to_snapshot())
+        
+        return most_recent if new_data else None
 
 async def get_data_per_hour(date: str, garage_id: str) -> List[float | None]:
     """
     Get the hourly aggregated data for a specific date and garage.
-    Checks for new data and re-aggregates if new datapoints are found.
+    Checks for new data and re-aggregates if new datapoints are found
+    (usually the ingest hook already did, see refresh_new_datapoints).
     
     Args:
         date (str): Date in YYYY-MM-DD format
@@ -338,26 +457,8 @@ async def get_data_per_hour(date: str, garage_id: str) -> List[float | None]:
     Returns:
         List containing the hourly aggregated data
     """
-    global MOST_RECENT_TIMESTAMP
-    
     # Check for new data
-    most_recent = await collection.find_one(
-        sort=[("timestamp", -1)]
-    )
-    
-    if most_recent and most_recent["timestamp"] != MOST_RECENT_TIMESTAMP:
-        # New data found, update the global timestamp
-        MOST_RECENT_TIMESTAMP = most_recent["timestamp"]
-        
-        # Get the date of the new data
-        new_date = MOST_RECENT_TIMESTAMP.strftime("%Y-%m-%d")
-        
-        # Delete existing aggregated data for this date
-        await averaged_collection.delete_many({"day": new_date})
-        
-        # Re-aggregate the data for this date
-        await _aggregate_hourly_data_for_date(new_date)
-        print(f"Aggregated data for {new_date}")
+    await refresh_new_datapoints()
     
     # Convert garage_id to int if it's a number
     try:
@@ -365,12 +466,7 @@ async def get_data_per_hour(date: str, garage_id: str) -> List[float | None]:
     except ValueError:
         garage_id = GARAGE_ID_MAPPING.get(garage_id.lower())
     
-    query = {
-        "day": date,
-        "garage_id": garage_id
-    }
-    
-    result = await averaged_collection.find_one(query, {"_id": 0, "values": 1})
+    result = await storage.get_rollup(date, garage_id)
     if result:
         return result["values"]
     else:
@@ -383,73 +479,7 @@ async def _aggregate_hourly_data_for_date(date_str: str):
     Args:
         date_str (str): Date in YYYY-MM-DD format
     """
-    collection = db["datapoints"]
-    hourly_collection = db["hourly_aggregates"]
-    
-    query_date = datetime.strptime(date_str, "%Y-%m-%d")
-    
-    # Process each garage
-    for garage_id, status_field in GARAGE_MAPPING.items():
-        # Skip duplicate mappings (like "1" and "south" mapping to same field)
-        if garage_id.isdigit():
-            # Convert garage_id to int for storage
-            garage_id_int = int(garage_id)
-            
-            pipeline = [
-                {
-                    "$match": {
-                        "timestamp": {
-                            "$gte": query_date,
-                            "$lt": query_date.replace(hour=23, minute=59, second=59)
-                        },
-                        "metadata": "sjparking"
-                    }
-                },
-                {
-                    "$group": {
-                        "_id": {
-                            "$hour": "$timestamp"
-                        },
-                        "avg_value": {
-                            "$avg": f"${status_field}"
-                        }
-                    }
-                },
-                {
-                    "$sort": {"_id": 1}
-                }
-            ]
-            
-            cursor = collection.aggregate(pipeline)
-            hourly_data = await cursor.to_list(length=None)
-            
-            # Create array of 24 values, filling missing hours with None
-            values = [None] * 24
-            for hour_data in hourly_data:
-                hour = hour_data["_id"]
-                values[hour] = round(hour_data["avg_value"])
-            
-            # Check if all hours have data
-            is_complete = values[23] is not None
-            
-            # Create document for this day and garage
-            doc = {
-                "day": date_str,
-                "garage_id": garage_id_int,
-                "values": values,
-                "complete": is_complete
-            }
-            
-            # Delete any existing document for this day and garage
-            await hourly_collection.delete_one({
-                "day": date_str,
-                "garage_id": garage_id_int
-            })
-            
-            # Insert the new document
-            await hourly_collection.insert_one(doc)
-            
-            print(f"Aggregated data for {date_str} - Garage {garage_id_int}: {values}")
+    await _aggregate_days([date_str])
 
 # if __name__ == "__main__":
 #     async def main():
@@ -468,8 +498,8 @@ async def get_latest_timestamp() -> datetime:
     Returns:
         datetime: The most recent timestamp
     """
-    global MOST_RECENT_TIMESTAMP
-    return MOST_RECENT_TIMESTAMP
+    latest = SNAPSHOTS.read("latest")
+    return datetime.fromisoformat(latest) if latest else MOST_RECENT_TIMESTAMP
 
 async def calculate_average_fullness():
     """
@@ -485,9 +515,8 @@ async def calculate_average_fullness():
     west_avg_fullness = [[] for _ in range(7)]
     south_campus_avg_fullness = [[] for _ in range(7)]
     
-    # Get all documents from hourly_aggregates collection
-    cursor = averaged_collection.find({"complete": True})
-    documents = await cursor.to_list(length=None)
+    # Get all complete documents from the hourly rollups
+    documents = await storage.get_complete_rollups()
     
     print(f"Checking {len(documents)} documents")
     
@@ -596,6 +625,17 @@ async def calculate_average_fullness():
     print(f"West: {west_avg_fullness[0]}")
     print(f"South Campus: {south_campus_avg_fullness[0]}")
 
+    # Share the averages with the other workers, and persist them so other processes can read them without recomputing
+    averages = {
+        "north": north_avg_fullness,
+        "south": south_avg_fullness,
+        "west": west_avg_fullness,
+        "south_campus": south_campus_avg_fullness
+    }
+    SNAPSHOTS.publish("averages", averages)
+    for garage in GARAGE_NAMES:
+        await storage.save_averages(garage, averages[garage])
+
 async def main():
     await calculate_average_fullness()
     
@@ -612,6 +652,9 @@ async def get_garage_averages(garage: str) -> List[List[int]]:
     Returns:
         List[List[int]]: List of 7 lists (one for each day) containing 24 hourly averages
     """
+    averages = SNAPSHOTS.read("averages")
+    if averages and garage in averages:
+        return averages[garage]
     if garage == "north":
         return north_avg_fullness
     elif garage == "south":
@@ -633,8 +676,11 @@ async def get_current_weather() -> dict:
     """
     global weather_cache, weather_cache_timestamp
     
-    # Check if cache is valid
+    # Check if cache is valid, the producer worker shares its cache with the others
     current_time = time.time()
+    shared = SNAPSHOTS.read("weather")
+    if shared is not None and current_time - shared["fetched_at"] < CACHE_EXPIRATION:
+        return shared["data"]
     if (weather_cache is not None and 
         weather_cache_timestamp is not None and 
         current_time - weather_cache_timestamp < CACHE_EXPIRATION):
@@ -662,6 +708,8 @@ async def get_current_weather() -> dict:
             "condition": current_period['shortForecast']
         }
         weather_cache_timestamp = current_time
+        if PRODUCER_LOCK.held:
+            SNAPSHOTS.publish("weather", {"data": weather_cache, "fetched_at": current_time})
         
         return weather_cache
     except Exception as e:
@@ -0,0 +1,87 @@
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class DateIndex:
+    """
+    Sorted YYYY-MM-DD days that have data, with a flag per day telling whether every garage's
+    rollup is complete. Days sort as strings, so lookups and range queries are a bisect on
+    the sorted list; new days almost always come last, which makes adding them an append.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, bool]] = ()):
+        complete = dict(entries)
+        self._days: List[str] = sorted(complete)
+        self._complete: List[bool] = [complete[day] for day in self._days]
+
+    def __len__(self) -> int:
+        return len(self._days)
+
+    def __contains__(self, day: str) -> bool:
+        return self._find(day) is not None
+
+    def _find(self, day: str) -> Optional[int]:
+        position = bisect_left(self._days, day)
+        if position < len(self._days) and self._days[position] == day:
+            return position
+        return None
+
+    def has_data(self, day: str) -> bool:
+        return self._find(day) is not None
+
+    def is_complete(self, day: str) -> bool:
+        position = self._find(day)
+        return position is not None and self._complete[position]
+
+    @property
+    def latest(self) -> Optional[str]:
+        return self._days[-1] if self._days else None
+
+    def add(self, day: str, complete: bool = False) -> bool:
+        """
+        Add a day or update its completeness flag.
+
+        Returns:
+            bool: True if the index changed
+        """
+        position = bisect_left(self._days, day)
+        if position < len(self._days) and self._days[position] == day:
+            if self._complete[position] == complete:
+                return False
+            self._complete[position] = complete
+            return True
+        self._days.insert(position, day)
+        self._complete.insert(position, complete)
+        return True
+
+    def _bounds(self, start: Optional[str], end: Optional[str]) -> Tuple[int, int]:
+        low = bisect_left(self._days, start) if start else 0
+        high = bisect_right(self._days, end) if end else len(self._days)
+        return low, high
+
+    def days(self, start: Optional[str] = None, end: Optional[str] = None, limit: Optional[int] = None) -> List[str]:
+        """Days in [start, end] (either bound optional), oldest first, at most `limit` of them"""
+        low, high = self._bounds(start, end)
+        if limit is not None:
+            high = min(high, low + limit)
+        return self._days[low:high]
+
+    def entries(self, start: Optional[str] = None, end: Optional[str] = None, limit: Optional[int] = None) -> List[Tuple[str, bool]]:
+        """(day, complete) of the days in [start, end], oldest first, at most `limit` of them"""
+        low, high = self._bounds(start, end)
+        if limit is not None:
+            high = min(high, low + limit)
+        return list(zip(self._days[low:high], self._complete[low:high]))
+
+    # ── SNAPSHOTS ───────────────────────────────────────────────────────────────
+    def to_snapshot(self) -> Dict[str, Any]:
+        return {"days": self._days, "complete": self._complete}
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Optional[Dict[str, Any]]) -> "DateIndex":
+        index = cls()
+        if snapshot:
+            # Published in order, no need to sort again
+            index._days = list(snapshot["days"])
+            index._complete = list(snapshot["complete"])
+        return index
@@ -0,0 +1,86 @@
+from typing import Awaitable, Callable, Optional
+import asyncio
+import os
+import socket
+import time
+import uuid
+
+from data.storage import Storage, get_storage
+
+# Seconds a leader keeps its lease without renewing it; a dead leader is replaced within
+# this plus one renew interval
+LEADER_LEASE_TTL = float(os.getenv("LEADER_LEASE_TTL", "30"))
+# Name of the lease, replicas with the same name and storage elect one leader
+LEADER_LEASE_NAME = os.getenv("LEADER_LEASE_NAME", "scheduler")
+
+
+class LeaderElection:
+    """
+    Lease-based leader election between API replicas that share one storage backend.
+
+    Each replica's producer worker (see snapshots.py) tries to take or renew the lease every
+    ttl / 3 seconds. The holder is the leader: it runs the scheduled jobs (forecasts, rollups,
+    averages, retention) and writes their results to storage. The others are followers and
+    only read those results. A leader that can't renew stops counting as leader when its
+    lease would have run out, measured from before its last successful renewal, so two
+    replicas never both think they lead.
+    """
+
+    def __init__(self, storage: Storage, name: str = LEADER_LEASE_NAME, ttl: float = LEADER_LEASE_TTL):
+        self.storage = storage
+        self.name = name
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._valid_until = 0.0
+
+    @property
+    def is_leader(self) -> bool:
+        return time.monotonic() < self._valid_until
+
+    async def try_acquire(self) -> bool:
+        """Take or renew the lease, True if this replica leads now"""
+        started = time.monotonic()
+        try:
+            acquired = await self.storage.acquire_lease(self.name, self.owner, self.ttl)
+        except Exception as e:
+            # Keep leading until the current lease runs out, the next attempt may succeed
+            print(f"Leader lease renewal failed: {e}")
+            return self.is_leader
+        self._valid_until = started + self.ttl if acquired else 0.0
+        return acquired
+
+    async def release(self) -> None:
+        if self._valid_until:
+            self._valid_until = 0.0
+            await self.storage.release_lease(self.name, self.owner)
+
+    async def run(
+        self,
+        on_elected: Callable[[], Awaitable[None]],
+        on_demoted: Callable[[], Awaitable[None]],
+        interval: Optional[float] = None
+    ) -> None:
+        """
+        Keep taking part in the election, calling on_elected / on_demoted when the role changes.
+        on_elected runs as its own task so that slow leader startup never delays a renewal.
+        """
+        interval = interval or self.ttl / 3
+        leading = self.is_leader
+        elected_task: Optional[asyncio.Task] = None
+        while True:
+            await self.try_acquire()
+            if self.is_leader and not leading:
+                print(f"Replica {self.owner} is the leader")
+                leading = True
+                elected_task = asyncio.create_task(on_elected())
+            elif leading and not self.is_leader:
+                print(f"Replica {self.owner} lost the leader lease")
+                leading = False
+                if elected_task is not None:
+                    elected_task.cancel()
+                await on_demoted()
+            await asyncio.sleep(interval)
+
+
+# Process-wide election on the shared storage backend
+LEADER = LeaderElection(get_storage())
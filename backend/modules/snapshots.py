@@ -0,0 +1,236 @@
+"""
+Serving state shared between the workers of `uvicorn --workers N`.
+
+One worker, the producer, holds an exclusive lock on SNAPSHOT_DIR/producer.lock. It loads the
+models, computes forecasts, averages and rollups, and publishes every piece of serving state
+as a snapshot. The other workers never load TensorFlow or compute anything; they answer
+requests from the snapshots. If the producer dies, its lock is released and the next worker
+to check takes over.
+
+A snapshot is a memory-mapped file: a header with a version counter and the payload length,
+followed by the JSON payload. The producer writes it seqlock style: the version is odd while
+the payload is being written and even once it is consistent. Readers keep the decoded payload
+and only look at the 8-byte version on each request, so reading an unchanged snapshot copies
+nothing; after a change the payload is read again, retrying if the version moved meanwhile.
+A producer killed mid-write leaves the version odd: readers give up after SNAPSHOT_READ_TIMEOUT
+and keep serving what they had, and the next producer's first publish makes it even again.
+"""
+from typing import Any, Dict, List, Optional
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "sjparking-snapshots"))
+# Largest payload of a single snapshot in bytes
+SNAPSHOT_CAPACITY = int(os.getenv("SNAPSHOT_CAPACITY", str(1 << 20)))
+# Seconds between checks of the other workers: taking over a released producer lock, relaying events
+SNAPSHOT_POLL_INTERVAL = float(os.getenv("SNAPSHOT_POLL_INTERVAL", "1"))
+# Seconds a reader waits for a write in progress before serving the payload it already has
+SNAPSHOT_READ_TIMEOUT = float(os.getenv("SNAPSHOT_READ_TIMEOUT", "0.05"))
+# Events kept for the workers that relay them to their own /api/stream subscribers
+EVENT_BACKLOG = 64
+
+_MAGIC = b"SJPSNAP1"
+_HEADER = struct.Struct("<8sQQ")  # magic, version, payload length
+_VERSION_OFFSET = 8
+
+
+class SnapshotFile:
+    """One memory-mapped snapshot, written by the producer and read by every worker"""
+
+    def __init__(self, path: str, capacity: int = SNAPSHOT_CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._cached_version = 0
+        self._cached: Any = None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < _HEADER.size + capacity:
+                os.ftruncate(fd, _HEADER.size + capacity)
+            self._map = mmap.mmap(fd, _HEADER.size + capacity)
+        finally:
+            os.close(fd)
+        if self._map[:len(_MAGIC)] != _MAGIC:
+            # New file: version 0 means nothing was published yet
+            self._map[:_HEADER.size] = _HEADER.pack(_MAGIC, 0, 0)
+
+    @property
+    def version(self) -> int:
+        return struct.unpack_from("<Q", self._map, _VERSION_OFFSET)[0]
+
+    def publish(self, data: Any) -> int:
+        """
+        Replace the snapshot. Only the producer may call this.
+
+        Returns:
+            int: The new version
+        """
+        payload = json.dumps(data, default=str).encode()
+        if len(payload) > self.capacity:
+            raise ValueError(f"Snapshot {self.path} is {len(payload)} bytes, raise SNAPSHOT_CAPACITY ({self.capacity})")
+        with self._lock:
+            version = self.version
+            # A producer that died mid-write left it odd, start from the next even version
+            version += version & 1
+            # Odd while writing, readers retry until it is even again
+            struct.pack_into("<Q", self._map, _VERSION_OFFSET, version + 1)
+            self._map[_HEADER.size:_HEADER.size + len(payload)] = payload
+            struct.pack_into("<Q", self._map, _VERSION_OFFSET + 8, len(payload))
+            struct.pack_into("<Q", self._map, _VERSION_OFFSET, version + 2)
+            self._cached_version, self._cached = version + 2, data
+            return version + 2
+
+    def read(self, default: Any = None) -> Any:
+        """The latest published payload, `default` if nothing was published yet"""
+        version = self.version
+        if version == self._cached_version:
+            return default if self._cached is None else self._cached
+        deadline = time.monotonic() + SNAPSHOT_READ_TIMEOUT
+        while True:
+            if version % 2 == 0:
+                length = struct.unpack_from("<Q", self._map, _VERSION_OFFSET + 8)[0]
+                payload = self._map[_HEADER.size:_HEADER.size + length]
+                if self.version == version:
+                    break
+            if time.monotonic() >= deadline:
+                # The producer died mid-write (or is very slow): keep the payload we have and don't
+                # wait again for this version, the next publish replaces it
+                self._cached_version = version
+                return default if self._cached is None else self._cached
+            # The producer is in the middle of a write
+            time.sleep(0)
+            version = self.version
+        self._cached_version, self._cached = version, json.loads(payload)
+        return self._cached
+
+    def close(self) -> None:
+        self._map.close()
+
+
+class SnapshotStore:
+    """Named snapshots in one directory"""
+
+    def __init__(self, directory: str = SNAPSHOT_DIR, capacity: int = SNAPSHOT_CAPACITY):
+        self.directory = directory
+        self.capacity = capacity
+        self._files: Dict[str, SnapshotFile] = {}
+        self._lock = threading.Lock()
+        # Sequence of the last event seen, None until the first new_events() call
+        self._last_event: Optional[int] = None
+
+    def _file(self, name: str) -> SnapshotFile:
+        snapshot = self._files.get(name)
+        if snapshot is None:
+            with self._lock:
+                snapshot = self._files.get(name)
+                if snapshot is None:
+                    snapshot = SnapshotFile(os.path.join(self.directory, f"{name}.snap"), self.capacity)
+                    self._files[name] = snapshot
+        return snapshot
+
+    def publish(self, name: str, data: Any) -> int:
+        return self._file(name).publish(data)
+
+    def read(self, name: str, default: Any = None) -> Any:
+        return self._file(name).read(default)
+
+    def version(self, name: str) -> int:
+        return self._file(name).version
+
+    # ── EVENTS ──────────────────────────────────────────────────────────────────
+    def record_event(self, event: str, data: Any) -> None:
+        """Keep a /api/stream event for the other workers to relay (producer only)"""
+        backlog = self.read("events", {"next": 1, "events": []})
+        events = (backlog["events"] + [[backlog["next"], event, data]])[-EVENT_BACKLOG:]
+        self.publish("events", {"next": backlog["next"] + 1, "events": events})
+        self._last_event = backlog["next"]
+
+    def new_events(self) -> List[List[Any]]:
+        """
+        [sequence, event, data] of the events recorded since the last call, oldest first.
+        The first call only notes where the backlog is, a worker that starts or takes over
+        doesn't replay old events to its subscribers.
+        """
+        backlog = self.read("events", {"next": 1, "events": []})
+        if self._last_event is None:
+            self._last_event = backlog["next"] - 1
+            return []
+        events = [entry for entry in backlog["events"] if entry[0] > self._last_event]
+        if events:
+            self._last_event = events[-1][0]
+        return events
+
+    # ── REFRESH REQUESTS ────────────────────────────────────────────────────────
+    def request_refresh(self) -> None:
+        """Ask the producer to pick up new datapoints (any worker may call this)"""
+        path = os.path.join(self.directory, "refresh.request")
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path, "a"):
+            os.utime(path)
+
+    def refresh_requested_at(self) -> float:
+        try:
+            return os.stat(os.path.join(self.directory, "refresh.request")).st_mtime
+        except FileNotFoundError:
+            return 0.0
+
+
+class ProducerLock:
+    """Exclusive, non-blocking lock on SNAPSHOT_DIR/producer.lock; released by the OS if the holder dies"""
+
+    def __init__(self, directory: str = SNAPSHOT_DIR):
+        self.path = os.path.join(directory, "producer.lock")
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self) -> bool:
+        """Try to become the producer, True if this process holds the lock"""
+        if self._fd is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def holder(self) -> Optional[int]:
+        """Pid of the producer, if one wrote it"""
+        try:
+            with open(self.path) as f:
+                return int(f.read().strip() or 0) or None
+        except (FileNotFoundError, ValueError):
+            return None
+
+
+# Process-wide snapshot store and producer lock
+SNAPSHOTS = SnapshotStore()
+PRODUCER_LOCK = ProducerLock()
@@ -0,0 +1,79 @@
+from fastapi import APIRouter, HTTPException, Header
+from fastapi.concurrency import run_in_threadpool
+from typing import Any, Dict, Optional
+from pathlib import Path
+import os
+import sys
+
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+from routes.data import update_prediction
+from modules.snapshots import PRODUCER_LOCK
+from modules.leader import LEADER
+
+# Every admin endpoint requires a matching X-Admin-Token header; without ADMIN_TOKEN they are disabled
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+router = APIRouter(
+    prefix="/api/admin",
+    tags=["admin"]
+)
+
+
+def _check_token(token: Optional[str]) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled, set ADMIN_TOKEN to enable them")
+    if token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    # Models are only loaded by the producer worker, see snapshots.py
+    if not PRODUCER_LOCK.held:
+        raise HTTPException(status_code=409, detail=f"Models are served by the producer worker (pid {PRODUCER_LOCK.holder()}), retry")
+    # Follower replicas don't forecast, see leader.py
+    if not LEADER.is_leader:
+        raise HTTPException(status_code=409, detail="Models are served by the leader replica")
+
+
+# Which model release is served, which one would be rolled back to, and which exist
+@router.get("/models")
+async def get_models(x_admin_token: Optional[str] = Header(None)) -> Dict[str, Any]:
+    _check_token(x_admin_token)
+    from data.forecasting.model_registry import MODEL_REGISTRY
+    return await run_in_threadpool(MODEL_REGISTRY.status)
+
+
+# Load a release (default: the current one) into the standby slot, validate it and swap it in.
+# With a version, that release also becomes the current one once it is served, so other workers follow.
+# precision=float16/int8 switches to a quantized variant that passed its accuracy gate (see quantize.py),
+# layout=joint/per_garage picks which live models are served when there are no releases.
+@router.post("/models/reload")
+async def reload_models(
+    version: Optional[str] = None,
+    precision: Optional[str] = None,
+    layout: Optional[str] = None,
+    x_admin_token: Optional[str] = Header(None)
+) -> Dict[str, Any]:
+    _check_token(x_admin_token)
+    from data.forecasting.model_registry import MODEL_REGISTRY
+    try:
+        # current.json only names the version once it passed the smoke test and is served
+        await run_in_threadpool(MODEL_REGISTRY.reload, version, precision, layout, version is not None)
+    except Exception as e:
+        # The previous models are still being served
+        raise HTTPException(status_code=400, detail=f"Reload failed: {e}")
+    await update_prediction()
+    return await run_in_threadpool(MODEL_REGISTRY.status)
+
+
+# Swap the previously served models back in, they also become the current release again
+@router.post("/models/rollback")
+async def rollback_models(x_admin_token: Optional[str] = Header(None)) -> Dict[str, Any]:
+    _check_token(x_admin_token)
+    from data.forecasting.model_registry import MODEL_REGISTRY
+    try:
+        await run_in_threadpool(MODEL_REGISTRY.rollback)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    await update_prediction()
+    return await run_in_threadpool(MODEL_REGISTRY.status)
@@ -1,18 +1,21 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 from pydantic import BaseModel
 from modules.database import get_garage_data, get_available_dates, get_data_per_hour, get_latest_timestamp, get_garage_averages
 from fastapi.concurrency import run_in_threadpool
 from pathlib import Path
+import os
 import sys
 
 
 project_root = Path(__file__).parent.parent.parent
 sys.path.append(str(project_root))
 
-from modules.database import get_garage_data, get_available_dates, get_data_per_hour, get_latest_timestamp, get_current_weather
-from data.forecasting.predict_future_times_individual_garage import calculate_prediction
+from modules.database import get_garage_data, get_available_dates, get_date_status, has_data, may_be_unindexed, refresh_new_datapoints, get_data_per_hour, get_latest_timestamp, get_current_weather, storage, GARAGE_NAMES
+from modules.broadcaster import BROADCASTER
+from modules.snapshots import SNAPSHOTS
 
 
 
@@ -21,37 +24,95 @@ router = APIRouter(
     tags=["data"]
 )
 
-# Global variables to store predictions for each garage
-north_predictions: List[int] = []
-south_predictions: List[int] = []
-west_predictions: List[int] = []
-south_campus_predictions: List[int] = []
+# Set ENABLE_PREDICTION_BANDS=false to skip the Monte-Carlo dropout pass
+ENABLE_PREDICTION_BANDS = os.getenv("ENABLE_PREDICTION_BANDS", "true").lower() == "true"
+# Forecast kinds the bands are stored under, next to the "hourly" forecast
+BAND_KINDS = ["p10", "p50", "p90"]
 
-# Global variables to store tomorrow's predictions
-north_predictions_tomorrow: List[int] = []
-south_predictions_tomorrow: List[int] = []
-west_predictions_tomorrow: List[int] = []
-south_campus_predictions_tomorrow: List[int] = []
+def _prediction_snapshot() -> Dict[str, Any]:
+    """
+    Latest forecast, published by the producer worker (see snapshots.py):
+    {"date", "today": {garage: 24 values}, "tomorrow": {garage: 24 values},
+     "bands": {garage: {"p10"/"p50"/"p90": 48 values}}, "model": the model set's describe()}
+    """
+    return SNAPSHOTS.read("predictions", {})
+
+def prediction_is_current() -> bool:
+    """
+    True if the published forecast is today's and came from the models being served. The forecast
+    starts at midnight, so new datapoints alone don't change it. Producer worker of the leader replica only.
+    """
+    from data.forecasting.model_registry import MODEL_REGISTRY
+
+    snapshot = _prediction_snapshot()
+    today = datetime.now().strftime("%Y-%m-%d")
+    return snapshot.get("date") == today and snapshot.get("model") == MODEL_REGISTRY.active().describe()
 
 async def update_prediction():
-    """Update the global prediction variables with new predictions."""
-    global north_predictions, south_predictions, west_predictions, south_campus_predictions
-    global north_predictions_tomorrow, south_predictions_tomorrow, west_predictions_tomorrow, south_campus_predictions_tomorrow
-    
+    """
+    Compute today's and tomorrow's predictions, store them for the follower replicas and publish
+    them to every worker. Producer worker of the leader replica only.
+    """
+    # Imported here so that the other workers never load TensorFlow
+    from data.forecasting.predict_future_times_individual_garage import active_model_set, calculate_prediction, calculate_prediction_bands
+
     today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    garage_predictions = await run_in_threadpool(calculate_prediction, today, hours=48)
+    # One model set for the point forecast and the bands, even if a new release is activated in between
+    model_set = await run_in_threadpool(active_model_set)
+    garage_predictions = await run_in_threadpool(calculate_prediction, today, hours=48, model_set=model_set)
     
-    # Store first 24 hours in current predictions
-    north_predictions = garage_predictions[2][:24]
-    south_predictions = garage_predictions[0][:24]
-    west_predictions = garage_predictions[1][:24]
-    south_campus_predictions = garage_predictions[3][:24]
+    date = today.strftime("%Y-%m-%d")
+    previous = _prediction_snapshot()
+    # First 24 hours are today's predictions, the next 24 tomorrow's
+    snapshot = {
+        "date": date,
+        "today": {garage: garage_predictions[garage_no][:24] for garage_no, garage in enumerate(GARAGE_NAMES)},
+        "tomorrow": {garage: garage_predictions[garage_no][24:] for garage_no, garage in enumerate(GARAGE_NAMES)},
+        # Bands of the previous forecast until the new ones are computed, unless they were for another day
+        "bands": previous.get("bands", {}) if previous.get("date") == date else {},
+        "model": model_set.describe()
+    }
+    SNAPSHOTS.publish("predictions", snapshot)
     
-    # Store next 24 hours in tomorrow predictions
-    north_predictions_tomorrow = garage_predictions[2][24:]
-    south_predictions_tomorrow = garage_predictions[0][24:]
-    west_predictions_tomorrow = garage_predictions[1][24:]
-    south_campus_predictions_tomorrow = garage_predictions[3][24:]
+    # Persist the forecast so it can be read back without recomputing
+    for garage_no, garage in enumerate(GARAGE_NAMES):
+        await storage.save_forecast(today, garage, garage_predictions[garage_no])
+
+    # Push the new forecast to /api/stream subscribers
+    BROADCASTER.publish("predictions", {key: snapshot[key] for key in ("date", "today", "tomorrow")})
+
+    if ENABLE_PREDICTION_BANDS:
+        bands = await run_in_threadpool(calculate_prediction_bands, today, hours=48, model_set=model_set)
+        snapshot["bands"] = {} if bands is None else {
+            garage: {name: values[garage_no] for name, values in bands.items()}
+            for garage_no, garage in enumerate(GARAGE_NAMES)
+        }
+        SNAPSHOTS.publish("predictions", snapshot)
+        for garage, garage_bands in snapshot["bands"].items():
+            for kind, values in garage_bands.items():
+                await storage.save_forecast(today, garage, values, kind=kind)
+
+async def sync_predictions():
+    """Publish the forecast the leader replica stored for today to this replica's workers. Follower replicas only."""
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    forecasts = {garage: await storage.get_forecast(today, garage) for garage in GARAGE_NAMES}
+    if any(values is None for values in forecasts.values()):
+        # The leader hasn't stored today's forecast yet
+        return
+    bands = {}
+    for garage in GARAGE_NAMES:
+        garage_bands = {kind: await storage.get_forecast(today, garage, kind=kind) for kind in BAND_KINDS}
+        if all(values is not None for values in garage_bands.values()):
+            bands[garage] = garage_bands
+    snapshot = {
+        "date": today.strftime("%Y-%m-%d"),
+        "today": {garage: values[:24] for garage, values in forecasts.items()},
+        "tomorrow": {garage: values[24:] for garage, values in forecasts.items()},
+        "bands": bands
+    }
+    if snapshot != _prediction_snapshot():
+        SNAPSHOTS.publish("predictions", snapshot)
+        BROADCASTER.publish("predictions", {key: snapshot[key] for key in ("date", "today", "tomorrow")})
 
 # Response model that returns the raw data
 class DataResponse(BaseModel):
@@ -78,6 +139,16 @@ async def get_data(date: str = datetime.now().strftime("%Y-%m-%d"), garage_id: s
             detail="Invalid date format. Use YYYY-MM-DD"
         )
 
+    # Days without rollups have no data, no need to ask the database. Only days newer than the
+    # index may have datapoints it hasn't picked up yet, those are refreshed and looked up.
+    if not has_data(date):
+        if not may_be_unindexed(date):
+            raise HTTPException(
+                status_code=404,
+                detail=f"Date {date} not found in available dates"
+            )
+        await refresh_new_datapoints()
+
     # Get raw data from MongoDB
     raw_results = await get_garage_data(date, garage_id)
     
@@ -101,10 +172,55 @@ async def get_data(date: str = datetime.now().strftime("%Y-%m-%d"), garage_id: s
         hourly_values=hourly_data
     )
 
+def _validate_date_range(start: Optional[str], end: Optional[str]):
+    for value in (start, end):
+        if value is None:
+            continue
+        try:
+            datetime.strptime(value, "%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid date format. Use YYYY-MM-DD"
+            )
+
 @router.get("/dates")
-async def get_dates():
-    # Get a list of all dates available in the database
-    return await get_available_dates()
+async def get_dates(
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to"),
+    limit: Optional[int] = Query(None, ge=1)
+) -> List[str]:
+    """
+    Dates with data between `from` and `to` (inclusive, both optional) and tomorrow's date for its forecast.
+    With `limit`, pass the day after the last date as `from` to get the next page.
+    """
+    _validate_date_range(start, end)
+    return await get_available_dates(start, end, limit)
+
+@router.get("/dates/status")
+async def get_dates_status(
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to"),
+    limit: Optional[int] = Query(None, ge=1)
+) -> List[Dict[str, Any]]:
+    """Same dates as /dates (without tomorrow), each with whether every garage has data up to its last hour"""
+    _validate_date_range(start, end)
+    return await get_date_status(start, end, limit)
+
+@router.get("/stream")
+async def stream():
+    """
+    Server-sent events as they happen, starting with the latest of each:
+    "datapoint" (newest datapoint and its time), "hourly" (re-aggregated hourly values of a day)
+    and "predictions" (refreshed forecast of today and tomorrow).
+    """
+    subscriber = BROADCASTER.subscribe()
+    return StreamingResponse(
+        BROADCASTER.stream(subscriber),
+        media_type="text/event-stream",
+        # Don't let proxies buffer or cache the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("/latest-update")
 async def get_latest_update():
@@ -126,30 +242,36 @@ async def get_latest_update():
 @router.get("/predictions/{garage}")
 async def get_predictions(garage: str) -> List[float]:
     """Get predictions for a specific garage."""
-    if garage == "north":
-        return north_predictions
-    elif garage == "south":
-        return south_predictions
-    elif garage == "west":
-        return west_predictions
-    elif garage == "south_campus":
-        return south_campus_predictions
-    else:
+    if garage not in GARAGE_NAMES:
         raise HTTPException(status_code=400, detail="Invalid garage name")
+    return _prediction_snapshot().get("today", {}).get(garage, [])
 
 @router.get("/predictions-tomorrow/{garage}")
 async def get_predictions_tomorrow(garage: str) -> List[float]:
     """Get tomorrow's predictions for a specific garage."""
-    if garage == "north":
-        return north_predictions_tomorrow
-    elif garage == "south":
-        return south_predictions_tomorrow
-    elif garage == "west":
-        return west_predictions_tomorrow
-    elif garage == "south_campus":
-        return south_campus_predictions_tomorrow
-    else:
+    if garage not in GARAGE_NAMES:
+        raise HTTPException(status_code=400, detail="Invalid garage name")
+    return _prediction_snapshot().get("tomorrow", {}).get(garage, [])
+
+@router.get("/predictions/{garage}/bands")
+async def get_prediction_bands(garage: str, tomorrow: bool = False) -> Dict[str, List[int]]:
+    """
+    Get the uncertainty band of a garage's predictions.
+
+    Args:
+        garage (str): Garage name (north, south, west, south_campus)
+        tomorrow (bool): Tomorrow's hours instead of today's
+
+    Returns:
+        Dict[str, List[int]]: 24 hourly values for each of "p10", "p50" and "p90"
+    """
+    if garage not in GARAGE_NAMES:
         raise HTTPException(status_code=400, detail="Invalid garage name")
+    prediction_bands = _prediction_snapshot().get("bands", {})
+    if garage not in prediction_bands:
+        raise HTTPException(status_code=404, detail="Prediction bands are not available")
+    hours = slice(24, None) if tomorrow else slice(None, 24)
+    return {name: values[hours] for name, values in prediction_bands[garage].items()}
 
 @router.get("/average-fullness/{garage}/{day}")
 async def get_average_fullness(garage: str, day: int) -> List[int]:
@@ -0,0 +1,83 @@
+from fastapi import APIRouter, HTTPException, Header
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from typing import Any, Dict, Optional
+from datetime import datetime
+from pathlib import Path
+import asyncio
+import os
+import sys
+
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+from modules.database import refresh_new_datapoints
+from modules.snapshots import SNAPSHOTS, PRODUCER_LOCK
+from modules.leader import LEADER
+from routes.data import prediction_is_current, update_prediction, sync_predictions
+
+# The hook requires a matching X-Ingest-Token header (the ingest service sends it); without INGEST_TOKEN it is disabled
+INGEST_TOKEN = os.getenv("INGEST_TOKEN")
+
+router = APIRouter(
+    prefix="/api/ingest",
+    tags=["ingest"]
+)
+
+# Refresh running in the background, and whether another notification arrived meanwhile
+_refresh_task: Optional[asyncio.Task] = None
+_refresh_again = False
+
+
+class IngestNotification(BaseModel):
+    latest: datetime
+    count: int
+
+
+async def _refresh_loop():
+    """Update rollups, the watermark and the forecasts until no notification is left unhandled"""
+    global _refresh_again
+    while True:
+        _refresh_again = False
+        try:
+            latest = await refresh_new_datapoints()
+            if latest is not None and LEADER.is_leader:
+                # Recomputed after midnight; model swaps recompute it themselves (see start_leader)
+                if await run_in_threadpool(prediction_is_current):
+                    print(f"Refreshed rollups for datapoints up to {latest}")
+                else:
+                    await update_prediction()
+                    print(f"Refreshed rollups and predictions for datapoints up to {latest}")
+            elif not LEADER.is_leader:
+                # Follower replica, the leader computes the forecast
+                await sync_predictions()
+        except Exception as e:
+            # The next notification (or request) retries
+            print(f"Refresh after ingest failed: {e}")
+        if not _refresh_again:
+            return
+
+
+def schedule_refresh() -> None:
+    """Start a background refresh, or queue one more if a refresh is running (bursts collapse into one)"""
+    global _refresh_task, _refresh_again
+    if _refresh_task is not None and not _refresh_task.done():
+        _refresh_again = True
+        return
+    _refresh_task = asyncio.create_task(_refresh_loop())
+
+
+# Called by the ingest service (INGEST_NOTIFY_URL) after it flushed new datapoints to storage.
+# Answers right away; the refresh runs off the request path, on the producer worker.
+@router.post("/notify", status_code=202)
+async def notify(notification: IngestNotification, x_ingest_token: Optional[str] = Header(None)) -> Dict[str, Any]:
+    if not INGEST_TOKEN:
+        raise HTTPException(status_code=403, detail="Ingest notifications are disabled, set INGEST_TOKEN to enable them")
+    if x_ingest_token != INGEST_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid ingest token")
+    if PRODUCER_LOCK.held:
+        schedule_refresh()
+    else:
+        SNAPSHOTS.request_refresh()
+    return {"scheduled": True, "latest": notification.latest.isoformat()}
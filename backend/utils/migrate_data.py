@@ -1,67 +1,86 @@
+"""
+Import the historical datapoints in log.csv into storage.
+
+The CSV is read in chunks and converted column-wise; each chunk is one insert_datapoints
+call, which skips datapoints already stored (one range query per chunk plus an unordered
+insert_many on Mongo, INSERT OR IGNORE on the unique (metadata, timestamp) key on SQLite).
+Re-running the import is safe and only adds what is missing.
+
+    python backend/utils/migrate_data.py
+    python backend/utils/migrate_data.py --backend sqlite --chunk-size 10000
+"""
 import sys
 import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-import pandas as pd
+import argparse
 import asyncio
-from datetime import datetime
-from modules.database import Datapoint, init_db, get_database, close_connection, get_datapoint
+import time
 from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from data.storage import METADATA, STATUS_FIELDS, Storage, create_storage
+
 DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
 LOGS_DIRECTORY = DATA_DIR / "records"
 
-async def migrate_data():
-    # Initialize database
-    await init_db()
-    
-    # Read data from CSV
-    df = pd.read_csv(LOGS_DIRECTORY / "log.csv")
-    
-    # Convert date column to datetime
-    df['date'] = pd.to_datetime(df['date'])
-    
-    # Process in batches of 1000
-    batch_size = 1000
-    total_rows = len(df)
-    count = 0
-    skipped = 0
-    
-    print(f"Migrating {total_rows} rows")
-    for i in range(total_rows - 1, -1, -batch_size):
-        start_idx = max(0, i - batch_size + 1)
-        batch = df.iloc[start_idx:i+1]
-        batch_datapoints = []
-        
-        for _, row in batch.iterrows():
-            # Check if datapoint already exists
-            existing_datapoint = await get_datapoint(row['date'])
-            if existing_datapoint:
-                skipped += 1
-                continue
-                
-            datapoint = Datapoint(
-                timestamp=row['date'],
-                metadata="sjparking",
-                south_status=int(row['south'] * 100),  # Convert to percentage
-                west_status=int(row['west'] * 100),
-                north_status=int(row['north'] * 100),
-                south_campus_status=int(row['south campus'] * 100)
-            )
-            batch_datapoints.append(datapoint)
-        
-        # Insert batch if we have any new datapoints
-        if batch_datapoints:
-            # Convert to dictionaries for bulk insert
-            batch_dicts = [dp.model_dump() for dp in batch_datapoints]
-            collection = (await get_database())["datapoints"]
-            await collection.insert_many(batch_dicts)
-            count += len(batch_datapoints)
-        
-        # Print progress
-        print(f"Migrated: {count}, Skipped: {skipped}")
-
-    print(f"Migration complete. Total migrated: {count}, Total skipped: {skipped}")
-    await close_connection()
+# log.csv columns in STATUS_FIELDS order, stored as fractions (0.00-1.00)
+CSV_COLUMNS = ["south", "west", "north", "south campus"]
+CHUNK_SIZE = 5000
+
+
+def chunk_to_datapoints(chunk: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Datapoint documents of a log.csv chunk"""
+    timestamps = pd.to_datetime(chunk["date"]).dt.to_pydatetime()
+    # Round, not truncate: 0.29 * 100 is 28.999...
+    statuses = np.rint(chunk[CSV_COLUMNS].to_numpy(dtype=np.float64) * 100).astype(int).tolist()
+    return [
+        {"timestamp": timestamp, "metadata": METADATA, **dict(zip(STATUS_FIELDS, values))}
+        for timestamp, values in zip(timestamps, statuses)
+    ]
+
+
+async def migrate_data(
+    csv_path: Path = LOGS_DIRECTORY / "log.csv", chunk_size: int = CHUNK_SIZE, storage: Optional[Storage] = None
+) -> Dict[str, float]:
+    """
+    Insert every row of log.csv that isn't stored yet.
+
+    Returns:
+        Dict with the rows read, inserted and skipped, and the seconds it took
+    """
+    storage = storage or create_storage()
+    await storage.init()
+    start = time.perf_counter()
+    read = inserted = 0
+    try:
+        for chunk in pd.read_csv(csv_path, usecols=["date", *CSV_COLUMNS], chunksize=chunk_size):
+            docs = chunk_to_datapoints(chunk)
+            read += len(docs)
+            inserted += await storage.insert_datapoints(docs)
+            elapsed = time.perf_counter() - start
+            print(f"Read: {read}, Migrated: {inserted}, Skipped: {read - inserted} ({read / elapsed:.0f} rows/s)")
+    finally:
+        await storage.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Migration complete. Total migrated: {inserted}, Total skipped: {read - inserted}, "
+          f"{read} rows in {elapsed:.2f}s ({read / max(elapsed, 1e-9):.0f} rows/s)")
+    return {"read": read, "inserted": inserted, "skipped": read - inserted, "seconds": elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import log.csv into storage, skipping datapoints that are already stored")
+    parser.add_argument("--csv", type=Path, default=LOGS_DIRECTORY / "log.csv")
+    parser.add_argument("--backend", choices=["mongo", "sqlite", "memory"], help="Storage backend (default: STORAGE_BACKEND)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows per read and insert")
+    args = parser.parse_args()
+
+    asyncio.run(migrate_data(args.csv, args.chunk_size, create_storage(args.backend)))
+
 
 if __name__ == "__main__":
-    asyncio.run(migrate_data())
\ No newline at end of file
+    main()
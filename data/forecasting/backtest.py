@@ -0,0 +1,246 @@
+"""
+Walk-forward backtest of the blended long/short forecast.
+
+Slides the forecast origin across the history (every datapoint, or the first
+datapoint of every hour), builds every origin's input windows as one strided
+array and runs them through the models in large batches. Reports MAE and RMSE
+per garage and per horizon step, plus forecasts per second.
+
+    python -m data.forecasting.backtest                       # log.csv, hourly origins
+    python -m data.forecasting.backtest --source storage --step 10min --start 2025-01-01
+    python -m data.forecasting.backtest --output backtest_horizons.csv
+    python -m data.forecasting.backtest --compare-layouts             # per-garage vs joint models
+"""
+import argparse
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from data.forecasting.constants import GARAGE_NAMES, LONG_FUTURE_STEPS
+from data.forecasting.data_functions import load_data, load_data_from_storage
+from data.forecasting.datapoint_buffer import VALUE_COLUMNS
+from data.forecasting.feature_store import lookup_features
+from data.forecasting.streaming_features import scale_rows
+from data.forecasting.model_registry import LAYOUTS, MODEL_PRECISION, PRECISIONS, ModelSet, current_release, load_model_set
+from data.forecasting.predict_future_times_individual_garage import _model_seq, predict_batch
+
+# Horizon steps (in datapoints, ~10 minutes each) shown in the summary table
+REPORT_STEPS = [1, 3, 6, 12, 18, 36, 72, 144, LONG_FUTURE_STEPS]
+
+
+@dataclass
+class BacktestResult:
+    origins: int
+    mae: np.ndarray           # (horizon, garages)
+    rmse: np.ndarray          # (horizon, garages)
+    inference_seconds: float
+    total_seconds: float
+
+    @property
+    def forecasts_per_second(self) -> float:
+        return self.origins / self.inference_seconds if self.inference_seconds else float("inf")
+
+    def garage_mae(self) -> np.ndarray:
+        return self.mae.mean(axis=0)
+
+    def garage_rmse(self) -> np.ndarray:
+        # Every step has the same number of origins, so the mean of squares can be pooled
+        return np.sqrt((self.rmse ** 2).mean(axis=0))
+
+    def horizon_frame(self) -> pd.DataFrame:
+        """Per-horizon-step metrics, one MAE and one RMSE column per garage"""
+        frame = pd.DataFrame({"step": np.arange(1, len(self.mae) + 1)})
+        for i, garage in enumerate(GARAGE_NAMES):
+            frame[f"{garage}_mae"] = self.mae[:, i]
+            frame[f"{garage}_rmse"] = self.rmse[:, i]
+        return frame
+
+
+def load_history(source: str, start: Optional[datetime] = None, end: Optional[datetime] = None) -> pd.DataFrame:
+    """Datapoints in [start, end) as date + occupancy fraction columns, oldest first"""
+    if source == "csv":
+        data = load_data()
+        data = data[["date"] + VALUE_COLUMNS].copy()
+    else:
+        # Everything before `end`; the storage API pages backwards from a timestamp
+        data = load_data_from_storage(end or datetime.now(), limit=10 ** 7)
+    data["date"] = pd.to_datetime(data["date"])
+    data = data.sort_values("date").reset_index(drop=True)
+    if start is not None:
+        data = data[data["date"] >= pd.Timestamp(start)]
+    if end is not None:
+        data = data[data["date"] < pd.Timestamp(end)]
+    return data.reset_index(drop=True)
+
+
+def select_origins(dates: np.ndarray, step: str, seq: int, horizon: int, max_gap: Optional[float]) -> np.ndarray:
+    """
+    Row indices to forecast from. Origin i uses rows i-seq..i-1 as input and rows i..i+horizon-1
+    as the actuals; every row is an origin for "10min", the first row of each hour for "hourly".
+    With max_gap (minutes), origins whose rows span a gap longer than that are skipped.
+    """
+    origins = np.arange(seq, len(dates) - horizon + 1)
+    if step == "hourly":
+        hours = dates.astype("datetime64[h]")
+        first_of_hour = np.r_[True, hours[1:] != hours[:-1]]
+        origins = origins[first_of_hour[origins]]
+    if max_gap is not None and len(origins):
+        gaps = np.diff(dates) > np.timedelta64(int(max_gap * 60), "s")
+        # gap_count[k] = number of gaps between rows 0..k
+        gap_count = np.r_[0, np.cumsum(gaps)]
+        origins = origins[gap_count[origins + horizon - 1] == gap_count[origins - seq]]
+    return origins
+
+
+def _windows(values: np.ndarray, size: int) -> np.ndarray:
+    # Strided (n, size, features) view, window k covers rows k..k+size-1
+    return sliding_window_view(values, size, axis=0).transpose(0, 2, 1)
+
+
+def run_backtest(
+    data: pd.DataFrame,
+    step: str = "hourly",
+    batch_size: int = 1024,
+    chunk_size: int = 8192,
+    max_gap: Optional[float] = 120,
+    model_set: Optional[ModelSet] = None,
+    min_history: int = 0
+) -> BacktestResult:
+    """
+    Forecast from every origin in `data` and score the forecasts against what happened.
+
+    Args:
+        data (pd.DataFrame): History from load_history
+        step (str): "10min" (every datapoint) or "hourly"
+        batch_size (int): Windows per model call
+        chunk_size (int): Origins featurized and scored at a time (bounds memory)
+        max_gap (float): Skip origins whose windows span a gap longer than this many minutes
+        model_set (ModelSet): Models to score, defaults to the current release at MODEL_PRECISION
+        min_history (int): Rows needed before an origin at least, to score several model sets on the same origins
+
+    Returns:
+        BacktestResult
+    """
+    total_start = time.perf_counter()
+    model_set = model_set or load_model_set(current_release())
+    scaler_long, scaler_short = model_set.scaler_long, model_set.scaler_short
+    if scaler_long is None or scaler_short is None:
+        raise RuntimeError("Backtesting needs the persisted scalers, train the models first")
+    long_models, short_models = model_set.long_models, model_set.short_models
+    long_seq = max(_model_seq(model) for model in long_models)
+    short_seq = max(_model_seq(model) for model in short_models)
+    horizon = LONG_FUTURE_STEPS
+
+    # Featurize and scale the whole history once
+    dates = data["date"].values.astype("datetime64[ns]")
+    raw = data[VALUE_COLUMNS].to_numpy(dtype=np.float64)
+    long_scaled = scale_rows(scaler_long, np.hstack([raw, lookup_features(dates)]))
+    short_scaled = scale_rows(scaler_short, raw)
+
+    # Origin i forecasts rows i..i+horizon-1 from the rows before it
+    seq = max(long_seq, short_seq, min_history)
+    origins = select_origins(dates, step, seq, horizon, max_gap)
+    if not len(origins):
+        raise ValueError("Not enough history for a single backtest origin")
+    long_windows = _windows(long_scaled, long_seq)
+    short_windows = _windows(short_scaled, short_seq)
+    targets = _windows(raw, horizon)
+
+    abs_sum = np.zeros((horizon, len(GARAGE_NAMES)))
+    sq_sum = np.zeros((horizon, len(GARAGE_NAMES)))
+    inference_seconds = 0.0
+    for chunk_start in range(0, len(origins), chunk_size):
+        chunk = origins[chunk_start:chunk_start + chunk_size]
+        # The window ending just before origin i starts at i - seq
+        long_batch = np.ascontiguousarray(long_windows[chunk - long_seq], dtype=np.float32)
+        short_batch = np.ascontiguousarray(short_windows[chunk - short_seq], dtype=np.float32)
+        start = time.perf_counter()
+        forecast = predict_batch(long_batch, short_batch, long_models, short_models, scaler_long, scaler_short, batch_size)
+        inference_seconds += time.perf_counter() - start
+
+        error = forecast - targets[chunk]
+        abs_sum += np.abs(error).sum(axis=0)
+        sq_sum += np.square(error).sum(axis=0)
+        print(f"Backtested {min(chunk_start + chunk_size, len(origins))}/{len(origins)} origins")
+
+    return BacktestResult(
+        origins=len(origins),
+        mae=abs_sum / len(origins),
+        rmse=np.sqrt(sq_sum / len(origins)),
+        inference_seconds=inference_seconds,
+        total_seconds=time.perf_counter() - total_start
+    )
+
+
+def print_report(result: BacktestResult, report_steps: List[int] = REPORT_STEPS) -> None:
+    print(f"\n{result.origins} origins, {result.forecasts_per_second:.0f} forecasts/s "
+          f"({result.inference_seconds:.1f}s inference, {result.total_seconds:.1f}s total)\n")
+    print(f"{'garage':<14}{'MAE':>8}{'RMSE':>8}")
+    for i, garage in enumerate(GARAGE_NAMES):
+        print(f"{garage:<14}{result.garage_mae()[i]:>8.4f}{result.garage_rmse()[i]:>8.4f}")
+
+    print("\nMAE by horizon step (~10 min each)")
+    print(f"{'step':>6}" + "".join(f"{garage:>14}" for garage in GARAGE_NAMES))
+    for step in report_steps:
+        if step <= len(result.mae):
+            print(f"{step:>6}" + "".join(f"{value:>14.4f}" for value in result.mae[step - 1]))
+
+
+def compare_layouts(data: pd.DataFrame, layouts: List[str], precision: str, step: str, batch_size: int, max_gap: Optional[float]) -> None:
+    """Backtest the live per-garage and joint models on the same origins and compare error, speed and size"""
+    model_sets = [load_model_set(None, precision, layout) for layout in layouts]
+    min_history = max(_model_seq(model) for model_set in model_sets for model in model_set.long_models + model_set.short_models)
+    results = [run_backtest(data, step, batch_size, max_gap=max_gap, model_set=model_set, min_history=min_history) for model_set in model_sets]
+
+    print(f"\n{'garage':<14}" + "".join(f"{layout + ' MAE':>18}" for layout in layouts))
+    for i, garage in enumerate(GARAGE_NAMES):
+        print(f"{garage:<14}" + "".join(f"{result.garage_mae()[i]:>18.4f}" for result in results))
+    print(f"{'forecasts/s':<14}" + "".join(f"{result.forecasts_per_second:>18.0f}" for result in results))
+    # A joint model fills all four garage slots, count it once
+    parameters = [
+        sum(model.count_params() for model in {id(model): model for model in model_set.long_models + model_set.short_models}.values())
+        if precision == "float32" else None
+        for model_set in model_sets
+    ]
+    if None not in parameters:
+        print(f"{'parameters':<14}" + "".join(f"{count:>18,}" for count in parameters))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the forecasting models")
+    parser.add_argument("--source", choices=["csv", "storage"], default="csv", help="log.csv or the configured storage backend")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="First datapoint used (ISO date)")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="Datapoints before this are used (ISO date)")
+    parser.add_argument("--step", choices=["10min", "hourly"], default="hourly", help="Origin spacing")
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--max-gap", type=float, default=120, help="Skip origins spanning a gap longer than this (minutes)")
+    parser.add_argument("--output", type=Path, help="Write the per-horizon metrics to this CSV")
+    parser.add_argument("--precision", choices=PRECISIONS, default=MODEL_PRECISION, help="Backtest a quantized variant (see quantize.py)")
+    parser.add_argument("--compare-layouts", action="store_true", help="Compare the live per-garage and joint models")
+    args = parser.parse_args()
+
+    data = load_history(args.source, args.start, args.end)
+    if args.compare_layouts:
+        compare_layouts(data, LAYOUTS, args.precision, args.step, args.batch_size, args.max_gap)
+        return
+    model_set = load_model_set(current_release(), args.precision)
+    result = run_backtest(data, args.step, args.batch_size, max_gap=args.max_gap, model_set=model_set)
+    print_report(result)
+    if args.output:
+        result.horizon_frame().to_csv(args.output, index=False)
+        print(f"\nWrote per-horizon metrics to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Memory and throughput benchmark for the training sequence builders.
+
+Compares the old list-of-slices create_sequences against strided views and the
+tf.data window pipeline, on synthetic data shaped like the long model input:
+    python -m data.forecasting.benchmarks.sequence_builder --rows 25000 --features 20
+
+Each variant runs in its own process so its peak RSS can be reported on its own.
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.append(str(project_root))
+
+import numpy as np
+
+from data.forecasting.constants import LONG_SEQ, LONG_FUTURE_STEPS
+
+VARIANTS = ["legacy", "strided", "tf.data"]
+
+
+def legacy_create_sequences(data, seq_size, future_steps):
+    # The builder short_term_model/long_term_model used before sequences.py
+    X, y = [], []
+    for i in range(len(data) - seq_size - future_steps + 1):
+        X.append(data[i:i + seq_size])
+        y.append(data[i + seq_size:i + seq_size + future_steps])
+    return np.array(X), np.array(y)
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_variant(variant: str, rows: int, features: int, seq_size: int, future_steps: int, batch_size: int) -> dict:
+    # Imported up front (for every variant) so TensorFlow's own import cost isn't counted
+    from data.forecasting.sequences import sliding_windows, make_window_dataset
+    data = np.random.default_rng(0).random((rows, features))
+    baseline = _peak_rss_mb()
+    start = time.perf_counter()
+    checksum = 0.0
+    windows = 0
+
+    if variant == "legacy":
+        X, Y = legacy_create_sequences(data, seq_size, future_steps)
+        build_time = time.perf_counter() - start
+        for i in range(0, len(X), batch_size):
+            checksum += float(X[i:i + batch_size, -1, 0].sum() + Y[i:i + batch_size, -1, 0].sum())
+        windows = len(X)
+    elif variant == "strided":
+        X, Y = sliding_windows(data, seq_size, future_steps)
+        build_time = time.perf_counter() - start
+        for i in range(0, len(X), batch_size):
+            x = np.asarray(X[i:i + batch_size], dtype=np.float32)
+            y = np.asarray(Y[i:i + batch_size], dtype=np.float32)
+            checksum += float(x[:, -1, 0].sum() + y[:, -1, 0].sum())
+        windows = len(X)
+    elif variant == "tf.data":
+        dataset = make_window_dataset(data, seq_size, future_steps, batch_size, shuffle=True, seed=0)
+        build_time = time.perf_counter() - start
+        for x, y in dataset:
+            checksum += float(x[:, -1, 0].numpy().sum() + y[:, -1, 0].numpy().sum())
+            windows += int(x.shape[0])
+    else:
+        raise ValueError(f"Invalid variant: {variant}")
+
+    elapsed = time.perf_counter() - start
+    return {
+        "variant": variant,
+        "windows": windows,
+        "build_s": build_time,
+        "epoch_s": elapsed,
+        "windows_per_s": windows / elapsed if elapsed else float("inf"),
+        "peak_rss_mb": _peak_rss_mb(),
+        "added_rss_mb": _peak_rss_mb() - baseline,
+        "checksum": round(checksum, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the training sequence builders")
+    parser.add_argument("--rows", type=int, default=25000)
+    parser.add_argument("--features", type=int, default=20)
+    parser.add_argument("--seq", type=int, default=LONG_SEQ)
+    parser.add_argument("--future", type=int, default=LONG_FUTURE_STEPS)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--variant", choices=VARIANTS, help="Run a single variant in this process")
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.rows, args.features, args.seq, args.future, args.batch_size)))
+        return
+
+    print(f"{'variant':<10}{'windows':>10}{'build s':>10}{'epoch s':>10}{'windows/s':>12}{'peak MB':>10}{'added MB':>10}")
+    for variant in VARIANTS:
+        command = [
+            sys.executable, "-m", "data.forecasting.benchmarks.sequence_builder",
+            "--variant", variant, "--rows", str(args.rows), "--features", str(args.features),
+            "--seq", str(args.seq), "--future", str(args.future), "--batch-size", str(args.batch_size)
+        ]
+        completed = subprocess.run(command, capture_output=True, text=True, cwd=project_root)
+        if completed.returncode != 0:
+            print(f"{variant:<10} failed: {completed.stderr.strip().splitlines()[-1:]}")
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        print(
+            f"{variant:<10}{result['windows']:>10}{result['build_s']:>10.2f}{result['epoch_s']:>10.2f}"
+            f"{result['windows_per_s']:>12.0f}{result['peak_rss_mb']:>10.0f}{result['added_rss_mb']:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,11 @@ EVENTS_DIRECTORY = DATA_DIR / "events"
 
 # ── CONSTANTS ───────────────────────────────────────────────────────────────────
 GARAGE_NAMES = ["south", "west", "north", "south_campus"]
+# Name of the one model per kind that forecasts every garage (long_model_joint, short_model_joint)
+JOINT_MODEL = "joint"
+
+# Number of recent datapoints kept in memory for building inference windows
+RECENT_BUFFER_SIZE = 1000
 
 
 # ── TRAINING CONSTANTS ───────────────────────────────────────────────────────────
@@ -22,6 +27,14 @@ LONG_FUTURE_STEPS = 196
 SHORT_SEQ = 16
 SHORT_FUTURE_STEPS = 16
 
+# Training run settings shared by the long and short models
+LONG_TRAINING_EPOCHS = 10
+SHORT_TRAINING_EPOCHS = 25
+TRAINING_BATCH_SIZE = 32
+TRAINING_SPLIT = 0.8
+# Most recent datapoints used to build a training dataset
+TRAINING_ROWS = 25000
+
 ENABLE_TIME_ENCODING: bool          = True
 ENABLE_INSTR_DAY: bool              = True
 ENABLE_INSTR_NEXT_DAY: bool         = True
@@ -1,5 +1,4 @@
 
-import os
 import sys
 from pathlib import Path
 
@@ -10,18 +9,16 @@ sys.path.append(str(project_root))
 import numpy as np
 import pandas as pd
 from sklearn.preprocessing import MinMaxScaler
-from datetime import datetime
-from pymongo import MongoClient
-from dotenv import load_dotenv
+from datetime import datetime, timedelta
+from typing import Optional
 
 from data.forecasting.constants import (
         LOGS_DIRECTORY,
         EVENTS_DIRECTORY 
     )
-
-
-load_dotenv()
-MONGO_URI = os.environ.get("MONGO_URI")
+from data.forecasting.datapoint_buffer import DATAPOINT_BUFFER
+from data.forecasting.feature_store import feature_columns, lookup_features
+from data.storage import get_storage, run_sync
 
 
 # Load and preprocess log.csv data
@@ -31,20 +28,7 @@ def load_data() -> pd.DataFrame:
     print("\n", data.head(), "\n")
     return data
 
-def load_data_from_mongodb(forecast_start: datetime, limit: int = 1000) -> pd.DataFrame:
-    client = MongoClient(MONGO_URI)
-    db = client["sjparking"]
-    collection = db["datapoints"]
-
-    # Get the 1000 most recent datapoints before forecast_start, sorted descending
-    cursor = collection.find(
-        {"timestamp": {"$lt": forecast_start}, "metadata": "sjparking"}
-    ).sort("timestamp", -1).limit(limit)
-    docs = list(cursor)
-    if not docs:
-        raise ValueError("No data loaded from MongoDB for the requested range!")
-    # Reverse to chronological order (oldest to newest)
-    docs = docs[::-1]
+def _datapoints_to_frame(docs) -> pd.DataFrame:
     df = pd.DataFrame(docs)
     # Rename columns to match CSV
     df.rename(columns={
@@ -54,16 +38,48 @@ def load_data_from_mongodb(forecast_start: datetime, limit: int = 1000) -> pd.Da
         "north_status": "north",
         "south_campus_status": "south campus"  # <-- match CSV
     }, inplace=True)
-    df = df.drop(columns=["_id", "metadata"])
+    df = df.drop(columns=["metadata"])
     # Scale integer columns to 0.00–1.00
     for col in ["south", "west", "north", "south campus"]:
         df[col] = df[col] / 100.0
     # Reorder columns to match CSV
-    df = df[["date", "south", "west", "north", "south campus"]]
-    print("\nMongoDB data range:", df['date'].min(), "to", df['date'].max(), "\n")
+    return df[["date", "south", "west", "north", "south campus"]]
+
+def load_data_from_storage(forecast_start: datetime, limit: int = 1000) -> pd.DataFrame:
+    storage = get_storage()
+
+    # Get the 1000 most recent datapoints before forecast_start, in chronological order
+    docs = run_sync(storage.get_recent_datapoints(forecast_start, limit))
+    if not docs:
+        raise ValueError("No data loaded from storage for the requested range!")
+    df = _datapoints_to_frame(docs)
+    print("\nStorage data range:", df['date'].min(), "to", df['date'].max(), "\n")
     print("\n", df.head(), "\n")
     return df
 
+def load_data_since(after: datetime, context: int = 0, end: Optional[datetime] = None) -> pd.DataFrame:
+    """
+    Get the datapoints with after < timestamp < end, preceded by the `context` datapoints
+    at or before `after` (so windows can start right after it), oldest first.
+    """
+    storage = get_storage()
+    start = after + timedelta(microseconds=1)
+    docs = run_sync(storage.get_recent_datapoints(start, context)) if context else []
+    docs += run_sync(storage.get_datapoints(start, end or datetime.now()))
+    if not docs:
+        raise ValueError("No data loaded from storage for the requested range!")
+    return _datapoints_to_frame(docs)
+
+def load_recent_data(forecast_start: datetime, limit: int = 1000) -> pd.DataFrame:
+    """
+    Get the `limit` datapoints before forecast_start, from the in-memory ring buffer
+    when it covers the range, otherwise from storage.
+    """
+    data = DATAPOINT_BUFFER.to_frame(forecast_start, limit)
+    if data is not None and len(data):
+        return data
+    return load_data_from_storage(forecast_start, limit)
+
 # Load the instruction days CSV and prepare it
 def add_instruction_days(data: pd.DataFrame) -> pd.DataFrame:
     global extra_long_data
@@ -144,4 +160,18 @@ def add_event_impact_features(data: pd.DataFrame) -> pd.DataFrame:
     data['time_since_event'] = data['time_since_event'].fillna(0)
 
     data.drop(columns=['upcoming_event_time', 'past_event_time'], inplace=True)
-    return data
\ No newline at end of file
+    return data
+
+def add_calendar_features(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the instruction-day, cyclical time and event features enabled by the ENABLE_* flags.
+    Same columns as add_instruction_days/add_cyclical_time_encoding/add_event_impact_features,
+    looked up from the precomputed feature store instead of re-reading and merging the CSVs.
+    """
+    data = data.copy()
+    data['date'] = pd.to_datetime(data['date'])
+    columns = feature_columns()
+    features = lookup_features(data['date'].values, columns)
+    for i, column in enumerate(columns):
+        data[column] = features[:, i]
+    return data
@@ -0,0 +1,150 @@
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data.forecasting.constants import RECENT_BUFFER_SIZE
+from data.forecasting.time_grid import TimeGrid
+from data.storage import STATUS_FIELDS
+
+# Column names used by the forecasting code (same as log.csv)
+VALUE_COLUMNS = ["south", "west", "north", "south campus"]
+
+
+class DatapointBuffer:
+    """
+    Fixed-size ring buffer of the most recent datapoints, stored as NumPy arrays.
+
+    Every row is written twice (at i and i + capacity), so the last n rows are always
+    one contiguous slice and windows can be taken without copying or wrapping.
+    Occupancy values are stored as fractions (0.00–1.00) like the model inputs.
+    """
+
+    def __init__(self, capacity: int = RECENT_BUFFER_SIZE):
+        self.capacity = capacity
+        self._timestamps = np.zeros(2 * capacity, dtype="datetime64[ns]")
+        self._values = np.zeros((2 * capacity, len(STATUS_FIELDS)), dtype=np.float64)
+        self._next = 0      # write position in [0, capacity)
+        self._size = 0      # number of valid rows
+        self._dropped = False  # True once rows have been overwritten
+        self.generation = 0    # bumped whenever the contents are replaced
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def latest_timestamp(self) -> Optional[datetime]:
+        with self._lock:
+            if not self._size:
+                return None
+            return pd.Timestamp(self._timestamps[self._next + self.capacity - 1]).to_pydatetime()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._next = 0
+            self._size = 0
+            self._dropped = False
+            self.generation += 1
+
+    def fill(self, docs: Iterable[Dict[str, Any]]) -> int:
+        """Replace the buffer contents with the given datapoints (oldest first)"""
+        self.clear()
+        return self.extend(docs)
+
+    def extend(self, docs: Iterable[Dict[str, Any]]) -> int:
+        """
+        Append datapoints (oldest first). Datapoints that aren't newer than the latest
+        buffered one are skipped, so re-sending the same rows is harmless.
+
+        Returns:
+            int: Number of datapoints appended
+        """
+        appended = 0
+        with self._lock:
+            for doc in docs:
+                timestamp = np.datetime64(doc["timestamp"], "ns")
+                if self._size and timestamp <= self._timestamps[self._next + self.capacity - 1]:
+                    continue
+                row = [doc[field] / 100.0 for field in STATUS_FIELDS]
+                for position in (self._next, self._next + self.capacity):
+                    self._timestamps[position] = timestamp
+                    self._values[position] = row
+                self._next = (self._next + 1) % self.capacity
+                if self._size == self.capacity:
+                    self._dropped = True
+                else:
+                    self._size += 1
+                appended += 1
+        return appended
+
+    def window(self, before: datetime, n: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Get the last n rows with timestamp < before.
+
+        Returns:
+            (timestamps, values) copies, or None if the buffer can't answer without the database
+        """
+        with self._lock:
+            end = self._next + self.capacity
+            start = end - self._size
+            timestamps = self._timestamps[start:end]
+            cut = start + int(np.searchsorted(timestamps, np.datetime64(before, "ns"), side="left"))
+            available = cut - start
+            # A full buffer may hold only the newest rows of storage (filled, or older rows
+            # overwritten), so a short window would silently miss data
+            if available < n and (self._size == self.capacity or available == 0):
+                return None
+            lo = max(start, cut - n)
+            return self._timestamps[lo:cut].copy(), self._values[lo:cut].copy()
+
+    def since(self, after: Optional[np.datetime64]) -> Tuple[np.ndarray, np.ndarray, bool]:
+        """
+        Get every row with timestamp > after (all rows if after is None).
+
+        Returns:
+            (timestamps, values, complete) copies, complete is False if rows after `after`
+            were already overwritten
+        """
+        with self._lock:
+            end = self._next + self.capacity
+            start = end - self._size
+            if after is None:
+                return self._timestamps[start:end].copy(), self._values[start:end].copy(), not self._dropped
+            cut = start + int(np.searchsorted(self._timestamps[start:end], after, side="right"))
+            complete = cut > start or not self._dropped
+            return self._timestamps[cut:end].copy(), self._values[cut:end].copy(), complete
+
+    def grid(self, start: datetime, end: datetime) -> Optional[TimeGrid]:
+        """
+        Buffered rows with start <= timestamp < end on the regular time grid (values in percent, like storage).
+
+        Returns:
+            TimeGrid, or None if the buffer may not hold every row after `start`
+        """
+        with self._lock:
+            end_position = self._next + self.capacity
+            timestamps = self._timestamps[end_position - self._size:end_position]
+            # A full buffer may have been filled with only the newest rows of storage
+            if not self._size or (self._size == self.capacity and timestamps[0] >= np.datetime64(start, "ns")):
+                return None
+            # Stored as fractions of the integer percentages, rint recovers them exactly
+            values = np.rint(self._values[end_position - self._size:end_position] * 100)
+            timestamps = timestamps.copy()
+        return TimeGrid.from_arrays(timestamps, values, start, end)
+
+    def to_frame(self, before: datetime, n: int) -> Optional[pd.DataFrame]:
+        """Same as window() but shaped like load_data_from_storage()"""
+        result = self.window(before, n)
+        if result is None:
+            return None
+        timestamps, values = result
+        df = pd.DataFrame(values, columns=VALUE_COLUMNS)
+        df.insert(0, "date", pd.to_datetime(timestamps))
+        return df
+
+
+# Process-wide buffer, filled once at startup and appended to as datapoints arrive
+DATAPOINT_BUFFER = DatapointBuffer()
@@ -0,0 +1,213 @@
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data.forecasting.constants import (
+    LOGS_DIRECTORY,
+    EVENTS_DIRECTORY,
+    ENABLE_TIME_ENCODING,
+    ENABLE_INSTR_DAY,
+    ENABLE_EVENT_ENCODING
+)
+
+INSTRUCTION_DAYS_PATH = LOGS_DIRECTORY / "sjsu_instruction_days.csv"
+EVENTS_PATH = EVENTS_DIRECTORY / "sjsu_home_games.csv"
+
+GRID_STEP = np.timedelta64(10, "m")
+
+# Column groups in the same order add_instruction_days/add_cyclical_time_encoding/add_event_impact_features add them
+INSTRUCTION_COLUMNS = ["instruction_day", "next_day_instruction"]
+TIME_COLUMNS = [
+    "month_sin", "month_cos", "day_sin", "day_cos", "day_of_week_sin", "day_of_week_cos",
+    "hour_sin", "hour_cos", "minute_sin", "minute_cos"
+]
+EVENT_COLUMNS = ["upcoming_event_type", "time_until_event", "past_event_type", "time_since_event"]
+ALL_COLUMNS = INSTRUCTION_COLUMNS + TIME_COLUMNS + EVENT_COLUMNS
+
+_MINUTE = ALL_COLUMNS.index("minute_sin")
+_UNTIL = ALL_COLUMNS.index("time_until_event")
+_SINCE = ALL_COLUMNS.index("time_since_event")
+_UPCOMING_TYPE = ALL_COLUMNS.index("upcoming_event_type")
+_PAST_TYPE = ALL_COLUMNS.index("past_event_type")
+
+
+def feature_columns() -> List[str]:
+    """Names of the calendar features enabled by the ENABLE_* flags, in model input order"""
+    columns = []
+    if ENABLE_INSTR_DAY:
+        columns += INSTRUCTION_COLUMNS
+    if ENABLE_TIME_ENCODING:
+        columns += TIME_COLUMNS
+    if ENABLE_EVENT_ENCODING:
+        columns += EVENT_COLUMNS
+    return columns
+
+
+class FeatureStore:
+    """
+    Calendar, cyclical time and event-proximity features precomputed on a dense
+    10-minute grid covering the academic calendar and the event schedule.
+
+    Every feature depends only on the timestamp, so featurizing a window is an index
+    lookup into the grid. Values match the pandas add_* functions in data_functions.
+    """
+
+    def __init__(self, instruction_days: pd.DataFrame, events: pd.DataFrame):
+        days = instruction_days.drop_duplicates("Date", keep="first")
+        self._instr_dates = pd.to_datetime(days["Date"]).values.astype("datetime64[D]")
+        order = np.argsort(self._instr_dates, kind="stable")
+        self._instr_dates = self._instr_dates[order]
+        self._instr_flags = days["Instruction_Day"].astype(bool).values[order]
+
+        # Same (default) sort as add_event_impact_features so simultaneous events tie-break identically
+        events = events.sort_values("Time")
+        self._event_times = pd.to_datetime(events["Time"]).values.astype("datetime64[ns]")
+        self._event_types = events["Sport"].astype(np.float64).values
+
+        bounds = [self._instr_dates.min(), self._instr_dates.max() + 2] if len(self._instr_dates) else []
+        if len(self._event_times):
+            bounds += [self._event_times.min(), self._event_times.max() + np.timedelta64(1, "D")]
+        if bounds:
+            self.start = np.datetime64(min(bounds), "D").astype("datetime64[ns]")
+            end = np.datetime64(max(bounds), "D").astype("datetime64[ns]")
+        else:
+            self.start = end = np.datetime64(0, "ns")
+        grid = np.arange(self.start, end, GRID_STEP)
+        self.grid = compute_features(grid, self)
+
+    def __len__(self) -> int:
+        return len(self.grid)
+
+    def lookup(self, timestamps) -> np.ndarray:
+        """
+        Featurize timestamps.
+
+        Returns:
+            (n, len(ALL_COLUMNS)) float64 array
+        """
+        ts = np.asarray(timestamps, dtype="datetime64[ns]")
+        slots = (ts - self.start) // GRID_STEP
+        in_grid = (slots >= 0) & (slots < len(self.grid))
+        out = np.empty((len(ts), len(ALL_COLUMNS)), dtype=np.float64)
+        if not in_grid.all():
+            out[~in_grid] = compute_features(ts[~in_grid], self)
+
+        slots = slots[in_grid]
+        rows = self.grid[slots]
+        offset = (ts[in_grid] - (self.start + slots * GRID_STEP)) / np.timedelta64(60, "s")
+        # Only the minute and the event distances change inside a 10-minute slot
+        minute = _minute_of_hour(ts[in_grid])
+        rows[:, _MINUTE] = np.sin(2 * np.pi * (minute / 60))
+        rows[:, _MINUTE + 1] = np.cos(2 * np.pi * (minute / 60))
+        has_upcoming = rows[:, _UPCOMING_TYPE] != -1
+        has_past = rows[:, _PAST_TYPE] != -1
+        rows[has_upcoming, _UNTIL] -= offset[has_upcoming]
+        rows[has_past, _SINCE] += offset[has_past]
+        # An event inside the slot (before the timestamp) changes which events are upcoming/past
+        passed = has_upcoming & (offset > 0) & (rows[:, _UNTIL] <= 0)
+        if passed.any():
+            rows[passed] = compute_features(ts[in_grid][passed], self)
+        out[in_grid] = rows
+        return out
+
+    def instruction_flags(self, days: np.ndarray) -> np.ndarray:
+        if not len(self._instr_dates):
+            return np.zeros(len(days), dtype=np.float64)
+        index = np.clip(np.searchsorted(self._instr_dates, days), 0, len(self._instr_dates) - 1)
+        found = self._instr_dates[index] == days
+        return (found & self._instr_flags[index]).astype(np.float64)
+
+
+def _minute_of_hour(ts: np.ndarray) -> np.ndarray:
+    return ((ts - ts.astype("datetime64[h]")) // np.timedelta64(1, "m")).astype(np.float64)
+
+
+def compute_features(ts: np.ndarray, store: FeatureStore) -> np.ndarray:
+    """Compute every feature column directly from the timestamps (no grid)"""
+    out = np.zeros((len(ts), len(ALL_COLUMNS)), dtype=np.float64)
+    if not len(ts):
+        return out
+    days = ts.astype("datetime64[D]")
+    out[:, 0] = store.instruction_flags(days)
+    out[:, 1] = store.instruction_flags(days + 1)
+
+    month = ts.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    day = (days - ts.astype("datetime64[M]").astype("datetime64[D]")).astype(np.int64) + 1
+    day_of_week = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday, Monday = 0
+    hour = ((ts - days) // np.timedelta64(1, "h")).astype(np.int64)
+    minute = _minute_of_hour(ts)
+    out[:, 2] = np.sin(2 * np.pi * ((month - 1) / 12))
+    out[:, 3] = np.cos(2 * np.pi * ((month - 1) / 12))
+    out[:, 4] = np.sin(2 * np.pi * (day / 31))
+    out[:, 5] = np.cos(2 * np.pi * (day / 31))
+    out[:, 6] = np.sin(2 * np.pi * (day_of_week / 7))
+    out[:, 7] = np.cos(2 * np.pi * (day_of_week / 7))
+    out[:, 8] = np.sin(2 * np.pi * (hour / 24))
+    out[:, 9] = np.cos(2 * np.pi * (hour / 24))
+    out[:, 10] = np.sin(2 * np.pi * (minute / 60))
+    out[:, 11] = np.cos(2 * np.pi * (minute / 60))
+
+    # Same matches as merge_asof: first event at or after, last event at or before
+    event_times = store._event_times
+    out[:, _UPCOMING_TYPE] = out[:, _PAST_TYPE] = -1
+    if len(event_times):
+        upcoming = np.searchsorted(event_times, ts, side="left")
+        has_upcoming = upcoming < len(event_times)
+        index = upcoming[has_upcoming]
+        out[has_upcoming, _UPCOMING_TYPE] = store._event_types[index]
+        out[has_upcoming, _UNTIL] = (event_times[index] - ts[has_upcoming]) / np.timedelta64(60, "s")
+
+        past = np.searchsorted(event_times, ts, side="right") - 1
+        has_past = past >= 0
+        index = past[has_past]
+        out[has_past, _PAST_TYPE] = store._event_types[index]
+        out[has_past, _SINCE] = (ts[has_past] - event_times[index]) / np.timedelta64(60, "s")
+    return out
+
+
+# ── PROCESS-WIDE STORE ──────────────────────────────────────────────────────────
+_store: Optional[FeatureStore] = None
+_store_signature: Optional[Tuple] = None
+_store_lock = threading.Lock()
+
+
+def _source_signature() -> Tuple:
+    signature = []
+    for path in (INSTRUCTION_DAYS_PATH, EVENTS_PATH):
+        stat = os.stat(path)
+        signature.append((str(path), stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def get_feature_store() -> FeatureStore:
+    """Get the feature store, rebuilding it only when one of the source CSVs changed"""
+    global _store, _store_signature
+    signature = _source_signature()
+    with _store_lock:
+        if _store is None or signature != _store_signature:
+            _store = FeatureStore(
+                pd.read_csv(INSTRUCTION_DAYS_PATH),
+                pd.read_csv(EVENTS_PATH)
+            )
+            _store_signature = signature
+            print(f"Built calendar feature store with {len(_store)} rows")
+        return _store
+
+
+def lookup_features(timestamps, columns: Optional[List[str]] = None) -> np.ndarray:
+    """
+    Get the calendar features of each timestamp.
+
+    Args:
+        timestamps: Array-like of timestamps
+        columns (List[str]): Feature names to return, defaults to the enabled ones
+
+    Returns:
+        (n, len(columns)) float64 array
+    """
+    columns = feature_columns() if columns is None else columns
+    features = get_feature_store().lookup(timestamps)
+    return features[:, [ALL_COLUMNS.index(column) for column in columns]]
@@ -0,0 +1,216 @@
+"""
+Warm-start fine-tuning of the per-garage models on the data since they were last trained.
+
+Each model loads its current weights and trains a few epochs on only the datapoints
+newer than its training watermark (training_state.json), optionally with its first
+LSTM layers frozen. The persisted scalers are kept as they are. New weights are
+accepted only if they beat the current weights on the newest slice of that data.
+Accepted weights are kept as a new version in keras_models/versions and replace the
+live weights file atomically.
+
+    python -m data.forecasting.fine_tune                          # all eight models
+    python -m data.forecasting.fine_tune --kinds long --freeze 2 --epochs 5
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from tensorflow import keras
+from keras import Model
+
+from data.forecasting.constants import (
+    MODEL_DIRECTORY,
+    GARAGE_NAMES,
+    JOINT_MODEL,
+    LONG_FUTURE_STEPS,
+    SHORT_FUTURE_STEPS,
+    TRAINING_BATCH_SIZE
+)
+from data.forecasting.data_functions import load_data_since
+from data.forecasting.datapoint_buffer import VALUE_COLUMNS
+from data.forecasting.feature_store import feature_columns, lookup_features
+from data.forecasting.keras_model_file import save_weights_atomic
+from data.forecasting.model_registry import LAYOUTS, MODEL_LAYOUT, publish_release
+from data.forecasting.sequences import make_window_dataset, window_count
+from data.forecasting.streaming_features import scale_rows
+from data.forecasting.training_data import MODEL_KINDS
+from data.forecasting.training_state import (
+    VERSIONS_DIRECTORY,
+    get_watermark,
+    model_state,
+    record_training,
+    versioned_name
+)
+from data.forecasting.predict_future_times_individual_garage import (
+    _build_long_model,
+    _build_short_model,
+    _garage_no,
+    _load_scalers,
+    _model_seq,
+    _scalers_persisted
+)
+
+FINE_TUNE_EPOCHS = 3
+FUTURE_STEPS = {"long": LONG_FUTURE_STEPS, "short": SHORT_FUTURE_STEPS}
+
+
+def freeze_lstm_layers(model: Model, count: int) -> int:
+    """
+    Freeze the first `count` LSTM layers (with their BatchNormalization) so only the
+    later layers adapt to the new data.
+
+    Returns:
+        int: Number of LSTM layers frozen
+    """
+    frozen = 0
+    for layer in model.layers:
+        if isinstance(layer, keras.layers.LSTM):
+            if frozen == count:
+                break
+            frozen += 1
+        if frozen and isinstance(layer, (keras.layers.LSTM, keras.layers.BatchNormalization)):
+            layer.trainable = False
+    return frozen
+
+
+def _recompile(model: Model, learning_rate: float) -> None:
+    # Needed after changing `trainable`; the loss (which garage is scored) stays the same
+    model.compile(
+        loss=model.loss,
+        optimizer=keras.optimizers.Lion(learning_rate=learning_rate),
+        metrics=[tf.keras.metrics.MeanSquaredError()])
+
+
+def prepare_fine_tune_data(
+    kind: str, watermark: datetime, seq_size: int, validation_split: float
+) -> Optional[Tuple[np.ndarray, np.ndarray, datetime, int]]:
+    """
+    Scaled rows since `watermark` (plus the context rows windows need), split in time.
+
+    Returns:
+        (train rows, validation rows, new watermark, new datapoints), or None without enough new data
+    """
+    future_steps = FUTURE_STEPS[kind]
+    data = load_data_since(watermark, context=seq_size + future_steps - 1)
+    dates = pd.to_datetime(data["date"]).values
+    new_rows = int((dates > np.datetime64(watermark, "ns")).sum())
+
+    scaler_long, scaler_short = _load_scalers()
+    raw = data[VALUE_COLUMNS].to_numpy(dtype=np.float64)
+    if kind == "long":
+        values = scale_rows(scaler_long, np.hstack([raw, lookup_features(dates, feature_columns())]))
+    else:
+        values = scale_rows(scaler_short, raw)
+
+    # Validation windows have targets only in the newest rows, training windows only before them
+    val_rows = max(int(new_rows * validation_split), future_steps)
+    split = len(values) - val_rows
+    train_values, val_values = values[:split], values[split - seq_size:]
+    if window_count(len(train_values), seq_size, future_steps) < 1 or window_count(len(val_values), seq_size, future_steps) < 1:
+        return None
+    return train_values, val_values, pd.Timestamp(dates[-1]).to_pydatetime(), new_rows
+
+
+def fine_tune_model(
+    kind: str,
+    garage: str,
+    epochs: int = FINE_TUNE_EPOCHS,
+    freeze: int = 0,
+    learning_rate_scale: float = 0.1,
+    batch_size: int = TRAINING_BATCH_SIZE,
+    validation_split: float = 0.2
+) -> Dict[str, object]:
+    """
+    Fine-tune one model from its current weights.
+
+    Args:
+        freeze (int): Number of leading LSTM layers to freeze
+        learning_rate_scale (float): Fine-tuning learning rate as a fraction of the model's own
+
+    Returns:
+        Dict with the outcome ("improved", "kept", "skipped"), losses and the new version
+    """
+    name = f"{kind}_model_{garage}"
+    weights_path = MODEL_DIRECTORY / f"{name}.weights.h5"
+    watermark = get_watermark(name)
+    if watermark is None or not weights_path.exists():
+        print(f"No weights for {name}, train it with train_all.py first")
+        return {"model": name, "outcome": "skipped"}
+
+    garage_no = _garage_no(garage)
+    feature_dim = len(VALUE_COLUMNS) + (len(feature_columns()) if kind == "long" else 0)
+    model = _build_long_model(garage_no, feature_dim) if kind == "long" else _build_short_model(garage_no, feature_dim)
+    model.load_weights(weights_path)
+    seq_size = _model_seq(model)
+
+    prepared = prepare_fine_tune_data(kind, watermark, seq_size, validation_split)
+    if prepared is None:
+        print(f"Not enough data since {watermark} to fine-tune {name}")
+        return {"model": name, "outcome": "skipped"}
+    train_values, val_values, new_watermark, new_rows = prepared
+    train_dataset = make_window_dataset(train_values, seq_size, FUTURE_STEPS[kind], batch_size, shuffle=True)
+    val_dataset = make_window_dataset(val_values, seq_size, FUTURE_STEPS[kind], batch_size)
+
+    baseline = model.evaluate(val_dataset, verbose=0, return_dict=True)["loss"]
+    frozen = freeze_lstm_layers(model, freeze)
+    _recompile(model, float(model.optimizer.learning_rate.numpy()) * learning_rate_scale)
+    print(f"Fine-tuning {name} on {new_rows} new datapoints since {watermark} ({frozen} LSTM layers frozen)")
+    model.fit(train_dataset, validation_data=val_dataset, epochs=epochs, verbose=0)
+    tuned = model.evaluate(val_dataset, verbose=0, return_dict=True)["loss"]
+
+    result = {"model": name, "baseline_val_loss": baseline, "val_loss": tuned, "new_rows": new_rows}
+    if not tuned < baseline:
+        # Keep the old watermark, so the next run sees this data again plus whatever arrives
+        print(f"{name}: val_loss {baseline:.5f} -> {tuned:.5f}, keeping the current weights")
+        return {**result, "outcome": "kept"}
+
+    version = model_state(name).get("version", 0) + 1
+    save_weights_atomic(model, versioned_name(name, version), VERSIONS_DIRECTORY)
+    save_weights_atomic(model, name)
+    record_training(name, new_watermark, tuned, version, mode="fine-tune")
+    print(f"{name}: val_loss {baseline:.5f} -> {tuned:.5f}, saved version {version}")
+    return {**result, "outcome": "improved", "version": version}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fine-tune the forecasting models on data since their last training")
+    parser.add_argument("--kinds", nargs="+", choices=MODEL_KINDS, default=MODEL_KINDS)
+    parser.add_argument("--garages", nargs="+", choices=GARAGE_NAMES, default=GARAGE_NAMES)
+    parser.add_argument("--layout", choices=LAYOUTS, default=MODEL_LAYOUT, help="Fine-tune the per-garage models or the joint ones")
+    parser.add_argument("--epochs", type=int, default=FINE_TUNE_EPOCHS)
+    parser.add_argument("--freeze", type=int, default=0, help="Leading LSTM layers to freeze")
+    parser.add_argument("--learning-rate-scale", type=float, default=0.1)
+    parser.add_argument("--batch-size", type=int, default=TRAINING_BATCH_SIZE)
+    parser.add_argument("--validation-split", type=float, default=0.2)
+    parser.add_argument("--publish", action="store_true", help="Publish the result as the current release if any model improved")
+    args = parser.parse_args()
+
+    if not _scalers_persisted():
+        print("Fine-tuning needs the persisted scalers, train the models with train_all.py first")
+        return
+    start = time.perf_counter()
+    results: List[Dict[str, object]] = []
+    garages = [JOINT_MODEL] if args.layout == "joint" else args.garages
+    for kind in args.kinds:
+        for garage in garages:
+            results.append(fine_tune_model(
+                kind, garage, args.epochs, args.freeze, args.learning_rate_scale, args.batch_size, args.validation_split
+            ))
+    improved = sum(result["outcome"] == "improved" for result in results)
+    print(f"Fine-tuned {len(results)} models in {time.perf_counter() - start:.1f}s, {improved} improved")
+    if args.publish and improved:
+        publish_release(f"fine-tune: {improved} of {len(results)} models improved", layout=args.layout)
+
+
+if __name__ == "__main__":
+    main()
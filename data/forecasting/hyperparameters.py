@@ -0,0 +1,40 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from data.forecasting.constants import MODEL_DIRECTORY
+
+# Winning sweep configurations, {"long": {garage: params}, "short": {garage: params}}
+TUNED_HYPER_PARAMS_PATH = MODEL_DIRECTORY / "hyperparameters.json"
+
+_cache: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+def load_tuned_hyperparameters() -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """Read the tuned hyperparameters file, re-reading it only when it changed"""
+    if not TUNED_HYPER_PARAMS_PATH.exists():
+        return {}
+    signature = TUNED_HYPER_PARAMS_PATH.stat().st_mtime_ns
+    with _lock:
+        if _cache.get("signature") != signature:
+            with open(TUNED_HYPER_PARAMS_PATH) as f:
+                _cache["params"] = json.load(f)
+            _cache["signature"] = signature
+        return _cache["params"]
+
+
+def tuned_hyperparameters(kind: str, garage: str) -> Optional[Dict[str, Any]]:
+    return load_tuned_hyperparameters().get(kind, {}).get(garage)
+
+
+def save_tuned_hyperparameters(tuned: Dict[Tuple[str, str], Dict[str, Any]]) -> None:
+    """Set the tuned hyperparameters of the given (kind, garage) models, keeping every other entry (atomic write)"""
+    config = dict(load_tuned_hyperparameters())
+    for (kind, garage), params in tuned.items():
+        config[kind] = {**config.get(kind, {}), garage: params}
+    tmp_path = TUNED_HYPER_PARAMS_PATH.with_name(f".{TUNED_HYPER_PARAMS_PATH.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(config, f, indent=4)
+    os.replace(tmp_path, TUNED_HYPER_PARAMS_PATH)
@@ -1,3 +1,4 @@
+import os
 import tensorflow as tf
 from tensorflow import keras
 from tensorflow.keras.losses import Loss
@@ -60,6 +61,41 @@ def build_model(
     
     return model
 
+# ── MONTE-CARLO DROPOUT ─────────────────────────────────────────────────────────
+class _MCDropout(keras.layers.Dropout):
+    """Dropout that stays active at inference, so repeated passes sample the forecast distribution"""
+    def call(self, inputs, training=None):
+        return super().call(inputs, training=True)
+
+def mc_dropout_model(model):
+    """
+    Same layers and weights as `model`, with every Dropout active at inference.
+    BatchNormalization keeps using its moving statistics; only dropout is sampled.
+    """
+    inputs = keras.layers.Input(shape=model.input_shape[1:])
+    x = inputs
+    for layer in model.layers[1:]:
+        x = _MCDropout(layer.rate)(x) if isinstance(layer, keras.layers.Dropout) else layer(x)
+    return keras.Model(inputs=inputs, outputs=x)
+
+# ── SAVING ──────────────────────────────────────────────────────────────────────
+def save_weights_atomic(model, name, directory=MODEL_DIRECTORY):
+    """
+    Save weights to <directory>/<name>.weights.h5 without ever exposing a partial file.
+    Weights are written to a temporary file next to the target and renamed over it.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{name}.weights.h5"
+    # keras requires the .weights.h5 suffix, so the pid goes in front of it
+    tmp_path = directory / f".{name}.{os.getpid()}.tmp.weights.h5"
+    try:
+        model.save_weights(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return path
+
 # ── TRAINING FUNCTION ────────────────────────────────────────────────────────────
 def train_model(
     model,
@@ -74,4 +110,19 @@ def train_model(
         epochs=training_epochs,
         batch_size=batch_size,
         callbacks=[reduce_lr])
-    model.save_weights(f"{MODEL_DIRECTORY}/{name}.weights.h5")
+    save_weights_atomic(model, name)
+
+def train_model_from_datasets(
+    model,
+    train_dataset,
+    test_dataset,
+    training_epochs,
+    name,
+    directory=MODEL_DIRECTORY):
+    """Same as train_model, but streams batches from tf.data datasets (see sequences.make_window_dataset)"""
+    model.fit(
+        train_dataset,
+        validation_data=test_dataset,
+        epochs=training_epochs,
+        callbacks=[reduce_lr])
+    save_weights_atomic(model, name, directory)
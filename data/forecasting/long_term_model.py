@@ -1,27 +1,24 @@
 import numpy as np
 import pandas as pd
 import datetime as dt
-from data.forecasting.keras_model_file import train_model
+from data.forecasting.keras_model_file import train_model_from_datasets
+from data.forecasting.sequences import make_window_dataset
 from sklearn.preprocessing import MinMaxScaler
-from data.forecasting.data_functions import add_cyclical_time_encoding, add_event_impact_features,add_instruction_days, load_data_from_mongodb
+from data.forecasting.data_functions import add_calendar_features, load_data_from_storage
+from data.forecasting.constants import TRAINING_ROWS
 
-from data.forecasting.constants import (
-    ENABLE_TIME_ENCODING,
-    ENABLE_INSTR_DAY,
-    ENABLE_EVENT_ENCODING
-)
+def prepare_long_training_data(test_split, end=None):
+    """
+    Load, featurize and scale the long model training data (the TRAINING_ROWS datapoints before `end`).
 
-def train_long_model(model, batch_size, future_steps, test_split, seq_size, name, training_epochs):
-    
-    data: pd.DataFrame = load_data_from_mongodb(dt.datetime.now(),25000)
+    Returns:
+        train_scaled, test_scaled (np.ndarray), scaler (MinMaxScaler), watermark (newest datapoint, datetime)
+    """
+    data: pd.DataFrame = load_data_from_storage(end or dt.datetime.now(), TRAINING_ROWS)
     
     # Process the data
-    if ENABLE_INSTR_DAY:
-        data = add_instruction_days(data)
-    if ENABLE_TIME_ENCODING:
-        data = add_cyclical_time_encoding(data)
-    if ENABLE_EVENT_ENCODING:
-        data = add_event_impact_features(data)
+    data = add_calendar_features(data)
+    watermark = pd.Timestamp(data["date"].max()).to_pydatetime()
     # Prepare data for long-term model (includes positional encoding features)
     data = data.drop(columns=["date"]).copy()
     
@@ -34,21 +31,16 @@ def train_long_model(model, batch_size, future_steps, test_split, seq_size, name
     scaler.fit(test_data) # Fit the scaler to the training data
 
     # Transform the data using the scaler
-    train_scaled = pd.DataFrame(scaler.transform(train_data), columns=train_data.columns)
-    test_scaled = pd.DataFrame(scaler.transform(test_data), columns=test_data.columns)
+    train_scaled = scaler.transform(train_data)
+    test_scaled = scaler.transform(test_data)
+    return train_scaled, test_scaled, scaler, watermark
 
-    # Sequence Settings, the sequence length is the size of the rolling window that we use to make predictions
-    n_feature = data.shape[1] # n_features is the number of inputs to the model, if we want to give the model more context we can increase this value
-
-    # Function to create sequences for multi-step forecasting
-    def create_sequences(data, seq_size, future_steps):
-        X, y = [], []
-        for i in range(len(data) - seq_size - future_steps + 1):
-            X.append(data[i:i + seq_size])
-            y.append(data[i + seq_size:i + seq_size + future_steps])
-        return np.array(X), np.array(y)
+def train_long_model(model, batch_size, future_steps, test_split, seq_size, name, training_epochs):
+    # Imported here, training_data builds its artifacts with prepare_long_training_data
+    from data.forecasting.training_data import get_dataset_artifact
+    train_scaled, test_scaled = get_dataset_artifact("long", test_split).load()
 
-    # Create sequences for training and testing
-    X_train, Y_train = create_sequences(train_scaled.values, seq_size, future_steps)
-    X_test, Y_test = create_sequences(test_scaled.values, seq_size, future_steps)
-    train_model(model, X_train, Y_train, X_test, Y_test, batch_size, training_epochs,name)
\ No newline at end of file
+    # Stream float32 sliding windows instead of materializing every sequence
+    train_dataset = make_window_dataset(train_scaled, seq_size, future_steps, batch_size, shuffle=True)
+    test_dataset = make_window_dataset(test_scaled, seq_size, future_steps, batch_size)
+    train_model_from_datasets(model, train_dataset, test_dataset, training_epochs, name)
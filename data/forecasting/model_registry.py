@@ -0,0 +1,498 @@
+"""
+Versioned model releases and hot reloading.
+
+A release is a snapshot of the eight weight files and both scalers in
+keras_models/releases/<version>/, with a manifest listing each model's architecture
+and each file's checksum. releases/current.json names the release to serve.
+
+MODEL_REGISTRY holds the loaded model set that forecasts are made with. reload()
+loads a release into a standby slot, validates it on a smoke input and swaps it in
+atomically while requests keep using whichever set they started with. The previous
+set stays loaded for an instant rollback(). Without any release, the live files in
+keras_models/ are served and reloaded when they change.
+
+    python -m data.forecasting.model_registry publish --note "fall semester retrain"
+    python -m data.forecasting.model_registry list
+    python -m data.forecasting.model_registry activate 20250901-031500
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+import joblib
+import numpy as np
+from keras import Model
+from sklearn.preprocessing import MinMaxScaler
+
+from data.forecasting.constants import MODEL_DIRECTORY, GARAGE_NAMES, JOINT_MODEL, LONG_FUTURE_STEPS
+from data.forecasting.datapoint_buffer import VALUE_COLUMNS
+from data.forecasting.feature_store import feature_columns
+from data.forecasting.keras_model_file import build_model, mc_dropout_model
+
+RELEASES_DIRECTORY = MODEL_DIRECTORY / "releases"
+CURRENT_RELEASE_PATH = RELEASES_DIRECTORY / "current.json"
+SCALER_FILES = ["scaler_long.pkl", "scaler_short.pkl"]
+# Version name of the set loaded straight from keras_models/ when there are no releases
+LIVE_VERSION = "live"
+# Serve the float16/int8 TFLite variants exported by quantize.py (falls back to float32 if a release has none)
+PRECISIONS = ["float32", "float16", "int8"]
+MODEL_PRECISION = os.getenv("MODEL_PRECISION", "float32")
+# "per_garage": four long and four short models; "joint": one long and one short model forecasting every garage
+LAYOUTS = ["per_garage", "joint"]
+MODEL_LAYOUT = os.getenv("MODEL_LAYOUT", "per_garage")
+
+
+def model_names(layout: str) -> List[str]:
+    """Weight file names (without .weights.h5) of a layout, long models first"""
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown model layout: {layout}")
+    garages = [JOINT_MODEL] if layout == "joint" else GARAGE_NAMES
+    return [f"{kind}_model_{garage}" for kind in ("long", "short") for garage in garages]
+
+
+# ── RELEASES ────────────────────────────────────────────────────────────────────
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_json_atomic(path: Path, content: Dict[str, Any]) -> None:
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(content, f, indent=4)
+    os.replace(tmp_path, path)
+
+
+def _model_spec(name: str, feature_dim: int) -> Dict[str, Any]:
+    # Same hyperparameters _build_long_model/_build_short_model use right now
+    from data.forecasting.predict_future_times_individual_garage import (
+        LONG_HYPER_PARAMS, SHORT_HYPER_PARAMS, _build_long_model, _build_short_model, _garage_no, _hyper_params
+    )
+    kind, garage = name.split("_model_")
+    garage_no = _garage_no(garage)
+    params = _hyper_params(kind, garage_no, LONG_HYPER_PARAMS if kind == "long" else SHORT_HYPER_PARAMS)
+    model = (_build_long_model if kind == "long" else _build_short_model)(garage_no, feature_dim)
+    return {
+        "kind": kind,
+        "garage": garage,
+        "lstm_neurons_list": params["lstm_neurons_list"],
+        "dropout": params["dropout"],
+        "learning_rate": params["learning_rate"],
+        "activation": model.layers[-2].activation.__name__,
+        "seq_size": int(model.input_shape[1]),
+        "n_feature": feature_dim,
+        "future_steps": int(model.output_shape[1]),
+    }
+
+
+def publish_release(note: str = "", activate: bool = True, layout: str = MODEL_LAYOUT) -> str:
+    """
+    Snapshot the live weights (of the given layout) and scalers in keras_models/ as a new release.
+
+    Returns:
+        str: The new release version
+    """
+    RELEASES_DIRECTORY.mkdir(parents=True, exist_ok=True)
+    version = f"{datetime.now():%Y%m%d-%H%M%S}"
+    while (RELEASES_DIRECTORY / version).exists():
+        version += "x"
+
+    short_dim = len(VALUE_COLUMNS)
+    long_dim = short_dim + len(feature_columns())
+    tmp_directory = Path(tempfile.mkdtemp(prefix=f".{version}.", dir=RELEASES_DIRECTORY))
+    try:
+        names = model_names(layout)
+        files = [f"{name}.weights.h5" for name in names] + SCALER_FILES
+        for file_name in files:
+            shutil.copy2(MODEL_DIRECTORY / file_name, tmp_directory / file_name)
+        manifest = {
+            "version": version,
+            "created_at": datetime.now().isoformat(),
+            "note": note,
+            "layout": layout,
+            "models": {name: _model_spec(name, long_dim if name.startswith("long") else short_dim) for name in names},
+            "files": {file_name: _sha256(tmp_directory / file_name) for file_name in files},
+        }
+        with open(tmp_directory / "manifest.json", "w") as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(tmp_directory, RELEASES_DIRECTORY / version)
+    finally:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+    print(f"Published release {version}")
+    if activate:
+        set_current_release(version)
+    return version
+
+
+def list_releases() -> List[Dict[str, Any]]:
+    """Manifests of every release, oldest first"""
+    if not RELEASES_DIRECTORY.exists():
+        return []
+    manifests = []
+    for path in sorted(RELEASES_DIRECTORY.glob("*/manifest.json")):
+        if not path.parent.name.startswith("."):
+            with open(path) as f:
+                manifests.append(json.load(f))
+    return manifests
+
+
+def current_release() -> Optional[str]:
+    if not CURRENT_RELEASE_PATH.exists():
+        return None
+    with open(CURRENT_RELEASE_PATH) as f:
+        return json.load(f).get("version")
+
+
+def set_current_release(version: str) -> None:
+    """Point current.json at a release, watchers pick it up on their next poll"""
+    if not (RELEASES_DIRECTORY / version / "manifest.json").exists():
+        raise ValueError(f"Unknown release: {version}")
+    _write_json_atomic(CURRENT_RELEASE_PATH, {
+        "version": version,
+        "previous": current_release(),
+        "updated_at": datetime.now().isoformat()
+    })
+    print(f"Current release is now {version}")
+
+
+def clear_current_release() -> None:
+    """Serve the live keras_models/ files again, even though releases exist"""
+    if CURRENT_RELEASE_PATH.exists():
+        CURRENT_RELEASE_PATH.unlink()
+        print("No current release, serving the live files")
+
+
+# ── MODEL SETS ──────────────────────────────────────────────────────────────────
+@dataclass
+class ModelSet:
+    version: str
+    long_models: List[Model]
+    short_models: List[Model]
+    scaler_long: Optional[MinMaxScaler]
+    scaler_short: Optional[MinMaxScaler]
+    precision: str = "float32"
+    layout: str = "per_garage"
+    loaded_at: datetime = field(default_factory=datetime.now)
+    _mc_models: Dict[int, Model] = field(default_factory=dict, repr=False)
+
+    def mc_dropout_models(self) -> Tuple[List[Model], List[Model]]:
+        """
+        The long and short models with dropout active at inference (see predict_quantiles), built
+        on first use. A joint model still fills every garage slot with one shared model.
+        """
+        if self.precision != "float32":
+            raise ValueError(f"Monte-Carlo dropout needs the float32 keras models, not {self.precision}")
+        for model in self.long_models + self.short_models:
+            if id(model) not in self._mc_models:
+                self._mc_models[id(model)] = mc_dropout_model(model)
+        return (
+            [self._mc_models[id(model)] for model in self.long_models],
+            [self._mc_models[id(model)] for model in self.short_models]
+        )
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "precision": self.precision,
+            "layout": self.layout,
+            "loaded_at": self.loaded_at.isoformat()
+        }
+
+
+def _live_signature(layout: str) -> Tuple:
+    signature = []
+    for file_name in [f"{name}.weights.h5" for name in model_names(layout)] + SCALER_FILES:
+        path = MODEL_DIRECTORY / file_name
+        signature.append(path.stat().st_mtime_ns if path.exists() else None)
+    return tuple(signature)
+
+
+def live_checksums(layout: str) -> Dict[str, Optional[str]]:
+    """sha256 of each live weight and scaler file of a layout (None if missing)"""
+    checksums = {}
+    for file_name in [f"{name}.weights.h5" for name in model_names(layout)] + SCALER_FILES:
+        path = MODEL_DIRECTORY / file_name
+        checksums[file_name] = _sha256(path) if path.exists() else None
+    return checksums
+
+
+def _load_release_scalers(directory: Path) -> Tuple[Optional[MinMaxScaler], Optional[MinMaxScaler]]:
+    # Missing live scalers are fitted on the first forecast's data (see _load_scalers)
+    scaler_long, scaler_short = [
+        joblib.load(directory / file_name) if (directory / file_name).exists() else None
+        for file_name in SCALER_FILES
+    ]
+    return scaler_long, scaler_short
+
+
+def garage_slots(models: Dict[str, Any], layout: str) -> Tuple[List[Any], List[Any]]:
+    """
+    Long and short model of each garage, in GARAGE_NAMES order, from models keyed by name.
+    With the joint layout the one model of each kind fills every garage's slot.
+    """
+    def model_for(kind: str, garage: str) -> Any:
+        return models[f"{kind}_model_{JOINT_MODEL if layout == 'joint' else garage}"]
+    return [model_for("long", garage) for garage in GARAGE_NAMES], [model_for("short", garage) for garage in GARAGE_NAMES]
+
+
+def release_layout(version: Optional[str], layout: str = MODEL_LAYOUT) -> str:
+    """Layout of a release (recorded in its manifest), or `layout` for the live files"""
+    if version is None or version == LIVE_VERSION:
+        return layout
+    with open(RELEASES_DIRECTORY / version / "manifest.json") as f:
+        return json.load(f).get("layout", "per_garage")
+
+
+def _load_live_set(layout: str) -> ModelSet:
+    from data.forecasting.predict_future_times_individual_garage import _build_long_model, _build_short_model, _garage_no
+
+    short_dim = len(VALUE_COLUMNS)
+    long_dim = short_dim + len(feature_columns())
+    models: Dict[str, Model] = {}
+    for name in model_names(layout):
+        kind, garage = name.split("_model_")
+        if kind == "long":
+            model = _build_long_model(_garage_no(garage), long_dim)
+        else:
+            model = _build_short_model(_garage_no(garage), short_dim)
+        model.load_weights(MODEL_DIRECTORY / f"{name}.weights.h5")
+        models[name] = model
+    return ModelSet(LIVE_VERSION, *garage_slots(models, layout), *_load_release_scalers(MODEL_DIRECTORY), layout=layout)
+
+
+def load_model_set(version: Optional[str] = None, precision: str = MODEL_PRECISION, layout: str = MODEL_LAYOUT) -> ModelSet:
+    """
+    Build and load a release's models and scalers (the live keras_models/ files of `layout` if
+    version is None; a release has its own layout). Raises instead of exiting, so a broken
+    release can't take the server down.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision}")
+    if version == LIVE_VERSION:
+        version = None
+    layout = release_layout(version, layout)
+    if precision != "float32":
+        from data.forecasting.quantize import load_quantized_set, read_gate
+
+        gate = read_gate(version, precision, layout)
+        if gate is not None and gate["passed"]:
+            # Only the scalers are needed from the release, the keras models are never built
+            scalers = _load_release_scalers(RELEASES_DIRECTORY / version if version else MODEL_DIRECTORY)
+            return load_quantized_set(version, precision, scalers, layout)
+        if gate is not None and gate.get("stale"):
+            print(f"The {precision} variant of {LIVE_VERSION} was converted from older weights or scalers, serving float32")
+        else:
+            print(f"No {precision} variant of {version or LIVE_VERSION} passed the accuracy gate, serving float32")
+    if version is None:
+        return _load_live_set(layout)
+
+    directory = RELEASES_DIRECTORY / version
+    with open(directory / "manifest.json") as f:
+        manifest = json.load(f)
+    for file_name, checksum in manifest["files"].items():
+        if _sha256(directory / file_name) != checksum:
+            raise ValueError(f"Release {version}: {file_name} doesn't match its checksum")
+
+    models: Dict[str, Model] = {}
+    for name, spec in manifest["models"].items():
+        model = build_model(
+            lstm_neurons_list = spec["lstm_neurons_list"],
+            dropout           = spec["dropout"],
+            learning_rate     = spec["learning_rate"],
+            seq_size          = spec["seq_size"],
+            n_feature         = spec["n_feature"],
+            future_steps      = spec["future_steps"],
+            activation        = spec["activation"],
+            garage_no         = None if spec["garage"] == JOINT_MODEL else GARAGE_NAMES.index(spec["garage"])
+        )
+        model.load_weights(directory / f"{name}.weights.h5")
+        models[name] = model
+    return ModelSet(version, *garage_slots(models, layout), *_load_release_scalers(directory), layout=layout)
+
+
+def smoke_test(model_set: ModelSet) -> None:
+    """Raise if the set can't produce a well-formed forecast from a neutral input"""
+    from data.forecasting.predict_future_times_individual_garage import _window_rows, predict_batch
+
+    if model_set.scaler_long is None or model_set.scaler_short is None:
+        return
+    rows = _window_rows(model_set.long_models, model_set.short_models)
+    long_dim = model_set.long_models[0].input_shape[2]
+    short_dim = model_set.short_models[0].input_shape[2]
+    if model_set.scaler_long.n_features_in_ != long_dim or model_set.scaler_short.n_features_in_ != short_dim:
+        raise ValueError(f"Release {model_set.version}: scalers don't match the model inputs")
+    forecast = predict_batch(
+        np.full((1, rows, long_dim), 0.5, dtype=np.float32),
+        np.full((1, rows, short_dim), 0.5, dtype=np.float32),
+        model_set.long_models, model_set.short_models, model_set.scaler_long, model_set.scaler_short
+    )
+    if forecast.shape != (1, LONG_FUTURE_STEPS, len(GARAGE_NAMES)) or not np.isfinite(forecast).all():
+        raise ValueError(f"Release {model_set.version}: smoke forecast has shape {forecast.shape} or non-finite values")
+
+
+def _make_current(model_set: ModelSet) -> None:
+    # Restarts and the other workers' watchers serve whatever current.json names
+    if model_set.version == LIVE_VERSION:
+        clear_current_release()
+    elif model_set.version != current_release():
+        set_current_release(model_set.version)
+
+
+# ── REGISTRY ────────────────────────────────────────────────────────────────────
+class ModelRegistry:
+    """Active and previous model sets, swapped atomically"""
+
+    def __init__(self):
+        self._active: Optional[ModelSet] = None
+        self._previous: Optional[ModelSet] = None
+        self.precision = MODEL_PRECISION
+        self.layout = MODEL_LAYOUT            # of the live files, releases carry their own
+        self._lock = threading.Lock()         # guards the two slots
+        self._reload_lock = threading.Lock()  # one standby load at a time
+        self._signature = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _source_signature(self, layout: Optional[str] = None) -> Tuple:
+        version = current_release()
+        return (version,) if version else (LIVE_VERSION,) + _live_signature(layout or self.layout)
+
+    def active(self) -> ModelSet:
+        """The set to forecast with, loaded on first use"""
+        with self._lock:
+            active = self._active
+        return active if active is not None else self.reload()
+
+    def reload(
+        self, version: Optional[str] = None, precision: Optional[str] = None, layout: Optional[str] = None, activate: bool = False
+    ) -> ModelSet:
+        """
+        Load a release (default: current.json, else the live files) into the standby slot,
+        smoke test it and swap it in. The active set keeps serving if anything fails.
+        Passing a precision (or a layout for the live files) switches to it for this and later reloads.
+        With activate, current.json is pointed at the version once it is served (never before).
+        """
+        with self._reload_lock:
+            version = version or current_release()
+            # Taken before loading, so files replaced mid-load trigger another reload
+            if activate:
+                signature = (version,) if version and version != LIVE_VERSION else (LIVE_VERSION,) + _live_signature(layout or self.layout)
+            else:
+                signature = self._source_signature(layout)
+            standby = load_model_set(version, precision or self.precision, layout or self.layout)
+            smoke_test(standby)
+            if activate:
+                _make_current(standby)
+            with self._lock:
+                self.precision = precision or self.precision
+                self.layout = layout or self.layout
+                self._previous, self._active = self._active, standby
+                self._signature = signature
+        print(f"Serving models {standby.version} ({standby.precision}, {standby.layout})")
+        return standby
+
+    def rollback(self) -> ModelSet:
+        """Swap the previous set back in, no loading involved, and point current.json at it"""
+        with self._reload_lock:
+            with self._lock:
+                if self._previous is None:
+                    raise ValueError("No previous model set to roll back to")
+                self._previous, self._active = self._active, self._previous
+                active = self._active
+            # Otherwise a restart or another worker would bring the rolled back release back
+            _make_current(active)
+            with self._lock:
+                self._signature = self._source_signature(active.layout)
+        print(f"Rolled back to models {active.version}")
+        return active
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active": self._active.describe() if self._active else None,
+                "previous": self._previous.describe() if self._previous else None,
+                "precision": self.precision,
+                "layout": self.layout,
+                "current_release": current_release(),
+                "releases": [manifest["version"] for manifest in list_releases()],
+            }
+
+    def check_for_update(self) -> bool:
+        """Reload if current.json (or, without releases, a live file) changed since the last load"""
+        if self._source_signature() == self._signature:
+            return False
+        self.reload()
+        return True
+
+    def start_watcher(self, interval: float = 60, on_swap: Optional[Callable[[ModelSet], None]] = None) -> None:
+        """Poll for new releases in a daemon thread; on_swap runs after each successful swap"""
+        if self._watcher is not None:
+            return
+
+        def watch():
+            while not self._stop.wait(interval):
+                try:
+                    if self.check_for_update() and on_swap is not None:
+                        on_swap(self.active())
+                except Exception as e:
+                    print(f"Model reload failed, still serving {self._active.version if self._active else None}: {e}")
+
+        self._stop.clear()
+        self._watcher = threading.Thread(target=watch, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self) -> None:
+        self._stop.set()
+        self._watcher = None
+
+
+# Process-wide registry used by calculate_prediction
+MODEL_REGISTRY = ModelRegistry()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage versioned model releases")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    publish = subparsers.add_parser("publish", help="Snapshot the live weights and scalers as a release")
+    publish.add_argument("--note", default="")
+    publish.add_argument("--no-activate", action="store_true", help="Don't make it the current release")
+    publish.add_argument("--layout", choices=LAYOUTS, default=MODEL_LAYOUT, help="Publish the per-garage or the joint models")
+    subparsers.add_parser("list", help="List the releases")
+    activate = subparsers.add_parser("activate", help="Make a release current (running servers reload it)")
+    activate.add_argument("version")
+    subparsers.add_parser("check", help="Load and smoke test the current release without serving it")
+    args = parser.parse_args()
+
+    if args.command == "publish":
+        publish_release(args.note, activate=not args.no_activate, layout=args.layout)
+    elif args.command == "list":
+        current = current_release()
+        for manifest in list_releases():
+            marker = "*" if manifest["version"] == current else " "
+            print(f"{marker} {manifest['version']:<20}{manifest['created_at']:<30}{manifest['note']}")
+    elif args.command == "activate":
+        set_current_release(args.version)
+    elif args.command == "check":
+        model_set = load_model_set(current_release())
+        smoke_test(model_set)
+        print(f"Models {model_set.version} passed the smoke test")
+
+
+if __name__ == "__main__":
+    main()
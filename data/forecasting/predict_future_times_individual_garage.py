@@ -18,39 +18,46 @@ from datetime import datetime
 # Try to import using the full path first, fall back to local imports if that fails
 try:
     from data.forecasting.keras_model_file import build_model
-    from data.forecasting.short_term_model import train_short_model
-    from data.forecasting.long_term_model import train_long_model
-    from data.forecasting.data_functions import add_cyclical_time_encoding, add_event_impact_features,add_instruction_days, load_data_from_mongodb
+    from data.forecasting.train_all import train_models
+    from data.forecasting.model_registry import MODEL_REGISTRY, ModelSet
+    from data.forecasting.hyperparameters import tuned_hyperparameters
+    from data.forecasting.data_functions import add_calendar_features, load_recent_data
+    from data.forecasting.feature_store import feature_columns
+    from data.forecasting.datapoint_buffer import VALUE_COLUMNS
+    from data.forecasting.streaming_features import STREAMING_FEATURIZER
     from data.forecasting import utils
     from data.forecasting.constants import (
         MODEL_DIRECTORY,
         GARAGE_NAMES,
+        JOINT_MODEL,
         LONG_SEQ,
         LONG_FUTURE_STEPS,
         SHORT_SEQ,
-        SHORT_FUTURE_STEPS,
-        ENABLE_TIME_ENCODING,
-        ENABLE_INSTR_DAY,
-        ENABLE_EVENT_ENCODING
+        SHORT_FUTURE_STEPS
     )
 except ImportError:
     # Fall back to local imports if the full path imports fail
     from keras_model_file import build_model
-    from short_term_model import train_short_model
-    from long_term_model import train_long_model
+    from train_all import train_models
+    from model_registry import MODEL_REGISTRY, ModelSet
+    from hyperparameters import tuned_hyperparameters
     import utils
     from constants import (
         MODEL_DIRECTORY,
         LOGS_DIRECTORY,
         GARAGE_NAMES,
+        JOINT_MODEL,
         LONG_SEQ,
         LONG_FUTURE_STEPS,
         SHORT_SEQ,
-        SHORT_FUTURE_STEPS,
-        ENABLE_TIME_ENCODING,
-        ENABLE_INSTR_DAY,
-        ENABLE_EVENT_ENCODING
+        SHORT_FUTURE_STEPS
     )
+# Rows needed per forecast: the model windows and the blend/timestamp tail used by plot_prediction
+WINDOW_ROWS = max(LONG_SEQ, SHORT_SEQ, 5)
+# Monte-Carlo dropout passes per forecast band and the quantiles reported
+MC_SAMPLES = 50
+QUANTILES: List[float] = [0.1, 0.5, 0.9]
+
 # control flags  [True,True,True,True] [False,False,False,False] (for easy copy paste)
 LONG_TRAINING_MASK: List[bool]      = [False,False,False,False]
 SHORT_TRAINING_MASK: List[bool]     = [False,False,False,False]
@@ -101,18 +108,27 @@ SHORT_HYPER_PARAMS: Dict[str, Dict[str, Any]] = {
         "activation": "celu",}
 }
 
-# long model hyperparameters
-def _build_long_model(garage: str, feature_dim: int) -> Model:
+def _garage_no(garage: str) -> Optional[int]:
+    # None builds the joint model, which is trained on (and predicts) every garage
+    return None if garage == JOINT_MODEL else GARAGE_NAMES.index(garage)
+
+def _hyper_params(kind: str, garage: Union[int, str, None], defaults: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    # Sweep winners (hyperparameters.json) take precedence over the hand-edited dicts
+    name = GARAGE_NAMES[garage] if isinstance(garage, int) else garage or JOINT_MODEL
+    tuned = tuned_hyperparameters(kind, name)
+    if tuned is not None:
+        return tuned
     # look up this garage's hyperparams, fall back to first dict entry if missing
-    params = LONG_HYPER_PARAMS.get(
-        garage,
-        next(iter(LONG_HYPER_PARAMS.values()))
-    )
+    return defaults.get(garage, next(iter(defaults.values())))
+
+# long model hyperparameters
+def _build_long_model(garage: Optional[int], feature_dim: int) -> Model:
+    params = _hyper_params("long", garage, LONG_HYPER_PARAMS)
     return build_model(
         lstm_neurons_list = params["lstm_neurons_list"],
         dropout           = params["dropout"],
         learning_rate     = params["learning_rate"],
-        seq_size          = LONG_SEQ,
+        seq_size          = params.get("seq_size", LONG_SEQ),
         activation        = params.get("activation", "linear"),
         n_feature         = feature_dim,
         future_steps      = LONG_FUTURE_STEPS,
@@ -120,47 +136,26 @@ def _build_long_model(garage: str, feature_dim: int) -> Model:
     )
     
 # short model hyperparameters 
-def _build_short_model(garage: str, feature_dim: int) -> Model:
-    params = SHORT_HYPER_PARAMS.get(
-        garage,
-        next(iter(SHORT_HYPER_PARAMS.values()))
-    )
+def _build_short_model(garage: Optional[int], feature_dim: int) -> Model:
+    params = _hyper_params("short", garage, SHORT_HYPER_PARAMS)
     return build_model(
         lstm_neurons_list = params["lstm_neurons_list"],
         dropout           = params["dropout"],
         learning_rate     = params["learning_rate"],
-        seq_size          = SHORT_SEQ,
+        seq_size          = params.get("seq_size", SHORT_SEQ),
         activation        = params.get("activation", "celu"),
         n_feature         = feature_dim,
         future_steps      = SHORT_FUTURE_STEPS,
         garage_no         = garage
     )
-    
-def _train_long(garage: str, model: Model) -> None:
-    print(f"training long model: {garage}")
-    train_long_model(
-        model=model,
-        training_epochs=10,
-        batch_size=32,
-        future_steps=LONG_FUTURE_STEPS,
-        test_split=0.80,
-        seq_size=LONG_SEQ,
-        name=f"long_model_{garage}"
-    )
 
+def _model_seq(model: Model) -> int:
+    # Sequence length the model was built with (tuned models may differ from LONG_SEQ/SHORT_SEQ)
+    return model.input_shape[1]
 
-def _train_short(garage: str, model: Model) -> None:
-    print(f"training short model: {garage}")
-    train_short_model(
-        model=model,
-        training_epochs=25,
-        batch_size=32,
-        future_steps=SHORT_FUTURE_STEPS,
-        test_split=0.8,
-        seq_size=SHORT_SEQ,
-        name=f"short_model_{garage}"
-    )
- 
+def _window_rows(long_models: List[Model], short_models: List[Model]) -> int:
+    return max([WINDOW_ROWS] + [_model_seq(model) for model in long_models + short_models])
+    
 def load_or_fit_scaler(scaler_path, data: pd.DataFrame) -> MinMaxScaler:
     """
     Loads a persisted MinMaxScaler from scaler_path if available,
@@ -174,112 +169,233 @@ def load_or_fit_scaler(scaler_path, data: pd.DataFrame) -> MinMaxScaler:
     return scaler
 
 
-def _make_prediction(
-    data: pd.DataFrame, short_data: pd.DataFrame,
-    long_models: List[Model], short_models: List[Model],
-    short_dim: int, long_dim: int
-) -> np.ndarray:
+_SCALER_CACHE: Dict[str, Any] = {}
 
+def _load_scalers(data: Optional[pd.DataFrame] = None, short_data: Optional[pd.DataFrame] = None) -> Tuple[MinMaxScaler, MinMaxScaler]:
     # Use persisted scalers instead of fitting new ones every time;
     # these files should have been created during model training.
     scaler_long_path = MODEL_DIRECTORY / "scaler_long.pkl"
     scaler_short_path = MODEL_DIRECTORY / "scaler_short.pkl"
-    scaler_long = load_or_fit_scaler(scaler_long_path, data)
-    scaler_short = load_or_fit_scaler(scaler_short_path, short_data)
+    signature = tuple(path.stat().st_mtime_ns if path.exists() else None for path in (scaler_long_path, scaler_short_path))
+    cached = _SCALER_CACHE.get("scalers")
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    scalers = (load_or_fit_scaler(scaler_long_path, data), load_or_fit_scaler(scaler_short_path, short_data))
+    # Keep the same objects between calls so the streaming featurizer can reuse its cache
+    _SCALER_CACHE["scalers"] = (signature, scalers)
+    return scalers
 
-    scaled_long = pd.DataFrame(
-        scaler_long.transform(data),
-        columns=data.columns
-    )
-    scaled_short = pd.DataFrame(
-        scaler_short.transform(short_data),
-        columns=short_data.columns
-    )
+def _scalers_persisted() -> bool:
+    return (MODEL_DIRECTORY / "scaler_long.pkl").exists() and (MODEL_DIRECTORY / "scaler_short.pkl").exists()
 
-    try:
-        for i, garage in enumerate(GARAGE_NAMES):
-            long_models[i].load_weights(
-                MODEL_DIRECTORY / f"long_model_{garage}.weights.h5"
-            )
-            short_models[i].load_weights(
-                MODEL_DIRECTORY / f"short_model_{garage}.weights.h5"
-            )
-    except Exception:
-        print("Could not load weights, please verify you have existing weight files, exiting.")
-        exit(-1)
+def _inverse_column(scaler: MinMaxScaler, values: np.ndarray, column: int) -> np.ndarray:
+    # MinMaxScaler.inverse_transform for a single column, on any batch shape
+    return (values[..., column] - scaler.min_[column]) / scaler.scale_[column]
 
-    # prepare batches
-    short_batch = scaled_short.values[-SHORT_SEQ:].reshape(1, SHORT_SEQ, short_dim)
-    long_batch  = scaled_long.values[-LONG_SEQ:].reshape(1, LONG_SEQ, long_dim)
+def predict_batch(
+    long_batch: np.ndarray, short_batch: np.ndarray,
+    long_models: List[Model], short_models: List[Model],
+    scaler_long: MinMaxScaler, scaler_short: MinMaxScaler,
+    batch_size: int = 32
+) -> np.ndarray:
+    """
+    Blended long/short forecasts for a batch of scaled input windows.
+
+    Args:
+        long_batch (np.ndarray): (n, rows, long features) scaled windows, rows >= every long model's seq
+        short_batch (np.ndarray): (n, rows, short features) scaled windows, rows >= every short model's seq
+        long_models (List[Model]): One model per garage, a joint model may fill every slot
+        batch_size (int): Windows per model call
+
+    Returns:
+        np.ndarray: (n, LONG_FUTURE_STEPS, garages) occupancy fractions
+    """
+    # A joint model fills every garage's slot and only runs once
+    outputs: Dict[int, np.ndarray] = {}
+    def run(model: Model, batch: np.ndarray) -> np.ndarray:
+        if id(model) not in outputs:
+            # Batches hold the longest window, each model takes the tail it was built for
+            outputs[id(model)] = model.predict(batch[:, -_model_seq(model):], batch_size=batch_size, verbose=0)
+        return outputs[id(model)]
 
     long_preds = []
     short_preds = []
     for i, garage in enumerate(GARAGE_NAMES):
-        lp = long_models[i].predict(long_batch, verbose=0)[0]
-        sp = short_models[i].predict(short_batch, verbose=0)[0]
-        long_preds.append(np.clip(scaler_long.inverse_transform(lp)[:, i], 0, 1))
-        short_preds.append(np.clip(scaler_short.inverse_transform(sp)[:, i], 0, 1))
+        lp = run(long_models[i], long_batch)
+        sp = run(short_models[i], short_batch)
+        long_preds.append(np.clip(_inverse_column(scaler_long, lp, i), 0, 1))
+        short_preds.append(np.clip(_inverse_column(scaler_short, sp, i), 0, 1))
 
     # combine predictions from both models
-    fut_len = len(long_preds[0])
-    sh_len = len(short_preds[0])
+    fut_len = long_preds[0].shape[1]
+    sh_len = short_preds[0].shape[1]
     t = np.arange(sh_len)
     w_short = 0.5 * (1 + np.cos(np.pi * t / (sh_len - 1)))
     w_long = 1.0 - w_short
 
-    combined = np.zeros((fut_len, len(GARAGE_NAMES)))
+    combined = np.zeros((len(long_batch), fut_len, len(GARAGE_NAMES)))
     for i in range(len(GARAGE_NAMES)):
-        combined[:sh_len, i] = w_short * short_preds[i] + w_long * long_preds[i][:sh_len]
-        combined[sh_len:, i] = long_preds[i][sh_len:]
+        combined[:, :sh_len, i] = w_short * short_preds[i] + w_long * long_preds[i][:, :sh_len]
+        combined[:, sh_len:, i] = long_preds[i][:, sh_len:]
     return combined
 
+def predict_quantiles(
+    long_batch: np.ndarray, short_batch: np.ndarray,
+    model_set: ModelSet,
+    scaler_long: MinMaxScaler, scaler_short: MinMaxScaler,
+    samples: int = MC_SAMPLES,
+    quantiles: List[float] = QUANTILES,
+    batch_size: int = 256
+) -> np.ndarray:
+    """
+    Monte-Carlo dropout forecast bands: every window is repeated `samples` times and run through
+    the models with dropout active as one large batch, then each step's quantiles are taken.
 
-def calculate_prediction(forecast_start: datetime, hours: int = 24) -> List[float]:
-    extra_long_data = 0
+    Returns:
+        np.ndarray: (n, len(quantiles), LONG_FUTURE_STEPS, garages) occupancy fractions
+    """
+    long_models, short_models = model_set.mc_dropout_models()
+    forecasts = predict_batch(
+        np.repeat(long_batch, samples, axis=0), np.repeat(short_batch, samples, axis=0),
+        long_models, short_models, scaler_long, scaler_short, batch_size
+    )
+    forecasts = forecasts.reshape(len(long_batch), samples, *forecasts.shape[1:])
+    return np.quantile(forecasts, quantiles, axis=1).transpose(1, 0, 2, 3)
 
-    data: pd.DataFrame = load_data_from_mongodb(forecast_start)
-    short_data: pd.DataFrame = data.drop(columns=["date"]).copy() # Keep a copy of the raw density data (without date)
-    
-    # Process the data
-    if ENABLE_INSTR_DAY:
-        data = add_instruction_days(data)
-        extra_long_data += 2
-    if ENABLE_TIME_ENCODING:
-        data = add_cyclical_time_encoding(data)
-        extra_long_data += 10
-    if ENABLE_EVENT_ENCODING:
-        data = add_event_impact_features(data)
-        extra_long_data += 4
-        
-
-    # data: pd.DataFrame = load_data()
-    long_garage_models: List[Model] = []
-    short_garage_models: List[Model] = []
-    
-    long_data: pd.DataFrame = data.drop(columns=['date']).copy()
-        
+def _predict_scaled(
+    long_batch: np.ndarray, short_batch: np.ndarray,
+    long_models: List[Model], short_models: List[Model],
+    scaler_long: MinMaxScaler, scaler_short: MinMaxScaler
+) -> np.ndarray:
+    return predict_batch(long_batch, short_batch, long_models, short_models, scaler_long, scaler_short)[0]
+
+def _scaled_batches(
+    data: pd.DataFrame, short_data: pd.DataFrame,
+    model_set: ModelSet, short_dim: int, long_dim: int
+) -> Tuple[np.ndarray, np.ndarray, MinMaxScaler, MinMaxScaler]:
+
+    scaler_long, scaler_short = model_set.scaler_long, model_set.scaler_short
+    if scaler_long is None or scaler_short is None:
+        # No persisted scalers yet, fit them on this data
+        scaler_long, scaler_short = _load_scalers(data, short_data)
+
+    scaled_long = pd.DataFrame(
+        scaler_long.transform(data),
+        columns=data.columns
+    )
+    scaled_short = pd.DataFrame(
+        scaler_short.transform(short_data),
+        columns=short_data.columns
+    )
+
+    # prepare batches
+    short_seq = max(_model_seq(model) for model in model_set.short_models)
+    long_seq = max(_model_seq(model) for model in model_set.long_models)
+    short_batch = scaled_short.values[-short_seq:].reshape(1, short_seq, short_dim)
+    long_batch  = scaled_long.values[-long_seq:].reshape(1, long_seq, long_dim)
+    return long_batch, short_batch, scaler_long, scaler_short
+
+def active_model_set() -> ModelSet:
+    """
+    The models to forecast with. Models flagged in LONG/SHORT_TRAINING_MASK are trained first
+    (in parallel, see train_all.py) and their weights served. Get it once and pass it to both
+    calculate_prediction and calculate_prediction_bands, so the bands come from the same models.
+    """
+    jobs = [("long", garage) for garage, train in zip(GARAGE_NAMES, LONG_TRAINING_MASK) if train]
+    jobs += [("short", garage) for garage, train in zip(GARAGE_NAMES, SHORT_TRAINING_MASK) if train]
+    if MODEL_REGISTRY.layout == "joint":
+        # Any garage flagged retrains the joint model of its kind
+        jobs = sorted({(kind, JOINT_MODEL) for kind, _ in jobs})
+    if jobs:
+        train_models(jobs)
+        MODEL_REGISTRY.reload()
+
+    # Models are built and loaded once per release (see model_registry.py), not per forecast
+    try:
+        return MODEL_REGISTRY.active()
+    except Exception as e:
+        print(f"Could not load weights, please verify you have existing weight files, exiting. ({e})")
+        exit(-1)
+
+def _forecast_inputs(
+    forecast_start: datetime, model_set: ModelSet
+) -> Tuple[np.ndarray, np.ndarray, MinMaxScaler, MinMaxScaler, pd.DataFrame, pd.DataFrame]:
+    """
+    Scaled input windows for a forecast from forecast_start, plus the raw values and dates plot_prediction blends with.
+
+    Returns:
+        (long batch, short batch, long scaler, short scaler, raw short data, data with dates)
+    """
     # Define parameters for long and short models
-    long_feature_shape: int = short_data.shape[1] + extra_long_data
-    short_feature_shape: int = short_data.shape[1]
-    
-    # remember the models will not load correctly if you changes this and don't re-train
-    for garage_no in range(len(GARAGE_NAMES)):
-        long_garage_models.append(_build_long_model(garage_no, long_feature_shape))
-        short_garage_models.append(_build_short_model(garage_no, short_feature_shape))
-    
-    # Train models if the flag is true
-    for garage_no, garage in enumerate(GARAGE_NAMES, start=0):
-        if LONG_TRAINING_MASK[garage_no]:
-            _train_long(garage, long_garage_models[garage_no])
-        if SHORT_TRAINING_MASK[garage_no]:
-            _train_short(garage, short_garage_models[garage_no])
-    
-    prediction: np.ndarray = _make_prediction(long_data, short_data, long_garage_models, short_garage_models, short_feature_shape, long_feature_shape)
+    short_feature_shape: int = len(VALUE_COLUMNS)
+    long_feature_shape: int = short_feature_shape + len(feature_columns())
+
+    # Only featurize and scale the rows that arrived since the last forecast
+    window = None
+    scaler_long, scaler_short = model_set.scaler_long, model_set.scaler_short
+    if scaler_long is not None and scaler_short is not None:
+        window_rows = _window_rows(model_set.long_models, model_set.short_models)
+        window = STREAMING_FEATURIZER.window(forecast_start, window_rows, scaler_long, scaler_short)
+
+    if window is not None:
+        long_batch = window.long_scaled.reshape(1, window_rows, long_feature_shape)
+        short_batch = window.short_scaled.reshape(1, window_rows, short_feature_shape)
+        short_data: pd.DataFrame = pd.DataFrame(window.raw, columns=VALUE_COLUMNS)
+        data: pd.DataFrame = pd.DataFrame({"date": pd.to_datetime(window.timestamps)})
+    else:
+        # Buffer doesn't cover forecast_start (or no scalers yet), featurize the whole history
+        data = load_recent_data(forecast_start)
+        short_data = data.drop(columns=["date"]).copy() # Keep a copy of the raw density data (without date)
+        data = add_calendar_features(data)
+        long_data: pd.DataFrame = data.drop(columns=['date']).copy()
+        long_batch, short_batch, scaler_long, scaler_short = _scaled_batches(
+            long_data, short_data, model_set, short_feature_shape, long_feature_shape
+        )
+    return long_batch, short_batch, scaler_long, scaler_short, short_data, data
+
+
+def calculate_prediction(forecast_start: datetime, hours: int = 24, model_set: Optional[ModelSet] = None) -> List[float]:
+    model_set = model_set or active_model_set()
+    long_batch, short_batch, scaler_long, scaler_short, short_data, data = _forecast_inputs(forecast_start, model_set)
+    prediction: np.ndarray = _predict_scaled(
+        long_batch, short_batch, model_set.long_models, model_set.short_models, scaler_long, scaler_short
+    )
+
     start_time: pd.Timestamp = pd.Timestamp(forecast_start)
     end_time: pd.Timestamp = pd.Timestamp(forecast_start + pd.Timedelta(hours=hours))
     values = utils.plot_prediction(prediction, short_data, data, start_time, end_time)
     return values
 
+
+def calculate_prediction_bands(
+    forecast_start: datetime, hours: int = 24, samples: int = MC_SAMPLES, model_set: Optional[ModelSet] = None
+) -> Optional[Dict[str, List[List[int]]]]:
+    """
+    Hourly p10/p50/p90 forecast bands per garage from Monte-Carlo dropout (see predict_quantiles).
+
+    Returns:
+        Dict of "p10"/"p50"/"p90" -> per-garage hourly values (same layout as calculate_prediction),
+        or None when the served models can't sample dropout (quantized variants)
+    """
+    model_set = model_set or active_model_set()
+    if model_set.precision != "float32":
+        print(f"Forecast bands need the float32 models, the {model_set.precision} variant is served")
+        return None
+    long_batch, short_batch, scaler_long, scaler_short, short_data, data = _forecast_inputs(forecast_start, model_set)
+    bands = predict_quantiles(long_batch, short_batch, model_set, scaler_long, scaler_short, samples)[0]
+
+    start_time: pd.Timestamp = pd.Timestamp(forecast_start)
+    end_time: pd.Timestamp = pd.Timestamp(forecast_start + pd.Timedelta(hours=hours))
+    # The quantiles share their origin, so they're resampled as one batch
+    values = utils.hourly_forecasts(
+        bands,
+        np.repeat(short_data.values[None, -utils.LEAD_STEPS:], len(bands), axis=0),
+        np.repeat(pd.Timestamp(data["date"].iloc[-utils.LEAD_STEPS - 1]).to_datetime64(), len(bands)),
+        start_time,
+        end_time
+    )
+    return {f"p{round(quantile * 100)}": band.tolist() for quantile, band in zip(QUANTILES, values)}
+
 if __name__ == "__main__":
     values = calculate_prediction(datetime(2025, 5, 3, 0, 0))
     print_string = ""
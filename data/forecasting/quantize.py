@@ -0,0 +1,253 @@
+"""
+Post-training quantization of a model release for CPU inference.
+
+Each of the eight models is frozen and converted to TensorFlow Lite with float16 or
+int8 (dynamic range) weights, which shrinks the long models 2x/4x and runs a single
+forecast far faster than a keras predict() call. A variant is only marked servable
+if it passes the accuracy gate: the backtest MAE of every garage may not rise more
+than MAX_MAE_INCREASE over the float32 models on the same origins.
+
+Variants are written to <release>/quantized/<precision>/ (without releases, to
+keras_models/quantized/<layout>/<precision>/) with gate.json holding the backtest
+numbers, and for the live files the checksums of the weights and scalers they were
+converted from. Serve one by setting MODEL_PRECISION=float16 or int8 (see model_registry.py).
+
+    python -m data.forecasting.quantize                                   # both precisions, current release
+    python -m data.forecasting.quantize --precisions int8 --start 2025-03-01
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+import numpy as np
+import tensorflow as tf
+from keras import Model
+from tensorflow.python.framework.convert_to_constants import convert_variables_to_constants_v2
+
+from data.forecasting.constants import MODEL_DIRECTORY, GARAGE_NAMES, JOINT_MODEL
+from data.forecasting.model_registry import (
+    RELEASES_DIRECTORY,
+    LAYOUTS,
+    LIVE_VERSION,
+    MODEL_LAYOUT,
+    ModelSet,
+    current_release,
+    garage_slots,
+    live_checksums,
+    load_model_set,
+    model_names,
+    release_layout
+)
+
+QUANTIZED_PRECISIONS = ["float16", "int8"]
+# Occupancy is served in whole percent, so half a percentage point of MAE is below what the API can show
+MAX_MAE_INCREASE = 0.005
+
+
+def quantized_directory(version: Optional[str], precision: str, layout: str = MODEL_LAYOUT) -> Path:
+    if version:
+        return RELEASES_DIRECTORY / version / "quantized" / precision
+    # The live files of both layouts can sit side by side in keras_models/
+    return MODEL_DIRECTORY / "quantized" / layout / precision
+
+
+def read_gate(version: Optional[str], precision: str, layout: str = MODEL_LAYOUT) -> Optional[Dict[str, Any]]:
+    """
+    gate.json of a variant. Releases never change, but the live files are replaced by training and
+    fine-tuning: a live variant converted from other weights or scalers than the current ones doesn't pass.
+    """
+    path = quantized_directory(version, precision, layout) / "gate.json"
+    if not path.exists():
+        return None
+    with open(path) as f:
+        gate = json.load(f)
+    if not version and gate.get("source") != live_checksums(layout):
+        return {**gate, "passed": False, "stale": True}
+    return gate
+
+
+# ── CONVERSION ──────────────────────────────────────────────────────────────────
+def convert_model(model: Model, precision: str) -> bytes:
+    """
+    TFLite flatbuffer of a model with a batch size of 1. The weights are folded into
+    constants first; TFLite can't convert the LSTM loops with free variables.
+    """
+    signature = tf.TensorSpec([1, *model.input_shape[1:]], tf.float32)
+    forward = tf.function(lambda x: model(x, training=False), input_signature=[signature], autograph=False)
+    frozen = convert_variables_to_constants_v2(forward.get_concrete_function())
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([frozen])
+    if precision != "float32":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if precision == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    return converter.convert()
+
+
+class TFLiteModel:
+    """
+    A converted model with the parts of the keras Model interface predict_batch uses
+    (input_shape, output_shape and predict), so it can stand in for one in a ModelSet.
+    """
+
+    def __init__(self, path: Path, precision: str):
+        self.path = Path(path)
+        # The XNNPACK delegate's float16 path gets the (celu) short models badly wrong and is no faster
+        resolver = (
+            tf.lite.experimental.OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES if precision == "float16"
+            else tf.lite.experimental.OpResolverType.AUTO
+        )
+        self._interpreter = tf.lite.Interpreter(model_path=str(self.path), experimental_op_resolver_type=resolver)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        # One interpreter per model, forecasts from different threads take turns
+        self._lock = threading.Lock()
+
+    @property
+    def input_shape(self) -> Tuple:
+        return (None, *self._input["shape"][1:])
+
+    @property
+    def output_shape(self) -> Tuple:
+        return (None, *self._output["shape"][1:])
+
+    def predict(self, x: np.ndarray, batch_size: int = 32, verbose: int = 0) -> np.ndarray:
+        # Converted with a batch size of 1, windows are run one at a time
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        out = np.empty((len(x), *self.output_shape[1:]), dtype=np.float32)
+        with self._lock:
+            for i in range(len(x)):
+                self._interpreter.set_tensor(self._input["index"], x[i:i + 1])
+                self._interpreter.invoke()
+                out[i] = self._interpreter.get_tensor(self._output["index"])[0]
+        return out
+
+
+def load_quantized_set(
+    version: Optional[str], precision: str, scalers: Tuple, layout: str = MODEL_LAYOUT, directory: Optional[Path] = None
+) -> ModelSet:
+    """The converted models of a release, with the release's scalers"""
+    directory = directory or quantized_directory(version, precision, layout)
+    models = {name: TFLiteModel(directory / f"{name}.tflite", precision) for name in model_names(layout)}
+    return ModelSet(version or LIVE_VERSION, *garage_slots(models, layout), *scalers, precision=precision, layout=layout)
+
+
+# ── EXPORT + ACCURACY GATE ──────────────────────────────────────────────────────
+def _forecast_latency(model_set: ModelSet, repeats: int = 20) -> float:
+    """Median seconds for one blended forecast, as served"""
+    from data.forecasting.predict_future_times_individual_garage import _window_rows, predict_batch
+
+    rows = _window_rows(model_set.long_models, model_set.short_models)
+    long_batch = np.full((1, rows, model_set.long_models[0].input_shape[2]), 0.5, dtype=np.float32)
+    short_batch = np.full((1, rows, model_set.short_models[0].input_shape[2]), 0.5, dtype=np.float32)
+    timings = []
+    for _ in range(repeats + 1):
+        start = time.perf_counter()
+        predict_batch(long_batch, short_batch, model_set.long_models, model_set.short_models,
+                      model_set.scaler_long, model_set.scaler_short)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings[1:]))
+
+
+def export_quantized(
+    version: Optional[str],
+    precisions: List[str],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    step: str = "hourly",
+    max_mae_increase: float = MAX_MAE_INCREASE,
+    layout: str = MODEL_LAYOUT
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Convert a release's models and gate each precision on a backtest against the float32 models.
+    `layout` picks the live files to convert when there is no release.
+
+    Returns:
+        Dict of precision -> gate results (also written to gate.json)
+    """
+    from data.forecasting.backtest import load_history, run_backtest
+
+    layout = release_layout(version, layout)
+    # Taken before loading, so live files replaced meanwhile make the variant stale (see read_gate)
+    source = live_checksums(layout) if not version else None
+    reference = load_model_set(version, precision="float32", layout=layout)
+    if reference.scaler_long is None or reference.scaler_short is None:
+        raise RuntimeError("Quantizing needs the persisted scalers, train the models first")
+    history = load_history("csv", start, end)
+    baseline = run_backtest(history, step, model_set=reference)
+    baseline_latency = _forecast_latency(reference)
+
+    results = {}
+    for precision in precisions:
+        directory = quantized_directory(version, precision, layout)
+        directory.parent.mkdir(parents=True, exist_ok=True)
+        tmp_directory = Path(tempfile.mkdtemp(prefix=f".{precision}.", dir=directory.parent))
+        try:
+            for kind, models in (("long", reference.long_models), ("short", reference.short_models)):
+                for garage, model in zip(GARAGE_NAMES, models):
+                    # A joint model fills all four slots, convert it once
+                    name = f"{kind}_model_{JOINT_MODEL if layout == 'joint' else garage}"
+                    if not (tmp_directory / f"{name}.tflite").exists():
+                        (tmp_directory / f"{name}.tflite").write_bytes(convert_model(model, precision))
+            # Gated from the temporary directory, it only becomes servable once gate.json is in place
+            quantized = load_quantized_set(version, precision, (reference.scaler_long, reference.scaler_short), layout, tmp_directory)
+            result = run_backtest(history, step, model_set=quantized)
+            increase = result.garage_mae() - baseline.garage_mae()
+            gate = {
+                "precision": precision,
+                "passed": bool((increase <= max_mae_increase).all()),
+                "max_mae_increase": max_mae_increase,
+                "origins": result.origins,
+                "float32_mae": dict(zip(GARAGE_NAMES, baseline.garage_mae().round(6).tolist())),
+                "mae": dict(zip(GARAGE_NAMES, result.garage_mae().round(6).tolist())),
+                "float32_latency_ms": round(baseline_latency * 1000, 3),
+                "latency_ms": round(_forecast_latency(quantized) * 1000, 3),
+                "bytes": sum(path.stat().st_size for path in tmp_directory.glob("*.tflite")),
+                "created_at": datetime.now().isoformat(),
+            }
+            if source is not None:
+                gate["source"] = source
+            with open(tmp_directory / "gate.json", "w") as f:
+                json.dump(gate, f, indent=4)
+            if directory.exists():
+                shutil.rmtree(directory)
+            os.replace(tmp_directory, directory)
+        finally:
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+        results[precision] = gate
+        print(f"{precision}: {'passed' if gate['passed'] else 'FAILED'} the accuracy gate, "
+              f"MAE {gate['mae']} vs float32 {gate['float32_mae']}, "
+              f"{gate['latency_ms']}ms vs {gate['float32_latency_ms']}ms per forecast, {gate['bytes'] / 1e6:.1f}MB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export float16/int8 TFLite variants of a model release")
+    parser.add_argument("--version", help="Release to quantize (default: the current one, or the live files)")
+    parser.add_argument("--precisions", nargs="+", choices=QUANTIZED_PRECISIONS, default=QUANTIZED_PRECISIONS)
+    parser.add_argument("--start", type=datetime.fromisoformat, help="First datapoint of the gate backtest (ISO date)")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="Gate backtest uses datapoints before this (ISO date)")
+    parser.add_argument("--step", choices=["10min", "hourly"], default="hourly", help="Backtest origin spacing")
+    parser.add_argument("--max-mae-increase", type=float, default=MAX_MAE_INCREASE)
+    parser.add_argument("--layout", choices=LAYOUTS, default=MODEL_LAYOUT, help="Live models to convert when there is no release")
+    args = parser.parse_args()
+
+    export_quantized(
+        args.version or current_release(), args.precisions, args.start, args.end, args.step, args.max_mae_increase, args.layout
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+from typing import Optional, Tuple
+
+import numpy as np
+import tensorflow as tf
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def sliding_windows(data: np.ndarray, seq_size: int, future_steps: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Build the (input, target) windows for multi-step forecasting as read-only strided views.
+    Same windows as the old create_sequences, without copying the data.
+
+    Args:
+        data (np.ndarray): (rows, n_feature) array
+        seq_size (int): Rows in each input window
+        future_steps (int): Rows in each target window
+
+    Returns:
+        X: (n, seq_size, n_feature) view, Y: (n, future_steps, n_feature) view
+    """
+    data = np.ascontiguousarray(data)
+    n = len(data) - seq_size - future_steps + 1
+    if n <= 0:
+        return (np.empty((0, seq_size, data.shape[1]), data.dtype),
+                np.empty((0, future_steps, data.shape[1]), data.dtype))
+    # sliding_window_view puts the window axis last, move it back in front of the features
+    X = sliding_window_view(data[:n + seq_size - 1], seq_size, axis=0).transpose(0, 2, 1)
+    Y = sliding_window_view(data[seq_size:], future_steps, axis=0).transpose(0, 2, 1)
+    return X, Y
+
+
+def window_count(rows: int, seq_size: int, future_steps: int) -> int:
+    return max(0, rows - seq_size - future_steps + 1)
+
+
+def make_window_dataset(
+    data: np.ndarray,
+    seq_size: int,
+    future_steps: int,
+    batch_size: int,
+    shuffle: bool = False,
+    seed: Optional[int] = None
+) -> tf.data.Dataset:
+    """
+    Stream (X, Y) batches of sliding windows in float32.
+
+    Only the float32 copy of `data` and one batch of windows live in memory at a time;
+    windows are gathered from window start indices inside the input pipeline.
+
+    Args:
+        data (np.ndarray): (rows, n_feature) scaled data
+        seq_size (int): Rows in each input window
+        future_steps (int): Rows in each target window
+        batch_size (int): Windows per batch
+        shuffle (bool): Shuffle the window order every epoch (what model.fit does for arrays)
+        seed (int): Shuffle seed
+
+    Returns:
+        tf.data.Dataset yielding (batch, seq_size, n_feature), (batch, future_steps, n_feature) float32 tensors
+    """
+    values = tf.constant(np.asarray(data, dtype=np.float32))
+    n = window_count(len(data), seq_size, future_steps)
+    x_offsets = tf.range(seq_size, dtype=tf.int64)
+    y_offsets = tf.range(seq_size, seq_size + future_steps, dtype=tf.int64)
+
+    def gather_windows(starts):
+        starts = starts[:, tf.newaxis]
+        return tf.gather(values, starts + x_offsets), tf.gather(values, starts + y_offsets)
+
+    dataset = tf.data.Dataset.range(n)
+    if shuffle:
+        # Shuffles window indices only, so the buffer is 8 bytes per window
+        dataset = dataset.shuffle(max(n, 1), seed=seed, reshuffle_each_iteration=True)
+    return (
+        dataset
+        .batch(batch_size)
+        .map(gather_windows, num_parallel_calls=tf.data.AUTOTUNE)
+        .prefetch(tf.data.AUTOTUNE)
+    )
@@ -1,25 +1,27 @@
 import os
+from datetime import datetime
 import numpy as np
 import pandas as pd
-from data.forecasting.keras_model_file import train_model
+from data.forecasting.keras_model_file import train_model_from_datasets
+from data.forecasting.sequences import make_window_dataset
 from sklearn.preprocessing import MinMaxScaler
 
+from data.forecasting.data_functions import load_data_from_storage
 from data.forecasting.constants import (
-    LOGS_DIRECTORY
+    TRAINING_ROWS
 )
 
-def train_short_model(model, batch_size, future_steps, test_split, seq_size, name, training_epochs):
+def prepare_short_training_data(test_split, end=None):
+    """
+    Load and scale the short model training data (the TRAINING_ROWS datapoints before `end`).
 
-    # Create directory for saving graphs
-    output_dir = "epoch_results"
-    os.makedirs(output_dir, exist_ok=True)
+    Returns:
+        train_scaled, test_scaled (np.ndarray), scaler (MinMaxScaler), watermark (newest datapoint, datetime)
+    """
+    # Load Data, same source as the long model
+    data = load_data_from_storage(end or datetime.now(), TRAINING_ROWS)
 
-    # Load Data
-    data = pd.read_csv(f"{LOGS_DIRECTORY}/log.csv")
-
-    # Drop unnecessary columns
-    data = data.drop(columns=["Unnamed: 0", 'south density', 'west density', 'north density', 'south compus density'])
-    
+    watermark = pd.to_datetime(data["date"]).max().to_pydatetime()
     # Drop original time columns
     data = data.drop(columns=[data.columns[0]])
 
@@ -32,21 +34,21 @@ def train_short_model(model, batch_size, future_steps, test_split, seq_size, nam
     scaler.fit(train_data) # Fit the scaler to the training data
 
     # Transform the data using the scaler
-    train_scaled = pd.DataFrame(scaler.transform(train_data), columns=train_data.columns)
-    test_scaled = pd.DataFrame(scaler.transform(test_data), columns=test_data.columns)
-
-    # Sequence Settings, the sequence length is the size of the rolling window that we use to make predictions
-    n_feature = data.shape[1] # n_features is the number of inputs to the model, if we want to give the model more context we can increase this value
-
-    # Function to create sequences for multi-step forecasting
-    def create_sequences(data, seq_size, future_steps):
-        X, y = [], []
-        for i in range(len(data) - seq_size - future_steps + 1):
-            X.append(data[i:i + seq_size])
-            y.append(data[i + seq_size:i + seq_size + future_steps])
-        return np.array(X), np.array(y)
-
-    # Create sequences for training and testing
-    X_train, Y_train = create_sequences(train_scaled.values, seq_size, future_steps)
-    X_test, Y_test = create_sequences(test_scaled.values, seq_size, future_steps)
-    train_model(model, X_train, Y_train, X_test, Y_test, batch_size, training_epochs, name)
\ No newline at end of file
+    train_scaled = scaler.transform(train_data)
+    test_scaled = scaler.transform(test_data)
+    return train_scaled, test_scaled, scaler, watermark
+
+def train_short_model(model, batch_size, future_steps, test_split, seq_size, name, training_epochs):
+
+    # Create directory for saving graphs
+    output_dir = "epoch_results"
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Imported here, training_data builds its artifacts with prepare_short_training_data
+    from data.forecasting.training_data import get_dataset_artifact
+    train_scaled, test_scaled = get_dataset_artifact("short", test_split).load()
+
+    # Stream float32 sliding windows instead of materializing every sequence
+    train_dataset = make_window_dataset(train_scaled, seq_size, future_steps, batch_size, shuffle=True)
+    test_dataset = make_window_dataset(test_scaled, seq_size, future_steps, batch_size)
+    train_model_from_datasets(model, train_dataset, test_dataset, training_epochs, name)
@@ -0,0 +1,131 @@
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+
+from data.forecasting.datapoint_buffer import DATAPOINT_BUFFER, DatapointBuffer
+from data.forecasting.feature_store import feature_columns, get_feature_store, lookup_features
+
+
+def scale_rows(scaler: MinMaxScaler, rows: np.ndarray) -> np.ndarray:
+    """Same arithmetic as MinMaxScaler.transform, without the DataFrame/feature-name checks"""
+    scaled = np.array(rows, dtype=np.float64)
+    scaled *= scaler.scale_
+    scaled += scaler.min_
+    return scaled
+
+
+@dataclass
+class FeatureWindow:
+    timestamps: np.ndarray    # (n,) datetime64[ns]
+    raw: np.ndarray           # (n, 4) occupancy fractions
+    long_scaled: np.ndarray   # (n, 4 + calendar features) scaled long model inputs
+    short_scaled: np.ndarray  # (n, 4) scaled short model inputs
+
+
+class StreamingFeaturizer:
+    """
+    Keeps the featurized and scaled tail of the datapoint buffer.
+
+    Each call only featurizes and scales the rows that arrived since the previous call,
+    so per-refresh cost scales with new data instead of history length. Scaling is
+    per column, which makes scaling new rows on their own identical to scaling everything.
+    """
+
+    def __init__(self, buffer: DatapointBuffer = DATAPOINT_BUFFER):
+        self.buffer = buffer
+        self.capacity = buffer.capacity
+        self._lock = threading.Lock()
+        self._reset(None, None, None)
+
+    def _reset(self, scalers, store, columns) -> None:
+        # Row arrays are sized on the first append, once the feature width is known
+        self._timestamps = np.zeros(2 * self.capacity, dtype="datetime64[ns]")
+        self._raw = None
+        self._long = None
+        self._short = None
+        self._next = 0
+        self._size = 0
+        self._scalers = scalers
+        self._store = store
+        self._columns = columns
+        self._generation = self.buffer.generation
+
+    def _append(self, timestamps: np.ndarray, raw: np.ndarray, long_rows: np.ndarray, short_rows: np.ndarray) -> None:
+        if self._raw is None:
+            self._raw = np.zeros((2 * self.capacity, raw.shape[1]))
+            self._long = np.zeros((2 * self.capacity, long_rows.shape[1]))
+            self._short = np.zeros((2 * self.capacity, short_rows.shape[1]))
+        # Only the last `capacity` rows can survive
+        keep = slice(max(0, len(timestamps) - self.capacity), len(timestamps))
+        positions = (self._next + np.arange(len(timestamps[keep]))) % self.capacity
+        for target in (positions, positions + self.capacity):
+            self._timestamps[target] = timestamps[keep]
+            self._raw[target] = raw[keep]
+            self._long[target] = long_rows[keep]
+            self._short[target] = short_rows[keep]
+        self._next = (self._next + len(positions)) % self.capacity
+        self._size = min(self._size + len(positions), self.capacity)
+
+    def update(self, scaler_long: MinMaxScaler, scaler_short: MinMaxScaler) -> int:
+        """
+        Featurize and scale the rows added to the buffer since the last update.
+
+        Returns:
+            int: Number of rows processed
+        """
+        with self._lock:
+            store = get_feature_store()
+            columns = feature_columns()
+            scalers = (scaler_long, scaler_short)
+            # Anything the cached rows depend on changed, start over
+            if (self._scalers is None or any(a is not b for a, b in zip(self._scalers, scalers))
+                    or self._generation != self.buffer.generation or self._store is not store
+                    or self._columns != columns):
+                self._reset(scalers, store, columns)
+
+            after = self._timestamps[self._next + self.capacity - 1] if self._size else None
+            timestamps, raw, complete = self.buffer.since(after)
+            if not complete:
+                # Rows we never saw were overwritten, the cached tail has a gap
+                self._reset(scalers, store, columns)
+                timestamps, raw, _ = self.buffer.since(None)
+            if not len(timestamps):
+                return 0
+
+            long_rows = np.hstack([raw, lookup_features(timestamps, columns)])
+            self._append(
+                timestamps, raw,
+                scale_rows(scaler_long, long_rows),
+                scale_rows(scaler_short, raw)
+            )
+            return len(timestamps)
+
+    def window(self, before: datetime, n: int, scaler_long: MinMaxScaler, scaler_short: MinMaxScaler) -> Optional[FeatureWindow]:
+        """
+        Get the last n featurized rows with timestamp < before.
+
+        Returns:
+            FeatureWindow with copies of the rows, or None if the buffer doesn't hold n rows before `before`
+        """
+        self.update(scaler_long, scaler_short)
+        with self._lock:
+            end = self._next + self.capacity
+            start = end - self._size
+            cut = start + int(np.searchsorted(self._timestamps[start:end], np.datetime64(before, "ns"), side="left"))
+            if cut - start < n:
+                return None
+            lo = cut - n
+            return FeatureWindow(
+                timestamps=self._timestamps[lo:cut].copy(),
+                raw=self._raw[lo:cut].copy(),
+                long_scaled=self._long[lo:cut].copy(),
+                short_scaled=self._short[lo:cut].copy()
+            )
+
+
+# Process-wide featurizer over DATAPOINT_BUFFER
+STREAMING_FEATURIZER = StreamingFeaturizer()
@@ -0,0 +1,341 @@
+"""
+Hyperparameter sweep for the per-garage long and short models.
+
+Samples configurations from SEARCH_SPACE, trains them in parallel (same worker
+pool and shared dataset as train_all.py) and stops poor trials early with a
+median or successive-halving rule. Every trial and its per-epoch validation loss
+is recorded in a local SQLite results store. The best complete trial of each
+model is then retrained with the full epochs into a staging directory; once every
+retrain succeeded, its weights replace the served ones and its configuration is
+written to keras_models/hyperparameters.json, which _build_long_model /
+_build_short_model read.
+
+    python -m data.forecasting.sweep --kinds short --garages south --trials 12
+    python -m data.forecasting.sweep --rule median --max-epochs 6 --dry-run
+"""
+import argparse
+import json
+import random
+import sqlite3
+import sys
+import time
+import uuid
+from concurrent.futures import as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+import numpy as np
+
+from data.forecasting.constants import (
+    LOGS_DIRECTORY,
+    GARAGE_NAMES,
+    LONG_FUTURE_STEPS,
+    SHORT_FUTURE_STEPS,
+    TRAINING_BATCH_SIZE
+)
+from data.forecasting.train_all import Job, create_pool, plan_workers, train_models
+from data.forecasting.training_data import MODEL_KINDS, SharedTrainingData, load_shared_split
+
+RESULTS_PATH = LOGS_DIRECTORY / "sweeps.db"
+
+SEARCH_SPACE: Dict[str, Dict[str, List[Any]]] = {
+    "long": {
+        "lstm_neurons_list": [[64, 16, 64], [128, 32, 128], [192, 32, 192], [256, 64, 256], [512, 64, 512]],
+        "dropout": [0.0, 0.1, 0.2, 0.3],
+        "learning_rate": [1e-5, 2e-5, 5e-5, 1e-4],
+        "activation": ["linear", "celu", "sigmoid"],
+        "seq_size": [4, 8, 16, 24],
+    },
+    "short": {
+        "lstm_neurons_list": [[32, 8, 32], [64, 16, 64], [128, 32, 128], [64, 64]],
+        "dropout": [0.0, 0.1, 0.2],
+        "learning_rate": [3e-5, 1e-4, 3e-4, 1e-3],
+        "activation": ["linear", "celu", "sigmoid"],
+        "seq_size": [8, 16, 24, 32],
+    },
+}
+FUTURE_STEPS = {"long": LONG_FUTURE_STEPS, "short": SHORT_FUTURE_STEPS}
+
+
+# ── RESULTS STORE ───────────────────────────────────────────────────────────────
+class TrialStore:
+    """SQLite record of every trial and its validation loss after each epoch"""
+
+    def __init__(self, path: Path = RESULTS_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Trials in other processes write concurrently, so wait on locks instead of failing
+        self.conn = sqlite3.connect(self.path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS trials (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sweep TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                garage TEXT NOT NULL,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                best_val_loss REAL,
+                epochs INTEGER NOT NULL DEFAULT 0,
+                seconds REAL,
+                created_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS trial_epochs (
+                trial_id INTEGER NOT NULL,
+                epoch INTEGER NOT NULL,
+                val_loss REAL NOT NULL,
+                PRIMARY KEY (trial_id, epoch)
+            );
+        """)
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def create_trial(self, sweep: str, kind: str, garage: str, params: Dict[str, Any]) -> int:
+        cursor = self.conn.execute(
+            "INSERT INTO trials (sweep, kind, garage, params, status, created_at) VALUES (?, ?, ?, ?, 'pending', ?)",
+            (sweep, kind, garage, json.dumps(params), datetime.now().isoformat())
+        )
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def report(self, trial_id: int, epoch: int, val_loss: float) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO trial_epochs (trial_id, epoch, val_loss) VALUES (?, ?, ?)",
+            (trial_id, epoch, val_loss)
+        )
+        self.conn.execute("UPDATE trials SET status = 'running', epochs = ? WHERE id = ?", (epoch, trial_id))
+        self.conn.commit()
+
+    def losses_at(self, trial_id: int, epoch: int) -> List[float]:
+        """Validation losses of the other trials of the same sweep and model at this epoch"""
+        rows = self.conn.execute("""
+            SELECT e.val_loss FROM trial_epochs e
+            JOIN trials t ON t.id = e.trial_id
+            JOIN trials me ON me.id = ?
+            WHERE t.sweep = me.sweep AND t.kind = me.kind AND t.garage = me.garage
+              AND e.epoch = ? AND e.trial_id != me.id
+        """, (trial_id, epoch)).fetchall()
+        return [row[0] for row in rows]
+
+    def finish(self, trial_id: int, status: str, best_val_loss: Optional[float], epochs: int, seconds: float) -> None:
+        self.conn.execute(
+            "UPDATE trials SET status = ?, best_val_loss = ?, epochs = ?, seconds = ? WHERE id = ?",
+            (status, best_val_loss, epochs, seconds, trial_id)
+        )
+        self.conn.commit()
+
+    def best_trials(self, sweep: str) -> Dict[Job, Tuple[Dict[str, Any], float]]:
+        """Best complete trial of each (kind, garage) in the sweep"""
+        rows = self.conn.execute("""
+            SELECT kind, garage, params, best_val_loss FROM trials
+            WHERE sweep = ? AND status = 'complete' AND best_val_loss IS NOT NULL
+            ORDER BY best_val_loss ASC
+        """, (sweep,)).fetchall()
+        best: Dict[Job, Tuple[Dict[str, Any], float]] = {}
+        for kind, garage, params, loss in rows:
+            best.setdefault((kind, garage), (json.loads(params), loss))
+        return best
+
+
+# ── PRUNING RULES ───────────────────────────────────────────────────────────────
+class MedianPruner:
+    """Stop a trial whose loss is worse than the median of the other trials at the same epoch"""
+
+    def __init__(self, warmup_epochs: int = 1, min_trials: int = 3):
+        self.warmup_epochs = warmup_epochs
+        self.min_trials = min_trials
+
+    def should_prune(self, epoch: int, value: float, others: List[float]) -> bool:
+        if epoch <= self.warmup_epochs or len(others) < self.min_trials:
+            return False
+        return value > float(np.median(others))
+
+
+class SuccessiveHalvingPruner:
+    """
+    Asynchronous successive halving: at the rung epochs min_epochs * eta**k, only the
+    best 1/eta of the trials that reached that rung so far keep training.
+    """
+
+    def __init__(self, min_epochs: int = 1, eta: int = 3):
+        self.min_epochs = min_epochs
+        self.eta = eta
+
+    def is_rung(self, epoch: int) -> bool:
+        rung = self.min_epochs
+        while rung < epoch:
+            rung *= self.eta
+        return rung == epoch
+
+    def should_prune(self, epoch: int, value: float, others: List[float]) -> bool:
+        if not self.is_rung(epoch):
+            return False
+        values = sorted(others + [value])
+        keep = len(values) // self.eta
+        # Too few trials at this rung to rank against yet
+        if keep == 0:
+            return False
+        return value > values[keep - 1]
+
+
+PRUNERS = {"halving": SuccessiveHalvingPruner, "median": MedianPruner}
+
+
+def sample_configs(kind: str, count: int, rng: random.Random) -> List[Dict[str, Any]]:
+    """Draw distinct random configurations from the kind's search space"""
+    space = SEARCH_SPACE[kind]
+    total = int(np.prod([len(values) for values in space.values()]))
+    configs: List[Dict[str, Any]] = []
+    seen = set()
+    while len(configs) < min(count, total):
+        config = {name: rng.choice(values) for name, values in space.items()}
+        key = json.dumps(config, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+    return configs
+
+
+# ── TRIALS ──────────────────────────────────────────────────────────────────────
+def _run_trial(
+    store_path: str, trial_id: int, kind: str, garage: str, params: Dict[str, Any],
+    paths: Dict[str, str], feature_dim: int, max_epochs: int, batch_size: int, pruner
+) -> Tuple[int, str, Optional[float], int]:
+    from tensorflow import keras
+    from data.forecasting.keras_model_file import build_model, reduce_lr
+    from data.forecasting.sequences import make_window_dataset
+
+    store = TrialStore(store_path)
+    start = time.perf_counter()
+    losses: List[float] = []
+    state = {"status": "complete"}
+
+    class PruningCallback(keras.callbacks.Callback):
+        def on_epoch_end(self, epoch, logs=None):
+            val_loss = float((logs or {})["val_loss"])
+            losses.append(val_loss)
+            store.report(trial_id, epoch + 1, val_loss)
+            if pruner.should_prune(epoch + 1, val_loss, store.losses_at(trial_id, epoch + 1)):
+                state["status"] = "pruned"
+                self.model.stop_training = True
+
+    try:
+        model = build_model(
+            lstm_neurons_list = params["lstm_neurons_list"],
+            dropout           = params["dropout"],
+            learning_rate     = params["learning_rate"],
+            seq_size          = params["seq_size"],
+            activation        = params["activation"],
+            n_feature         = feature_dim,
+            future_steps      = FUTURE_STEPS[kind],
+            garage_no         = GARAGE_NAMES.index(garage)
+        )
+        train_values, test_values = load_shared_split(paths)
+        model.fit(
+            make_window_dataset(train_values, params["seq_size"], FUTURE_STEPS[kind], batch_size, shuffle=True),
+            validation_data=make_window_dataset(test_values, params["seq_size"], FUTURE_STEPS[kind], batch_size),
+            epochs=max_epochs,
+            callbacks=[reduce_lr, PruningCallback()],
+            verbose=0
+        )
+        # A diverged trial can't win
+        best = min(losses) if losses and np.isfinite(min(losses)) else None
+        status = state["status"] if best is not None else "failed"
+    except Exception as e:
+        print(f"Trial {trial_id} ({kind}/{garage}) failed: {e}")
+        best, status = None, "failed"
+    store.finish(trial_id, status, best, len(losses), time.perf_counter() - start)
+    store.close()
+    return trial_id, status, best, len(losses)
+
+
+def run_sweep(
+    jobs: List[Job],
+    trials: int = 12,
+    max_epochs: int = 9,
+    rule: str = "halving",
+    workers: Optional[int] = None,
+    batch_size: int = TRAINING_BATCH_SIZE,
+    seed: Optional[int] = None,
+    store_path: Path = RESULTS_PATH
+) -> Tuple[str, Dict[Job, Tuple[Dict[str, Any], float]]]:
+    """
+    Run `trials` sampled configurations for each (kind, garage) model.
+
+    Returns:
+        (sweep id, {(kind, garage): (best params, best validation loss)})
+    """
+    sweep = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+    rng = random.Random(seed)
+    pruner = PRUNERS[rule]()
+    store = TrialStore(store_path)
+    kinds = [kind for kind in MODEL_KINDS if any(job[0] == kind for job in jobs)]
+
+    # Same configurations for every garage of a kind, so their results are comparable
+    configs = {kind: sample_configs(kind, trials, rng) for kind in kinds}
+    # Interleaved by model, so every model's trials reach the pruning rungs at about the same time
+    pending = []
+    for index in range(trials):
+        for kind, garage in jobs:
+            if index < len(configs[kind]):
+                params = configs[kind][index]
+                pending.append((store.create_trial(sweep, kind, garage, params), kind, garage, params))
+    workers, threads = plan_workers(len(pending), workers)
+    print(f"Sweep {sweep}: {len(pending)} trials on {workers} workers x {threads} threads ({rule} pruning)")
+
+    start = time.perf_counter()
+    with SharedTrainingData(kinds) as shared:
+        with create_pool(workers, threads) as pool:
+            futures = [
+                pool.submit(
+                    _run_trial, str(store_path), trial_id, kind, garage, params,
+                    shared.paths[kind], shared.feature_dims[kind], max_epochs, batch_size, pruner
+                )
+                for trial_id, kind, garage, params in pending
+            ]
+            for future in as_completed(futures):
+                trial_id, status, best, epochs = future.result()
+                loss = f"{best:.5f}" if best is not None else "-"
+                print(f"Trial {trial_id}: {status} after {epochs} epochs, best val_loss {loss}")
+
+    best = store.best_trials(sweep)
+    store.close()
+    print(f"Sweep {sweep} finished in {time.perf_counter() - start:.1f}s")
+    return sweep, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep for the forecasting models")
+    parser.add_argument("--kinds", nargs="+", choices=MODEL_KINDS, default=MODEL_KINDS)
+    parser.add_argument("--garages", nargs="+", choices=GARAGE_NAMES, default=GARAGE_NAMES)
+    parser.add_argument("--trials", type=int, default=12, help="Configurations tried per model")
+    parser.add_argument("--max-epochs", type=int, default=9)
+    parser.add_argument("--rule", choices=list(PRUNERS), default="halving")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--batch-size", type=int, default=TRAINING_BATCH_SIZE)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--store", type=Path, default=RESULTS_PATH, help="SQLite results store")
+    parser.add_argument("--dry-run", action="store_true", help="Only record results, don't write the winners or retrain")
+    args = parser.parse_args()
+
+    jobs = [(kind, garage) for kind in args.kinds for garage in args.garages]
+    sweep, best = run_sweep(jobs, args.trials, args.max_epochs, args.rule, args.workers, args.batch_size, args.seed, args.store)
+
+    for (kind, garage), (params, loss) in sorted(best.items()):
+        print(f"Best {kind}/{garage}: val_loss {loss:.5f} {params}")
+    if args.dry_run or not best:
+        return
+    # The new architectures don't match the served weights: retrain them with the full epochs, the
+    # winners are only written to hyperparameters.json together with their weights
+    train_models(list(best), args.workers, params={job: params for job, (params, _) in best.items()})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Regular time grid for the irregularly sampled datapoints.
+
+The logger samples every 10 minutes, retries after a minute when the page doesn't parse,
+sampled hourly overnight in older data and leaves gaps whenever the scraper is down.
+TimeGrid maps datapoints onto fixed 10-minute slots aligned to the hour, so any timestamp
+maps to its slot with one subtraction and one division, and every consumer (hourly rollups,
+charts, windows) works on the same aligned arrays with an explicit mask of observed slots
+instead of searching for the nearest timestamp.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from data.storage import STATUS_FIELDS
+
+GRID_STEP = np.timedelta64(10, "m")
+SLOTS_PER_HOUR = int(np.timedelta64(1, "h") // GRID_STEP)
+# Longest run of empty slots that is interpolated, covers the hourly overnight sampling;
+# longer gaps are scraper outages and stay missing
+MAX_FILL_GAP = np.timedelta64(1, "h")
+
+Timestamp = Union[datetime, np.datetime64]
+
+
+@dataclass
+class TimeGrid:
+    start: np.datetime64   # time of slot 0 (aligned to the hour)
+    step: np.timedelta64
+    sums: np.ndarray       # (slots, columns) sum of the datapoints in each slot
+    counts: np.ndarray     # (slots,) datapoints in each slot
+
+    @classmethod
+    def from_arrays(
+        cls,
+        timestamps: np.ndarray,
+        values: np.ndarray,
+        start: Optional[Timestamp] = None,
+        end: Optional[Timestamp] = None,
+        step: np.timedelta64 = GRID_STEP
+    ) -> "TimeGrid":
+        """
+        Bin datapoints into the slots [start, end). Datapoints outside are dropped.
+
+        Args:
+            timestamps (np.ndarray): (n,) datetime64, any order
+            values (np.ndarray): (n, columns)
+            start: First slot, defaults to the hour of the first datapoint (floored to the hour)
+            end: End of the grid, defaults to just after the last datapoint (rounded up to the hour)
+        """
+        timestamps = np.asarray(timestamps, dtype="datetime64[ns]")
+        values = np.asarray(values, dtype=np.float64).reshape(len(timestamps), -1)
+        step = np.timedelta64(step, "ns")
+        if start is None:
+            start = timestamps.min() if len(timestamps) else np.datetime64("1970-01-01")
+        start = np.datetime64(start, "ns").astype("datetime64[h]").astype("datetime64[ns]")
+        if end is None:
+            end = (timestamps.max() if len(timestamps) else start) + np.timedelta64(1, "h")
+        end = np.datetime64(end, "ns")
+        # Whole hours, so hourly reductions are plain reshapes
+        slots = -(-int((end - start) // step) // SLOTS_PER_HOUR) * SLOTS_PER_HOUR
+
+        offsets = (timestamps - start) // step
+        keep = (offsets >= 0) & (offsets < slots) & (timestamps < end)
+        offsets = offsets[keep].astype(np.int64)
+        sums = np.zeros((slots, values.shape[1]))
+        np.add.at(sums, offsets, values[keep])
+        counts = np.bincount(offsets, minlength=slots)
+        return cls(start, step, sums, counts)
+
+    @classmethod
+    def from_datapoints(
+        cls, docs: Iterable[Dict[str, Any]], start: Optional[Timestamp] = None, end: Optional[Timestamp] = None
+    ) -> "TimeGrid":
+        """Grid of storage datapoints, one column per STATUS_FIELDS entry (values in percent)"""
+        docs = list(docs)
+        timestamps = np.array([doc["timestamp"] for doc in docs], dtype="datetime64[ns]")
+        values = np.array([[doc[field] for field in STATUS_FIELDS] for doc in docs], dtype=np.float64)
+        return cls.from_arrays(timestamps, values.reshape(len(docs), len(STATUS_FIELDS)), start, end)
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    # ── ALIGNMENT ───────────────────────────────────────────────────────────────
+    def offset(self, timestamp: Timestamp) -> int:
+        """Slot of a timestamp (may be outside [0, len) if the timestamp is outside the grid)"""
+        return int((np.datetime64(timestamp, "ns") - self.start) // self.step)
+
+    def offsets(self, timestamps: np.ndarray) -> np.ndarray:
+        return ((np.asarray(timestamps, dtype="datetime64[ns]") - self.start) // self.step).astype(np.int64)
+
+    @property
+    def times(self) -> np.ndarray:
+        return self.start + np.arange(len(self)) * self.step
+
+    @property
+    def end(self) -> np.datetime64:
+        return self.start + len(self) * self.step
+
+    # ── VALUES ──────────────────────────────────────────────────────────────────
+    @property
+    def observed(self) -> np.ndarray:
+        """(slots,) True where the slot has at least one datapoint"""
+        return self.counts > 0
+
+    @property
+    def values(self) -> np.ndarray:
+        """(slots, columns) mean of each slot's datapoints, NaN for empty slots"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.sums / self.counts[:, None]
+
+    def filled(self, max_gap: np.timedelta64 = MAX_FILL_GAP) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Values with short gaps linearly interpolated.
+
+        Args:
+            max_gap (np.timedelta64): Only runs of empty slots at most this long are filled
+
+        Returns:
+            (values, valid): values is (slots, columns) with NaN where still missing,
+            valid is (slots,) True where the value is observed or interpolated
+        """
+        values = self.values
+        observed = self.observed
+        index = np.arange(len(self))
+        known = index[observed]
+        if not len(known):
+            return values, observed
+        # Nearest observed slot at or before / at or after every slot
+        previous = np.maximum.accumulate(np.where(observed, index, -1))
+        following = np.minimum.accumulate(np.where(observed, index, len(self))[::-1])[::-1]
+        max_slots = int(max_gap // self.step) + 1
+        valid = observed | ((previous >= 0) & (following < len(self)) & (following - previous <= max_slots))
+        fill = valid & ~observed
+        for column in range(values.shape[1]):
+            values[fill, column] = np.interp(index[fill], known, values[observed, column])
+        return values, valid
+
+    def hourly_means(self) -> np.ndarray:
+        """(hours, columns) mean of the datapoints in each hour, NaN for hours without data"""
+        hours = len(self) // SLOTS_PER_HOUR
+        sums = self.sums.reshape(hours, SLOTS_PER_HOUR, -1).sum(axis=1)
+        counts = self.counts.reshape(hours, SLOTS_PER_HOUR).sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return sums / counts[:, None]
+
+    def daily_hourly_means(self) -> Dict[str, np.ndarray]:
+        """YYYY-MM-DD -> (24, columns) hourly means, for every day the grid fully covers"""
+        means = self.hourly_means()
+        start_hour = self.start.astype("datetime64[h]")
+        hour_of_day = int((start_hour - start_hour.astype("datetime64[D]")).astype(np.int64))
+        days = {}
+        # The first midnight in the grid starts the first full day
+        for first_hour in range((24 - hour_of_day) % 24, len(means) - 23, 24):
+            day = (start_hour + np.timedelta64(first_hour, "h")).astype("datetime64[D]")
+            days[str(day)] = means[first_hour:first_hour + 24]
+        return days
+
+
+def rollup_values(hourly: np.ndarray) -> List[List[Optional[int]]]:
+    """Per-column lists of 24 rounded hourly values, None for hours without data (rollup "values")"""
+    return [[None if np.isnan(value) else round(float(value)) for value in column] for column in hourly.T]
@@ -0,0 +1,254 @@
+"""
+Train the per-garage long and short models in parallel.
+
+The featurized, scaled dataset is built once and shared with the workers as
+memory-mapped float32 arrays. Each worker process gets its own slice of the CPUs
+and TensorFlow thread pools sized to it, and weights are written atomically so a
+running server never loads a half-written file.
+
+    python -m data.forecasting.train_all                              # all eight models
+    python -m data.forecasting.train_all --kinds long --garages south west
+    python -m data.forecasting.train_all --workers 4 --long-epochs 2 --short-epochs 2
+    python -m data.forecasting.train_all --layout joint               # one long and one short model for all garages
+    python -m data.forecasting.train_all --publish                    # and serve them (see model_registry.py)
+"""
+import argparse
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+# TensorFlow's thread pools are sized inside the workers (configure_worker), before they run any op
+from data.forecasting.constants import (
+    GARAGE_NAMES,
+    JOINT_MODEL,
+    MODEL_DIRECTORY,
+    LONG_FUTURE_STEPS,
+    SHORT_FUTURE_STEPS,
+    LONG_TRAINING_EPOCHS,
+    SHORT_TRAINING_EPOCHS,
+    TRAINING_BATCH_SIZE
+)
+from data.forecasting.hyperparameters import save_tuned_hyperparameters
+from data.forecasting.training_data import MODEL_KINDS, SharedTrainingData, load_shared_split, save_scaler_atomic
+from data.forecasting.training_state import record_training
+from data.forecasting.model_registry import LAYOUTS, MODEL_LAYOUT, publish_release
+
+Job = Tuple[str, str]  # (kind, garage)
+ALL_JOBS: List[Job] = [(kind, garage) for kind in MODEL_KINDS for garage in GARAGE_NAMES]
+
+
+# ── WORKER SETUP ────────────────────────────────────────────────────────────────
+def available_cpus() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def plan_workers(job_count: int, workers: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Size the pool to the machine.
+
+    Returns:
+        (workers, threads per worker)
+    """
+    cpus = len(available_cpus())
+    workers = max(1, min(workers or cpus, job_count))
+    return workers, max(1, cpus // workers)
+
+
+def configure_worker(counter, threads: int, cpu_ids: List[int]) -> None:
+    """Process pool initializer: pin this worker to its own CPUs and size TF's thread pools to them"""
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    own_cpus = cpu_ids[index * threads:(index + 1) * threads] or cpu_ids
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, own_cpus)
+
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["TF_NUM_INTRAOP_THREADS"] = str(threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def create_pool(workers: int, threads: int) -> ProcessPoolExecutor:
+    # spawn, not fork: a forked child would inherit the parent's TF/BLAS thread state
+    context = mp.get_context("spawn")
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=configure_worker,
+        initargs=(context.Value("i", 0), threads, available_cpus())
+    )
+
+
+# ── TRAINING ────────────────────────────────────────────────────────────────────
+def _train_job(
+    kind: str, garage: str, paths: Dict[str, str], feature_dim: int, epochs: int, batch_size: int,
+    params: Optional[Dict[str, Any]] = None, directory: Path = MODEL_DIRECTORY
+) -> Tuple[str, str, float]:
+    from data.forecasting.keras_model_file import build_model, train_model_from_datasets
+    from data.forecasting.sequences import make_window_dataset
+    from data.forecasting.predict_future_times_individual_garage import _build_long_model, _build_short_model
+
+    from data.forecasting.predict_future_times_individual_garage import _garage_no
+
+    start = time.perf_counter()
+    garage_no = _garage_no(garage)
+    future_steps = LONG_FUTURE_STEPS if kind == "long" else SHORT_FUTURE_STEPS
+    if params is not None:
+        # Hyperparameters that aren't in hyperparameters.json yet (sweep winners)
+        model = build_model(
+            lstm_neurons_list = params["lstm_neurons_list"],
+            dropout           = params["dropout"],
+            learning_rate     = params["learning_rate"],
+            seq_size          = params["seq_size"],
+            activation        = params["activation"],
+            n_feature         = feature_dim,
+            future_steps      = future_steps,
+            garage_no         = garage_no
+        )
+    # Built exactly as calculate_prediction builds them, so the weights load there
+    elif kind == "long":
+        model = _build_long_model(garage_no, feature_dim)
+    else:
+        model = _build_short_model(garage_no, feature_dim)
+    # Tuned hyperparameters can change the sequence length
+    seq_size = model.input_shape[1]
+
+    train_values, test_values = load_shared_split(paths)
+    train_dataset = make_window_dataset(train_values, seq_size, future_steps, batch_size, shuffle=True)
+    test_dataset = make_window_dataset(test_values, seq_size, future_steps, batch_size)
+    print(f"training {kind} model: {garage}")
+    train_model_from_datasets(model, train_dataset, test_dataset, epochs, f"{kind}_model_{garage}", directory)
+    return kind, garage, time.perf_counter() - start
+
+
+def train_models(
+    jobs: Optional[List[Job]] = None,
+    workers: Optional[int] = None,
+    long_epochs: int = LONG_TRAINING_EPOCHS,
+    short_epochs: int = SHORT_TRAINING_EPOCHS,
+    batch_size: int = TRAINING_BATCH_SIZE,
+    params: Optional[Dict[Job, Dict[str, Any]]] = None
+) -> Dict[Job, float]:
+    """
+    Train the given (kind, garage) models in a process pool.
+
+    Args:
+        jobs (List[Job]): Models to train, defaults to all eight
+        workers (int): Pool size, defaults to one per CPU (capped at the number of jobs)
+        params (Dict[Job, Dict]): New hyperparameters of every job. The models are trained into a
+            staging directory, and their weights, scalers and hyperparameters.json only replace the
+            served ones once every job succeeded; the served weights don't fit another architecture
+
+    Returns:
+        Dict[Job, float]: Training seconds of each finished model
+    """
+    jobs = list(jobs or ALL_JOBS)
+    # Long models are the slowest, start them first so they don't trail at the end
+    jobs.sort(key=lambda job: MODEL_KINDS.index(job[0]))
+    epochs = {"long": long_epochs, "short": short_epochs}
+    workers, threads = plan_workers(len(jobs), workers)
+    kinds = [kind for kind in MODEL_KINDS if any(job[0] == kind for job in jobs)]
+    # The scaler is shared by all garages of a kind. Models retrained without the others of their
+    # kind (or the joint model that forecasts them all) are trained on the served scaler, which stays
+    complete = [
+        kind for kind in kinds
+        if all((kind, garage) in jobs for garage in GARAGE_NAMES) or (kind, JOINT_MODEL) in jobs
+    ]
+    partial = [kind for kind in kinds if kind not in complete]
+    directory = MODEL_DIRECTORY / f".staging-{os.getpid()}" if params is not None else MODEL_DIRECTORY
+
+    start = time.perf_counter()
+    durations: Dict[Job, float] = {}
+    failed: List[Job] = []
+    with SharedTrainingData(kinds, keep_scalers=partial) as shared:
+        print(f"Training {len(jobs)} models on {workers} workers x {threads} threads")
+        with create_pool(workers, threads) as pool:
+            futures = {
+                pool.submit(
+                    _train_job, kind, garage, shared.paths[kind], shared.feature_dims[kind], epochs[kind], batch_size,
+                    params[(kind, garage)] if params is not None else None, directory
+                ): (kind, garage)
+                for kind, garage in jobs
+            }
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    _, _, seconds = future.result()
+                    durations[job] = seconds
+                    print(f"Finished {job[0]} model {job[1]} in {seconds:.1f}s")
+                except Exception as e:
+                    failed.append(job)
+                    print(f"Training {job[0]} model {job[1]} failed: {e}")
+
+        # A fresh scaler is only saved once every model of its kind was retrained on it, or when
+        # there was no persisted scaler to train on
+        for kind in kinds:
+            retrained = all((kind, garage) in durations for garage in GARAGE_NAMES) or (kind, JOINT_MODEL) in durations
+            persisted = (MODEL_DIRECTORY / f"scaler_{kind}.pkl").exists()
+            if (kind in complete and retrained) or (kind in partial and not persisted and any(job[0] == kind for job in durations)):
+                save_scaler_atomic(shared.scalers[kind], kind, directory)
+                print(f"Saved {kind} scaler")
+
+        if params is not None and failed:
+            shutil.rmtree(directory, ignore_errors=True)
+        else:
+            if params is not None:
+                _promote_staged(directory, params)
+            for kind, garage in durations:
+                # Fine-tuning (fine_tune.py) continues from the newest datapoint trained on
+                record_training(f"{kind}_model_{garage}", shared.watermarks[kind])
+
+    elapsed = time.perf_counter() - start
+    slowest = max(durations.values(), default=0.0)
+    print(f"Trained {len(durations)}/{len(jobs)} models in {elapsed:.1f}s (slowest model {slowest:.1f}s)")
+    if failed:
+        kept = ", the served models and hyperparameters are unchanged" if params is not None else ""
+        raise RuntimeError(f"Training failed for: {', '.join(f'{kind}/{garage}' for kind, garage in failed)}{kept}")
+    return durations
+
+
+def _promote_staged(directory: Path, params: Dict[Job, Dict[str, Any]]) -> None:
+    """Move the staged weights and scalers over the served ones and write their hyperparameters next to them"""
+    for path in sorted(directory.iterdir()):
+        os.replace(path, MODEL_DIRECTORY / path.name)
+    directory.rmdir()
+    save_tuned_hyperparameters(params)
+    print(f"Served {len(params)} retrained models with their new hyperparameters")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the per-garage forecasting models in parallel")
+    parser.add_argument("--kinds", nargs="+", choices=MODEL_KINDS, default=MODEL_KINDS)
+    parser.add_argument("--garages", nargs="+", choices=GARAGE_NAMES, default=GARAGE_NAMES)
+    parser.add_argument("--layout", choices=LAYOUTS, default=MODEL_LAYOUT, help="Train per-garage models or one joint model per kind")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--long-epochs", type=int, default=LONG_TRAINING_EPOCHS)
+    parser.add_argument("--short-epochs", type=int, default=SHORT_TRAINING_EPOCHS)
+    parser.add_argument("--batch-size", type=int, default=TRAINING_BATCH_SIZE)
+    parser.add_argument("--publish", action="store_true", help="Publish the trained models as the current release")
+    args = parser.parse_args()
+
+    garages = [JOINT_MODEL] if args.layout == "joint" else args.garages
+    jobs = [(kind, garage) for kind in args.kinds for garage in garages]
+    train_models(jobs, args.workers, args.long_epochs, args.short_epochs, args.batch_size)
+    if args.publish:
+        publish_release(f"train_all {' '.join(args.kinds)}: {' '.join(garages)}", layout=args.layout)
+
+
+if __name__ == "__main__":
+    main()
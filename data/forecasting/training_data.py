@@ -0,0 +1,320 @@
+"""
+Cached, versioned training datasets.
+
+A dataset artifact is the featurized, scaled float32 train/test arrays of one model
+kind, with the fitted scaler and a manifest, in records/datasets/<kind>-<hash>/.
+The hash covers everything that changes the arrays (ENABLE_* flags, feature columns,
+calendar CSVs, sequence lengths, split, row count and the newest datapoint in
+storage), so repeated experiments on unchanged data reuse the artifact and skip all
+preprocessing.
+
+    python -m data.forecasting.training_data              # build (or reuse) both kinds
+    python -m data.forecasting.training_data --list
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+import joblib
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+
+from data.forecasting.constants import (
+    LOGS_DIRECTORY,
+    MODEL_DIRECTORY,
+    LONG_SEQ,
+    LONG_FUTURE_STEPS,
+    SHORT_SEQ,
+    SHORT_FUTURE_STEPS,
+    TRAINING_SPLIT,
+    TRAINING_ROWS,
+    ENABLE_TIME_ENCODING,
+    ENABLE_INSTR_DAY,
+    ENABLE_INSTR_NEXT_DAY,
+    ENABLE_EVENT_ENCODING
+)
+from data.forecasting.feature_store import EVENTS_PATH, INSTRUCTION_DAYS_PATH, feature_columns
+from data.forecasting.long_term_model import prepare_long_training_data
+from data.forecasting.short_term_model import prepare_short_training_data
+from data.storage import get_storage, run_sync
+
+MODEL_KINDS = ["long", "short"]
+DATASET_DIRECTORY = LOGS_DIRECTORY / "datasets"
+# Artifacts kept per kind, older ones are removed after a build
+KEEP_DATASETS = 3
+# Bump when the preprocessing itself changes, so old artifacts stop matching
+DATASET_FORMAT = 1
+
+
+def save_scaler_atomic(scaler: MinMaxScaler, kind: str, directory: Path = MODEL_DIRECTORY) -> Path:
+    """Persist scaler_<kind>.pkl next to the weights via a temporary file + rename"""
+    path = directory / f"scaler_{kind}.pkl"
+    tmp_path = directory / f".scaler_{kind}.{os.getpid()}.tmp.pkl"
+    try:
+        joblib.dump(scaler, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return path
+
+
+# ── ARTIFACTS ───────────────────────────────────────────────────────────────────
+def _file_digest(path: Path) -> str:
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()[:16]
+
+
+def dataset_key(kind: str, watermark: Optional[datetime], test_split: float = TRAINING_SPLIT) -> Dict[str, Any]:
+    """Everything the arrays of a dataset depend on"""
+    return {
+        "format": DATASET_FORMAT,
+        "kind": kind,
+        "watermark": watermark.isoformat() if watermark else None,
+        "rows": TRAINING_ROWS,
+        "test_split": test_split,
+        "flags": {
+            "ENABLE_TIME_ENCODING": ENABLE_TIME_ENCODING,
+            "ENABLE_INSTR_DAY": ENABLE_INSTR_DAY,
+            "ENABLE_INSTR_NEXT_DAY": ENABLE_INSTR_NEXT_DAY,
+            "ENABLE_EVENT_ENCODING": ENABLE_EVENT_ENCODING,
+        },
+        "feature_columns": feature_columns() if kind == "long" else [],
+        # The calendar features are looked up from these
+        "calendar_sources": [_file_digest(INSTRUCTION_DAYS_PATH), _file_digest(EVENTS_PATH)] if kind == "long" else [],
+        "seq_size": LONG_SEQ if kind == "long" else SHORT_SEQ,
+        "future_steps": LONG_FUTURE_STEPS if kind == "long" else SHORT_FUTURE_STEPS,
+    }
+
+
+def dataset_hash(key: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class DatasetArtifact:
+    """One built dataset directory: train.npy, test.npy, scaler.pkl and manifest.json"""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        with open(self.directory / "manifest.json") as f:
+            self.manifest: Dict[str, Any] = json.load(f)
+        self._scaler: Optional[MinMaxScaler] = None
+
+    @property
+    def kind(self) -> str:
+        return self.manifest["key"]["kind"]
+
+    @property
+    def paths(self) -> Dict[str, str]:
+        return {split: str(self.directory / f"{split}.npy") for split in ("train", "test")}
+
+    @property
+    def feature_dim(self) -> int:
+        return self.manifest["feature_dim"]
+
+    @property
+    def watermark(self) -> datetime:
+        return datetime.fromisoformat(self.manifest["watermark"])
+
+    @property
+    def scaler(self) -> MinMaxScaler:
+        if self._scaler is None:
+            self._scaler = joblib.load(self.directory / "scaler.pkl")
+        return self._scaler
+
+    def load(self) -> Tuple[np.ndarray, np.ndarray]:
+        return load_shared_split(self.paths)
+
+
+def _build_artifact(kind: str, key: Dict[str, Any], directory: Path, watermark: Optional[datetime]) -> None:
+    prepare = {"long": prepare_long_training_data, "short": prepare_short_training_data}
+    # Load exactly the datapoints up to the watermark the key was computed for
+    end = watermark + timedelta(microseconds=1) if watermark else None
+    train_scaled, test_scaled, scaler, data_watermark = prepare[kind](key["test_split"], end)
+    _write_artifact(directory, key, train_scaled, test_scaled, scaler, data_watermark)
+
+
+def _write_artifact(
+    directory: Path, key: Dict[str, Any], train_scaled: np.ndarray, test_scaled: np.ndarray,
+    scaler: MinMaxScaler, data_watermark: datetime
+) -> None:
+    # Written next to the final directory and renamed into place, so readers never see a partial artifact
+    tmp_directory = Path(tempfile.mkdtemp(prefix=f".{directory.name}.", dir=directory.parent))
+    try:
+        for split, values in (("train", train_scaled), ("test", test_scaled)):
+            np.save(tmp_directory / f"{split}.npy", np.ascontiguousarray(values, dtype=np.float32))
+        joblib.dump(scaler, tmp_directory / "scaler.pkl")
+        manifest = {
+            "key": key,
+            "hash": directory.name.split("-", 1)[1],
+            "watermark": data_watermark.isoformat(),
+            "train_rows": len(train_scaled),
+            "test_rows": len(test_scaled),
+            "feature_dim": int(train_scaled.shape[1]),
+            "dtype": "float32",
+            "created_at": datetime.now().isoformat(),
+        }
+        with open(tmp_directory / "manifest.json", "w") as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(tmp_directory, directory)
+    except OSError:
+        # Another process built the same artifact first
+        if not (directory / "manifest.json").exists():
+            raise
+    finally:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+
+
+def get_dataset_artifact(kind: str, test_split: float = TRAINING_SPLIT, rebuild: bool = False) -> DatasetArtifact:
+    """
+    Get the dataset for the current feature configuration and data, building it only
+    if no artifact with the same key exists.
+    """
+    watermark = run_sync(get_storage().get_latest_timestamp())
+    key = dataset_key(kind, watermark, test_split)
+    directory = DATASET_DIRECTORY / f"{kind}-{dataset_hash(key)}"
+    if rebuild and directory.exists():
+        shutil.rmtree(directory)
+    if (directory / "manifest.json").exists():
+        print(f"Reusing {kind} dataset {directory.name}")
+    else:
+        DATASET_DIRECTORY.mkdir(parents=True, exist_ok=True)
+        print(f"Building {kind} dataset {directory.name}")
+        _build_artifact(kind, key, directory, watermark)
+        prune_datasets(kind)
+    return DatasetArtifact(directory)
+
+
+def rescaled_artifact(artifact: DatasetArtifact, scaler: MinMaxScaler, scaler_digest: str) -> DatasetArtifact:
+    """
+    The same dataset scaled with another fitted scaler (e.g. the persisted scaler_<kind>.pkl the
+    other served models were trained on), built once and cached like any artifact. MinMax scaling
+    is affine per column, so the arrays are rescaled without featurizing again.
+    """
+    if getattr(scaler, "n_features_in_", artifact.feature_dim) != artifact.feature_dim:
+        raise ValueError(
+            f"The persisted {artifact.kind} scaler has {scaler.n_features_in_} features, the dataset "
+            f"{artifact.feature_dim}; retrain every {artifact.kind} model to replace it"
+        )
+    key = {**artifact.manifest["key"], "scaler": scaler_digest}
+    directory = DATASET_DIRECTORY / f"{artifact.kind}-{dataset_hash(key)}"
+    if not (directory / "manifest.json").exists():
+        print(f"Rescaling {artifact.kind} dataset {artifact.directory.name} to {directory.name}")
+        factor = scaler.scale_ / artifact.scaler.scale_
+        offset = scaler.min_ - artifact.scaler.min_ * factor
+        train_values, test_values = artifact.load()
+        _write_artifact(directory, key, train_values * factor + offset, test_values * factor + offset, scaler, artifact.watermark)
+        prune_datasets(artifact.kind)
+    return DatasetArtifact(directory)
+
+
+def list_datasets(kind: Optional[str] = None) -> List[DatasetArtifact]:
+    """Built artifacts, newest first"""
+    if not DATASET_DIRECTORY.exists():
+        return []
+    artifacts = [
+        DatasetArtifact(path.parent) for path in DATASET_DIRECTORY.glob("*/manifest.json")
+        if not path.parent.name.startswith(".")
+    ]
+    if kind is not None:
+        artifacts = [artifact for artifact in artifacts if artifact.kind == kind]
+    return sorted(artifacts, key=lambda artifact: artifact.manifest["created_at"], reverse=True)
+
+
+def prune_datasets(kind: str, keep: int = KEEP_DATASETS) -> None:
+    for artifact in list_datasets(kind)[keep:]:
+        shutil.rmtree(artifact.directory, ignore_errors=True)
+
+
+def load_shared_split(paths: Dict[str, str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Map the (train, test) arrays of a dataset artifact without copying them"""
+    return np.load(paths["train"], mmap_mode="r"), np.load(paths["test"], mmap_mode="r")
+
+
+class SharedTrainingData:
+    """
+    The dataset artifacts of several model kinds, for handing to training processes.
+    Workers map the artifact .npy files read-only, so the page cache holds one copy
+    shared by every process instead of each reloading and re-featurizing.
+    """
+
+    def __init__(
+        self,
+        kinds: Iterable[str] = MODEL_KINDS,
+        test_split: float = TRAINING_SPLIT,
+        keep_scalers: Iterable[str] = ()
+    ):
+        """
+        Args:
+            keep_scalers: Kinds to scale with the persisted scaler_<kind>.pkl instead of a freshly
+                fitted one, for retraining only some of the models that share it
+        """
+        self.kinds = list(kinds)
+        self.test_split = test_split
+        self.keep_scalers = set(keep_scalers)
+        self.artifacts: Dict[str, DatasetArtifact] = {}
+
+    def build(self) -> "SharedTrainingData":
+        for kind in self.kinds:
+            artifact = get_dataset_artifact(kind, self.test_split)
+            scaler_path = MODEL_DIRECTORY / f"scaler_{kind}.pkl"
+            if kind in self.keep_scalers and scaler_path.exists():
+                artifact = rescaled_artifact(artifact, joblib.load(scaler_path), _file_digest(scaler_path))
+            self.artifacts[kind] = artifact
+            print(f"{kind} training data: {artifact.manifest['train_rows']} train / {artifact.manifest['test_rows']} test rows, "
+                  f"{artifact.feature_dim} features, up to {artifact.watermark}")
+        return self
+
+    @property
+    def paths(self) -> Dict[str, Dict[str, str]]:
+        return {kind: artifact.paths for kind, artifact in self.artifacts.items()}
+
+    @property
+    def scalers(self) -> Dict[str, MinMaxScaler]:
+        return {kind: artifact.scaler for kind, artifact in self.artifacts.items()}
+
+    @property
+    def feature_dims(self) -> Dict[str, int]:
+        return {kind: artifact.feature_dim for kind, artifact in self.artifacts.items()}
+
+    @property
+    def watermarks(self) -> Dict[str, datetime]:
+        return {kind: artifact.watermark for kind, artifact in self.artifacts.items()}
+
+    def __enter__(self) -> "SharedTrainingData":
+        return self.build()
+
+    def __exit__(self, *exc) -> None:
+        # Artifacts are cached for the next run
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or list the cached training datasets")
+    parser.add_argument("--kinds", nargs="+", choices=MODEL_KINDS, default=MODEL_KINDS)
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild even if a matching artifact exists")
+    parser.add_argument("--list", action="store_true", help="List the built artifacts")
+    args = parser.parse_args()
+
+    if args.list:
+        for artifact in list_datasets():
+            manifest = artifact.manifest
+            print(f"{artifact.directory.name:<24}{manifest['train_rows']:>8}{manifest['test_rows']:>8}"
+                  f"{manifest['feature_dim']:>5}  up to {manifest['watermark']}  built {manifest['created_at']}")
+        return
+    for kind in args.kinds:
+        get_dataset_artifact(kind, rebuild=args.rebuild)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from data.forecasting.constants import MODEL_DIRECTORY
+
+# Per-model training watermark (newest datapoint trained on), validation loss and artifact version
+TRAINING_STATE_PATH = MODEL_DIRECTORY / "training_state.json"
+# Every accepted set of weights is also kept here as <name>.v<version>.weights.h5
+VERSIONS_DIRECTORY = MODEL_DIRECTORY / "versions"
+
+_lock = threading.Lock()
+
+
+def load_training_state() -> Dict[str, Dict[str, Any]]:
+    if not TRAINING_STATE_PATH.exists():
+        return {}
+    with open(TRAINING_STATE_PATH) as f:
+        return json.load(f)
+
+
+def model_state(name: str) -> Dict[str, Any]:
+    return load_training_state().get(name, {})
+
+
+def get_watermark(name: str) -> Optional[datetime]:
+    """
+    Newest datapoint the model was trained on. Models trained before watermarks were
+    recorded fall back to the modification time of their weights file.
+    """
+    watermark = model_state(name).get("watermark")
+    if watermark is not None:
+        return datetime.fromisoformat(watermark)
+    weights_path = MODEL_DIRECTORY / f"{name}.weights.h5"
+    if weights_path.exists():
+        return datetime.fromtimestamp(weights_path.stat().st_mtime)
+    return None
+
+
+def versioned_name(name: str, version: int) -> str:
+    return f"{name}.v{version:04d}"
+
+
+def versioned_weights_path(name: str, version: int) -> Path:
+    return VERSIONS_DIRECTORY / f"{versioned_name(name, version)}.weights.h5"
+
+
+def record_training(name: str, watermark: datetime, val_loss: Optional[float] = None, version: Optional[int] = None, mode: str = "full") -> Dict[str, Any]:
+    """Update one model's entry, keeping every other entry (atomic write)"""
+    with _lock:
+        state = load_training_state()
+        entry = dict(state.get(name, {}))
+        entry.update({
+            "watermark": watermark.isoformat(),
+            "val_loss": val_loss,
+            "mode": mode,
+            "trained_at": datetime.now().isoformat()
+        })
+        if version is not None:
+            entry["version"] = version
+        state[name] = entry
+        tmp_path = TRAINING_STATE_PATH.with_name(f".{TRAINING_STATE_PATH.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=4)
+        os.replace(tmp_path, TRAINING_STATE_PATH)
+        return entry
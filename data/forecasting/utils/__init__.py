@@ -1,3 +1,3 @@
-from .plotter import plot_prediction
+from .plotter import LEAD_STEPS, hourly_forecasts, plot_prediction
 
-__all__ = ["plot_prediction"]
\ No newline at end of file
+__all__ = ["LEAD_STEPS", "hourly_forecasts", "plot_prediction"]
@@ -0,0 +1,28 @@
+"""
+Debug plot of a forecast against the real datapoints before it.
+
+Only imported when plot_prediction(..., show=True) is called, so serving never loads matplotlib.
+"""
+import numpy as np
+import matplotlib.pyplot as plt
+
+
+def show_prediction(actual_times, actuals: np.ndarray, prediction_times: np.ndarray, prediction: np.ndarray) -> None:
+    """
+    Args:
+        actual_times: Timestamps of the real datapoints
+        actuals (np.ndarray): (rows, garages) real values
+        prediction_times (np.ndarray): (steps,) forecast timestamps
+        prediction (np.ndarray): (steps, garages) blended forecast
+    """
+    plt.figure(figsize=(12, 6))
+    for i in range(prediction.shape[1]):
+        plt.plot(actual_times, actuals[:, i], label=f'Actual Feature {i+1}')
+        plt.plot(prediction_times, prediction[:, i], '--', label=f'Predicted Feature {i+1}')
+
+    plt.xlabel("Time")
+    plt.ylabel("Value")
+    plt.title("Actual vs. Smoothed Forecast with Adjusted Scaler Usage")
+    plt.legend()
+    plt.grid(True)
+    plt.show()
@@ -0,0 +1,128 @@
+"""
+Pure array functions that turn raw model forecasts into the hourly values the API serves.
+
+Everything works on a batch of forecast origins at once: timestamps are (origins, steps)
+datetime64 arrays and forecasts are (origins, steps, garages).
+"""
+from typing import Optional
+
+import numpy as np
+
+DAY_STEP = np.timedelta64(10, "m")
+NIGHT_STEP = np.timedelta64(1, "h")
+# The logger samples hourly from NIGHT_START:00 until NIGHT_END:00
+NIGHT_START = 21
+NIGHT_END = 6
+
+
+def _step_after(times: np.ndarray) -> np.ndarray:
+    hours = (times - times.astype("datetime64[D]")).astype("timedelta64[h]").astype(np.int64)
+    return np.where((hours >= NIGHT_START) | (hours < NIGHT_END), NIGHT_STEP, DAY_STEP)
+
+
+def forecast_timestamps(last_times: np.ndarray, steps: int) -> np.ndarray:
+    """
+    Timestamps of the forecast steps after each origin's last real datapoint, spaced like the
+    logger samples: 10 minutes during the day, one hour at night.
+
+    Args:
+        last_times (np.ndarray): (origins,) datetime64 of the last real datapoint
+        steps (int): Forecast steps
+
+    Returns:
+        np.ndarray: (origins, steps) datetime64[ns]
+    """
+    times = np.empty((len(last_times), steps), dtype="datetime64[ns]")
+    current = np.asarray(last_times, dtype="datetime64[ns]")
+    # Each step's spacing depends on the previous timestamp, so this walks the steps (vectorized over origins)
+    for step in range(steps):
+        current = current + _step_after(current)
+        times[:, step] = current
+    return times
+
+
+def blend_with_actuals(predictions: np.ndarray, actuals: np.ndarray) -> np.ndarray:
+    """
+    Cosine cross-fade from the last real values into the forecast over the first len(actuals) steps.
+
+    Args:
+        predictions (np.ndarray): (origins, steps, garages)
+        actuals (np.ndarray): (origins, lead steps, garages) newest real values
+
+    Returns:
+        np.ndarray: Blended copy of predictions
+    """
+    lead = actuals.shape[1]
+    t = np.arange(lead)
+    w_real = 0.5 * (1 + np.cos(np.pi * t / (lead - 1)))  # weight for real data (from 1→0)
+    blended = np.array(predictions, dtype=np.float64)
+    blended[:, :lead] = w_real[None, :, None] * actuals + (1.0 - w_real)[None, :, None] * blended[:, :lead]
+    return blended
+
+
+def nearest_indices(times: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    """
+    Index of the timestamp closest to each query (the earlier one on ties), per origin.
+
+    Args:
+        times (np.ndarray): (origins, steps) sorted datetime64
+        queries (np.ndarray): (hours,) or (origins, hours) datetime64
+
+    Returns:
+        np.ndarray: (origins, hours) indices into the steps axis
+    """
+    times = np.asarray(times, dtype="datetime64[ns]").astype(np.int64)
+    queries = np.broadcast_to(np.asarray(queries, dtype="datetime64[ns]").astype(np.int64), (len(times), np.shape(queries)[-1]))
+    origins, steps = times.shape
+    # Shift every origin into its own disjoint range, so one searchsorted covers all of them
+    base = min(times.min(), queries.min())
+    span = max(times.max(), queries.max()) - base + 1
+    offsets = (np.arange(origins, dtype=np.int64) * span)[:, None]
+    flat_times = (times - base + offsets).ravel()
+    flat_queries = queries - base + offsets
+    right = np.searchsorted(flat_times, flat_queries) - np.arange(origins)[:, None] * steps
+    right = np.clip(right, 0, steps - 1)
+    left = np.clip(right - 1, 0, steps - 1)
+    rows = np.arange(origins)[:, None]
+    take_left = np.abs(queries - times[rows, left]) <= np.abs(times[rows, right] - queries)
+    return np.where(take_left, left, right)
+
+
+def hourly_values(
+    times: np.ndarray, predictions: np.ndarray, start: np.datetime64, end: np.datetime64, interpolate: bool = False
+) -> np.ndarray:
+    """
+    Forecast value at every full hour from start to end (inclusive).
+
+    Args:
+        times (np.ndarray): (origins, steps) forecast timestamps
+        predictions (np.ndarray): (origins, steps, garages) occupancy fractions
+        interpolate (bool): Interpolate linearly between steps instead of taking the nearest one
+
+    Returns:
+        np.ndarray: (origins, hours, garages)
+    """
+    hours = hourly_range(start, end)
+    if not interpolate:
+        indices = nearest_indices(times, hours)
+        return np.take_along_axis(predictions, indices[:, :, None], axis=1)
+    times_ns = np.asarray(times, dtype="datetime64[ns]").astype(np.float64)
+    hours_ns = hours.astype("datetime64[ns]").astype(np.float64)
+    return np.stack([
+        np.stack([np.interp(hours_ns, times_ns[i], predictions[i, :, g]) for g in range(predictions.shape[2])], axis=-1)
+        for i in range(len(times))
+    ])
+
+
+def hourly_range(start: np.datetime64, end: np.datetime64) -> np.ndarray:
+    """Hourly timestamps from start to end, both included (like pd.date_range(start, end, freq="h"))"""
+    start = np.datetime64(start, "ns")
+    end = np.datetime64(end, "ns")
+    count = int((end - start) // np.timedelta64(1, "h")) + 1
+    return start + np.arange(max(count, 0)) * np.timedelta64(1, "h")
+
+
+def to_percentages(values: np.ndarray, garages: Optional[int] = None) -> np.ndarray:
+    """Occupancy fractions as whole percent, truncated like int(value * 100)"""
+    values = values if garages is None else values[..., :garages]
+    return np.trunc(values * 100).astype(int)
@@ -0,0 +1,89 @@
+"""
+Local stand-in for the garage status page, for running the ingest service without the live site.
+
+Serves a page with the same garage__fullness markup, with values that drift between requests.
+Every --fail-every'th request returns a page that doesn't parse, --error-every'th a 503.
+
+    python -m data.standalone_logger.fixture_server --port 8765
+    python -m data.standalone_logger.ingest --url http://127.0.0.1:8765/ --interval 5 --storage memory
+"""
+import argparse
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+GARAGES = ["South Garage", "West Garage", "North Garage", "South Campus Garage"]
+
+
+def render_page(values: List[Optional[int]]) -> str:
+    """Status page markup; None renders as a value that doesn't parse"""
+    garages = []
+    for name, value in zip(GARAGES, values):
+        text = "Full" if value == 100 else ("&nbsp;" if value is None else f"{value} %")
+        garages.append(
+            f'<div class="garage"><h2 class="garage__name">{name}</h2>'
+            f'<p class="garage__text"><span class="garage__fullness">{text}</span></p></div>'
+        )
+    return f"<html><body><main>{''.join(garages)}</main></body></html>"
+
+
+class FixtureState:
+    def __init__(self, seed: int = 0, fail_every: int = 0, error_every: int = 0):
+        self.random = random.Random(seed)
+        self.values = [self.random.randint(0, 100) for _ in GARAGES]
+        self.fail_every = fail_every
+        self.error_every = error_every
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def next_response(self):
+        """(status code, body) of the next request"""
+        with self._lock:
+            self.requests += 1
+            if self.error_every and self.requests % self.error_every == 0:
+                return 503, "Service Unavailable"
+            if self.fail_every and self.requests % self.fail_every == 0:
+                return 200, render_page([None] * len(GARAGES))
+            self.values = [min(100, max(0, value + self.random.randint(-5, 5))) for value in self.values]
+            return 200, render_page(self.values)
+
+
+def create_server(host: str = "127.0.0.1", port: int = 8765, state: Optional[FixtureState] = None) -> ThreadingHTTPServer:
+    """Server for the fixture page (port 0 picks a free port, see server.server_address)"""
+    state = state or FixtureState()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status, body = state.next_response()
+            data = body.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            return None
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.state = state
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local copy of the garage status page")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fail-every", type=int, default=0, help="Serve an unparseable page every N requests")
+    parser.add_argument("--error-every", type=int, default=0, help="Answer with a 503 every N requests")
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, FixtureState(args.seed, args.fail_every, args.error_every))
+    print(f"Serving the fixture status page on http://{args.host}:{server.server_address[1]}/")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
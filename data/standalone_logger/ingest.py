@@ -0,0 +1,327 @@
+"""
+Asynchronous ingest service for the garage status page.
+
+Every sample is appended to a local spool file (one JSON line, fsynced) before anything
+touches the database, so a storage or network outage only delays datapoints instead of
+losing them. A separate task flushes the spool to storage in batches (insert_many on
+Mongo) and retries with exponential backoff; insert_datapoints skips datapoints that are
+already stored, so re-sending a batch after a failure is harmless. The spool remembers
+how far it was flushed in <spool>.offset and is truncated once it is fully flushed.
+
+With INGEST_NOTIFY_URL set (e.g. http://127.0.0.1:8000/api/ingest/notify) the API is told
+after every flush, so it refreshes rollups and forecasts right away instead of on the next
+request that notices the new data.
+
+    python -m data.standalone_logger.ingest                                   # STORAGE_BACKEND, live page
+    python -m data.standalone_logger.ingest --url http://127.0.0.1:8765/ --interval 5 --storage memory
+    python -m data.standalone_logger.fixture_server                           # local page for the line above
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+import requests
+import urllib3
+from dotenv import load_dotenv
+
+from data.storage import METADATA, STATUS_FIELDS, Storage, create_storage
+
+# Disable SSL warnings
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+load_dotenv()
+
+URL = "https://sjsuparkingstatus.sjsu.edu/"
+DEFAULT_SPOOL_PATH = Path(__file__).resolve().parent.parent / "records" / "ingest_spool.jsonl"
+SPOOL_PATH = Path(os.getenv("INGEST_SPOOL", DEFAULT_SPOOL_PATH))
+# The API's ingest hook, and the token it requires (INGEST_TOKEN on both sides)
+NOTIFY_URL = os.getenv("INGEST_NOTIFY_URL")
+INGEST_TOKEN = os.getenv("INGEST_TOKEN")
+
+POLL_INTERVAL = 600        # seconds between samples
+PARSE_RETRY_INTERVAL = 60  # seconds before retrying a page that didn't parse
+REQUEST_TIMEOUT = 30
+NOTIFY_TIMEOUT = 5
+FLUSH_BATCH_SIZE = 500
+BACKOFF_INITIAL = 1.0
+BACKOFF_MAX = 300.0
+# Fully flushed spools are truncated once they grow past this
+SPOOL_COMPACT_BYTES = 1_000_000
+
+FULLNESS_PATTERN = re.compile(r'garage__fullness">([^<]*)<')
+
+
+# ── PARSING ─────────────────────────────────────────────────────────────────────
+def parse_page(html: str) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Read the four garage fullness values (south, west, north, south campus) off the status page.
+
+    Returns:
+        Tuple of percentages ("Full" is 100), or None if the page doesn't have four numbers
+    """
+    values = []
+    for text in FULLNESS_PATTERN.findall(html)[:len(STATUS_FIELDS)]:
+        text = text.replace(" ", "").replace("%", "").strip()
+        values.append(100 if text == "Full" else text)
+    try:
+        parsed = tuple(int(value) for value in values)
+    except ValueError:
+        parsed = ()
+    if len(parsed) != len(STATUS_FIELDS):
+        print(f"Failed HTML Parsing, outputs given as {values}")
+        return None
+    return parsed
+
+
+def make_datapoint(values: Tuple[int, ...], timestamp: Optional[datetime] = None) -> Dict[str, Any]:
+    doc = {"timestamp": timestamp or datetime.now(), "metadata": METADATA}
+    doc.update(zip(STATUS_FIELDS, values))
+    return doc
+
+
+# ── SPOOL ───────────────────────────────────────────────────────────────────────
+class Spool:
+    """
+    Append-only JSON-lines file of samples, with the byte offset up to which they were
+    flushed to storage kept next to it. Everything after the offset is still pending.
+    """
+
+    def __init__(self, path: Path = SPOOL_PATH):
+        self.path = Path(path)
+        self.offset_path = self.path.with_name(self.path.name + ".offset")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.touch(exist_ok=True)
+        # Appends (poll task) and commits (flush task) run in worker threads
+        self._lock = threading.Lock()
+        self._drop_partial_line()
+        self.offset = min(self._read_offset(), self.path.stat().st_size)
+
+    def _read_offset(self) -> int:
+        try:
+            return int(self.offset_path.read_text().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _drop_partial_line(self) -> None:
+        # A crash mid-append leaves a line without its newline, which the next append would corrupt
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def append(self, doc: Dict[str, Any]) -> None:
+        line = json.dumps({**doc, "timestamp": doc["timestamp"].isoformat()}) + "\n"
+        with self._lock, open(self.path, "a") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def pending(self, limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Samples after the flushed offset, oldest first.
+
+        Returns:
+            (datapoints, offset after the last returned one)
+        """
+        docs = []
+        with self._lock, open(self.path, "rb") as f:
+            f.seek(self.offset)
+            end = self.offset
+            for line in f:
+                if limit is not None and len(docs) >= limit:
+                    break
+                end += len(line)
+                doc = json.loads(line)
+                doc["timestamp"] = datetime.fromisoformat(doc["timestamp"])
+                docs.append(doc)
+        return docs, end
+
+    def commit(self, offset: int) -> None:
+        """Mark everything before `offset` as flushed"""
+        with self._lock:
+            self._write_offset(offset)
+            if offset == self.path.stat().st_size and offset > SPOOL_COMPACT_BYTES:
+                # Everything is in storage. Truncate first: a crash before the offset is reset
+                # leaves an offset past the end, which is clamped on startup
+                with open(self.path, "r+") as f:
+                    f.truncate(0)
+                self._write_offset(0)
+
+    def _write_offset(self, offset: int) -> None:
+        tmp_path = self.offset_path.with_name(self.offset_path.name + ".tmp")
+        tmp_path.write_text(str(offset))
+        os.replace(tmp_path, self.offset_path)
+        self.offset = offset
+
+    @property
+    def pending_bytes(self) -> int:
+        return self.path.stat().st_size - self.offset
+
+
+# ── SERVICE ─────────────────────────────────────────────────────────────────────
+class IngestService:
+    """Polls the status page into the spool and flushes the spool to storage, as two independent tasks"""
+
+    def __init__(
+        self,
+        storage: Storage,
+        spool: Spool,
+        url: str = URL,
+        interval: float = POLL_INTERVAL,
+        retry_interval: float = PARSE_RETRY_INTERVAL,
+        batch_size: int = FLUSH_BATCH_SIZE,
+        notify_url: Optional[str] = NOTIFY_URL
+    ):
+        self.storage = storage
+        self.spool = spool
+        self.url = url
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self.batch_size = batch_size
+        self.notify_url = notify_url
+        self._wakeup = asyncio.Event()
+
+    async def fetch(self) -> str:
+        # requests is blocking, keep it off the event loop
+        response = await asyncio.to_thread(requests.get, self.url, verify=False, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return response.text
+
+    async def sample(self) -> Optional[Dict[str, Any]]:
+        """Take one sample into the spool, None if the page didn't parse"""
+        values = parse_page(await self.fetch())
+        if values is None:
+            return None
+        doc = make_datapoint(values)
+        await asyncio.to_thread(self.spool.append, doc)
+        print(f"{doc['timestamp']} South: {values[0]} | West: {values[1]} | North: {values[2]} | South campus: {values[3]}")
+        self._wakeup.set()
+        return doc
+
+    async def poll_loop(self, samples: Optional[int] = None) -> None:
+        taken = 0
+        while samples is None or taken < samples:
+            try:
+                doc = await self.sample()
+            except requests.RequestException as e:
+                print(f"Fetching {self.url} failed: {e}")
+                await asyncio.sleep(self.interval)
+                continue
+            except Exception as e:
+                # A failed spool append or an unexpected page must not stop the logger for good
+                print(f"Sampling {self.url} failed: {e!r}")
+                await asyncio.sleep(self.interval)
+                continue
+            if doc is not None:
+                taken += 1
+            if samples is not None and taken >= samples:
+                break
+            # A page that didn't parse is usually a transient error, retry sooner
+            await asyncio.sleep(self.interval if doc is not None else self.retry_interval)
+
+    async def flush(self) -> int:
+        """
+        Write everything pending in the spool to storage, one batch at a time, then notify the API.
+
+        Returns:
+            int: Datapoints newly inserted (batches already stored count zero)
+        """
+        inserted = 0
+        latest = None
+        while True:
+            docs, offset = await asyncio.to_thread(self.spool.pending, self.batch_size)
+            if not docs:
+                break
+            inserted += await self.storage.insert_datapoints(docs)
+            await asyncio.to_thread(self.spool.commit, offset)
+            latest = max(doc["timestamp"] for doc in docs)
+        if inserted:
+            await self.notify(latest, inserted)
+        return inserted
+
+    async def notify(self, latest: datetime, count: int) -> bool:
+        """
+        Tell the API that new datapoints are stored. Best effort: without it the API
+        still picks them up on the next request that checks for new data.
+        """
+        if not self.notify_url:
+            return False
+        headers = {"X-Ingest-Token": INGEST_TOKEN} if INGEST_TOKEN else {}
+        try:
+            response = await asyncio.to_thread(
+                requests.post, self.notify_url, json={"latest": latest.isoformat(), "count": count},
+                headers=headers, timeout=NOTIFY_TIMEOUT
+            )
+            response.raise_for_status()
+            return True
+        except requests.RequestException as e:
+            print(f"Notifying {self.notify_url} failed: {e}")
+            return False
+
+    async def flush_loop(self) -> None:
+        delay = BACKOFF_INITIAL
+        while True:
+            try:
+                inserted = await self.flush()
+                if inserted:
+                    print(f"Flushed {inserted} datapoints to {self.storage.name}")
+                delay = BACKOFF_INITIAL
+                self._wakeup.clear()
+                # Recheck after clearing, a sample may have arrived while flushing
+                if not self.spool.pending_bytes:
+                    await self._wakeup.wait()
+            except Exception as e:
+                # Samples stay in the spool, try again later
+                wait = delay * random.uniform(0.5, 1.0)
+                print(f"Flushing to {self.storage.name} failed ({e}), {self.spool.pending_bytes} bytes pending, retrying in {wait:.0f}s")
+                await asyncio.sleep(wait)
+                delay = min(delay * 2, BACKOFF_MAX)
+
+    async def run(self, samples: Optional[int] = None) -> None:
+        """Poll forever (or until `samples` samples were taken and flushed)"""
+        await self.storage.init()
+        flusher = asyncio.create_task(self.flush_loop())
+        try:
+            await self.poll_loop(samples)
+            # Don't exit with samples still pending
+            while self.spool.pending_bytes:
+                if flusher.done():
+                    flusher.result()
+                await asyncio.sleep(0.1)
+        finally:
+            flusher.cancel()
+            await self.storage.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Log the garage status page to storage through a local spool")
+    parser.add_argument("--url", default=URL)
+    parser.add_argument("--spool", type=Path, default=SPOOL_PATH, help="Spool file (INGEST_SPOOL)")
+    parser.add_argument("--storage", choices=["mongo", "sqlite", "memory"], help="Storage backend (default: STORAGE_BACKEND)")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="Seconds between samples")
+    parser.add_argument("--retry-interval", type=float, default=PARSE_RETRY_INTERVAL, help="Seconds before retrying a page that didn't parse")
+    parser.add_argument("--samples", type=int, help="Stop after this many samples (default: run forever)")
+    parser.add_argument("--notify-url", default=NOTIFY_URL, help="API ingest hook to call after each flush (INGEST_NOTIFY_URL)")
+    args = parser.parse_args()
+
+    service = IngestService(
+        create_storage(args.storage), Spool(args.spool), args.url, args.interval, args.retry_interval,
+        notify_url=args.notify_url
+    )
+    asyncio.run(service.run(args.samples))
+
+
+if __name__ == "__main__":
+    main()
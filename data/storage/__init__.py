@@ -0,0 +1,96 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Optional
+
+from dotenv import load_dotenv
+
+from data.storage.base import COMPACTED_FIELDS, METADATA, STATUS_FIELDS, Storage
+from data.storage.memory import MemoryStorage
+from data.storage.sqlite import SQLiteStorage
+
+load_dotenv()
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "records", "sjparking.db")
+
+_storage: Optional[Storage] = None
+_storage_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def create_storage(kind: Optional[str] = None, **kwargs) -> Storage:
+    """
+    Create a new storage backend.
+
+    Args:
+        kind (str): "mongo", "sqlite" or "memory", defaults to the STORAGE_BACKEND env variable (or "mongo")
+        **kwargs: Backend options, `uri`/`database_name` for mongo and `path` for sqlite
+
+    Returns:
+        Storage: The (not yet initialized) storage backend
+    """
+    kind = (kind or os.getenv("STORAGE_BACKEND", "mongo")).lower()
+    if kind == "mongo":
+        # Imported here so that the other backends don't need motor installed
+        from data.storage.mongo import MongoStorage
+        return MongoStorage(
+            kwargs.get("uri", os.getenv("MONGO_URI")),
+            kwargs.get("database_name", "sjparking")
+        )
+    if kind == "sqlite":
+        return SQLiteStorage(kwargs.get("path", os.getenv("SQLITE_PATH", DEFAULT_SQLITE_PATH)))
+    if kind == "memory":
+        return MemoryStorage()
+    raise ValueError(f"Invalid storage backend: {kind}")
+
+
+def get_storage() -> Storage:
+    """Get the process-wide storage backend, creating it on first use"""
+    global _storage
+    if _storage is None:
+        _storage = create_storage()
+    return _storage
+
+
+def set_storage(storage: Storage) -> None:
+    """Replace the process-wide storage backend"""
+    global _storage
+    _storage = storage
+
+
+def bind_storage_loop(loop: asyncio.AbstractEventLoop) -> None:
+    """
+    Record the event loop that owns the process-wide storage backend.
+    Async clients like motor attach to the loop they're first used on.
+    """
+    global _storage_loop
+    _storage_loop = loop
+
+
+def run_sync(coro: Awaitable[Any]) -> Any:
+    """
+    Run a storage coroutine from synchronous code (training scripts, worker threads).
+    If the API's event loop owns the storage, the coroutine is scheduled on that loop.
+    """
+    if _storage_loop is not None and _storage_loop.is_running():
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is _storage_loop:
+            raise RuntimeError("run_sync can't be called from the storage event loop, await the coroutine instead")
+        return asyncio.run_coroutine_threadsafe(coro, _storage_loop).result()
+    return asyncio.run(coro)
+
+
+__all__ = [
+    "METADATA",
+    "STATUS_FIELDS",
+    "COMPACTED_FIELDS",
+    "Storage",
+    "MemoryStorage",
+    "SQLiteStorage",
+    "create_storage",
+    "get_storage",
+    "set_storage",
+    "bind_storage_loop",
+    "run_sync",
+]
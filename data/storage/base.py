@@ -0,0 +1,192 @@
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+METADATA = "sjparking"
+
+# Status fields in the same order as GARAGE_NAMES
+STATUS_FIELDS = ["south_status", "west_status", "north_status", "south_campus_status"]
+# Per-hour statistics kept for every status field once raw datapoints are compacted
+COMPACTED_STATS = ["min", "mean", "max"]
+COMPACTED_FIELDS = [f"{field}_{stat}" for field in STATUS_FIELDS for stat in COMPACTED_STATS]
+
+
+class Storage(ABC):
+    """
+    Storage interface shared by the API, the forecasting code and the logger.
+
+    Datapoints are plain dictionaries shaped like the MongoDB documents:
+    {"timestamp", "metadata", "south_status", "west_status", "north_status", "south_campus_status"}.
+    Rollups are {"day", "garage_id", "values", "complete"} documents, one per day and garage.
+    Compacted datapoints are {"hour", "metadata", "count", *COMPACTED_FIELDS} documents, one per
+    hour of raw datapoints that the retention job archived and deleted.
+    """
+
+    name: str = "base"
+
+    # ── LIFECYCLE ───────────────────────────────────────────────────────────────
+    @abstractmethod
+    async def init(self) -> None:
+        """Create collections/tables and indexes if they don't exist"""
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Release the underlying connection"""
+
+    # ── DATAPOINTS ──────────────────────────────────────────────────────────────
+    async def insert_datapoint(self, doc: Dict[str, Any]) -> None:
+        await self.insert_datapoints([doc])
+
+    @abstractmethod
+    async def insert_datapoints(self, docs: List[Dict[str, Any]]) -> int:
+        """
+        Insert datapoints, skipping any whose (metadata, timestamp) is already stored.
+
+        Returns:
+            int: Number of datapoints actually inserted
+        """
+
+    @abstractmethod
+    async def get_datapoint(self, timestamp: datetime) -> Optional[Dict[str, Any]]:
+        """Get the datapoint stored at exactly this timestamp"""
+
+    @abstractmethod
+    async def get_latest_timestamp(self) -> Optional[datetime]:
+        """Get the timestamp of the most recent datapoint"""
+
+    @abstractmethod
+    async def get_oldest_timestamp(self) -> Optional[datetime]:
+        """Get the timestamp of the oldest datapoint"""
+
+    @abstractmethod
+    async def get_datapoints(
+        self, start: datetime, end: datetime, metadata: str = METADATA
+    ) -> List[Dict[str, Any]]:
+        """
+        Get all datapoints with start <= timestamp < end, oldest first.
+        """
+
+    @abstractmethod
+    async def get_recent_datapoints(
+        self, before: datetime, limit: int, metadata: str = METADATA
+    ) -> List[Dict[str, Any]]:
+        """
+        Get the `limit` most recent datapoints strictly before `before`, oldest first.
+        """
+
+    @abstractmethod
+    async def delete_datapoints(self, start: datetime, end: datetime, metadata: str = METADATA) -> int:
+        """
+        Delete all datapoints with start <= timestamp < end.
+
+        Returns:
+            int: Number of datapoints deleted
+        """
+
+    @abstractmethod
+    async def get_datapoint_days(self) -> List[str]:
+        """Get every distinct YYYY-MM-DD that has at least one datapoint"""
+
+    async def get_hourly_means(
+        self, start: datetime, end: datetime, status_field: str
+    ) -> Dict[int, float]:
+        """
+        Average a status field per hour of day for datapoints in [start, end).
+
+        Returns:
+            Dict mapping hour (0-23) to the mean value, only for hours with data
+        """
+        sums: Dict[int, float] = defaultdict(float)
+        counts: Dict[int, int] = defaultdict(int)
+        for doc in await self.get_datapoints(start, end):
+            hour = doc["timestamp"].hour
+            sums[hour] += doc[status_field]
+            counts[hour] += 1
+        return {hour: sums[hour] / counts[hour] for hour in sorted(sums)}
+
+    async def get_garage_series(
+        self, start: datetime, end: datetime, status_field: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Get {"time": "HH:MM", "value"} pairs for a status field in [start, end), sorted by time.
+        """
+        series = [
+            {"time": doc["timestamp"].strftime("%H:%M"), "value": doc[status_field]}
+            for doc in await self.get_datapoints(start, end)
+        ]
+        series.sort(key=lambda point: point["time"])
+        return series
+
+    # ── COMPACTED DATAPOINTS ────────────────────────────────────────────────────
+    @abstractmethod
+    async def replace_compacted(self, docs: List[Dict[str, Any]]) -> None:
+        """Insert or overwrite compacted documents by (metadata, hour)"""
+
+    @abstractmethod
+    async def get_compacted(
+        self, start: datetime, end: datetime, metadata: str = METADATA
+    ) -> List[Dict[str, Any]]:
+        """Get the compacted documents with start <= hour < end, oldest first"""
+
+    # ── HOURLY ROLLUPS ──────────────────────────────────────────────────────────
+    @abstractmethod
+    async def get_rollup(self, day: str, garage_id: int) -> Optional[Dict[str, Any]]:
+        """Get the rollup document for a day and garage"""
+
+    @abstractmethod
+    async def replace_rollup(self, doc: Dict[str, Any]) -> None:
+        """Insert or overwrite the rollup for doc["day"] and doc["garage_id"]"""
+
+    @abstractmethod
+    async def delete_rollups(self, day: str) -> None:
+        """Delete the rollups of every garage for a day"""
+
+    @abstractmethod
+    async def get_complete_rollups(self) -> List[Dict[str, Any]]:
+        """Get every rollup document marked as complete"""
+
+    @abstractmethod
+    async def get_latest_complete_day(self) -> Optional[str]:
+        """Get the most recent day that has a complete rollup"""
+
+    @abstractmethod
+    async def get_rollup_days(self) -> List[str]:
+        """Get every distinct day that has a rollup"""
+
+    # ── LEASES ──────────────────────────────────────────────────────────────────
+    @abstractmethod
+    async def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """
+        Take or renew the lease `name` for `ttl` seconds. Succeeds if nobody holds it,
+        `owner` already holds it, or the holder's lease expired.
+
+        Returns:
+            bool: True if `owner` holds the lease now
+        """
+
+    @abstractmethod
+    async def release_lease(self, name: str, owner: str) -> None:
+        """Give up the lease if `owner` holds it, so another owner can take it right away"""
+
+    # ── AVERAGES ────────────────────────────────────────────────────────────────
+    @abstractmethod
+    async def save_averages(self, garage: str, averages: List[List[int]]) -> None:
+        """Persist the 7x24 average fullness table of a garage"""
+
+    @abstractmethod
+    async def get_averages(self, garage: str) -> Optional[List[List[int]]]:
+        """Get the 7x24 average fullness table of a garage"""
+
+    # ── FORECASTS ───────────────────────────────────────────────────────────────
+    @abstractmethod
+    async def save_forecast(
+        self, origin: datetime, garage: str, values: List[Any], kind: str = "hourly"
+    ) -> None:
+        """Persist a forecast made at `origin` for a garage, replacing any previous one"""
+
+    @abstractmethod
+    async def get_forecast(
+        self, origin: datetime, garage: str, kind: str = "hourly"
+    ) -> Optional[List[Any]]:
+        """Get the forecast made at `origin` for a garage"""
@@ -0,0 +1,145 @@
+"""
+Benchmark suite for the storage backends.
+
+Runs the same workload against every backend so they can be compared side by side:
+    python -m data.storage.benchmark --backend all --days 60
+
+The mongo run uses a separate `sjparking_benchmark` database, and the sqlite run uses a
+temporary file, so neither touches real data.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+from data.storage import METADATA, STATUS_FIELDS, Storage, create_storage
+
+SAMPLE_INTERVAL = timedelta(minutes=10)
+
+
+def generate_datapoints(days: int, start: datetime) -> List[Dict[str, Any]]:
+    """Generate one synthetic datapoint every 10 minutes for `days` days"""
+    rng = random.Random(0)
+    docs = []
+    timestamp = start
+    end = start + timedelta(days=days)
+    while timestamp < end:
+        doc = {"timestamp": timestamp, "metadata": METADATA}
+        for field in STATUS_FIELDS:
+            doc[field] = rng.randint(0, 100)
+        docs.append(doc)
+        timestamp += SAMPLE_INTERVAL
+    return docs
+
+
+async def _timed(results: Dict[str, float], name: str, fn: Callable, repeat: int = 1) -> Any:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = await fn()
+    results[name] = (time.perf_counter() - start) / repeat * 1000
+    return result
+
+
+async def run_suite(storage: Storage, days: int) -> Dict[str, float]:
+    """
+    Run the benchmark workload against an initialized, empty storage backend.
+
+    Returns:
+        Dict mapping each operation to its mean duration in milliseconds
+    """
+    results: Dict[str, float] = {}
+    start = datetime(2025, 1, 6)
+    docs = generate_datapoints(days, start)
+    bulk, singles = docs[:-144], docs[-144:]
+
+    await _timed(results, f"insert_datapoints ({len(bulk)} rows)", lambda: storage.insert_datapoints(bulk))
+
+    async def insert_singles():
+        for doc in singles:
+            await storage.insert_datapoint(doc)
+    await _timed(results, f"insert_datapoint x{len(singles)}", insert_singles)
+    await _timed(results, "insert_datapoints (all duplicates)", lambda: storage.insert_datapoints(bulk[:1000]))
+
+    middle = start + timedelta(days=days // 2)
+    await _timed(results, "get_latest_timestamp", storage.get_latest_timestamp, repeat=20)
+    await _timed(results, "get_datapoint", lambda: storage.get_datapoint(middle), repeat=20)
+    await _timed(results, "get_datapoints (1 day)",
+                 lambda: storage.get_datapoints(middle, middle + timedelta(days=1)), repeat=20)
+    await _timed(results, "get_recent_datapoints (1000)",
+                 lambda: storage.get_recent_datapoints(middle, 1000), repeat=10)
+    await _timed(results, "get_hourly_means (1 day)",
+                 lambda: storage.get_hourly_means(middle, middle + timedelta(days=1), STATUS_FIELDS[0]), repeat=20)
+    await _timed(results, "get_garage_series (1 day)",
+                 lambda: storage.get_garage_series(middle, middle + timedelta(days=1), STATUS_FIELDS[0]), repeat=20)
+    await _timed(results, "get_datapoint_days", storage.get_datapoint_days, repeat=5)
+
+    async def write_rollups():
+        for offset in range(days):
+            day = (start + timedelta(days=offset)).strftime("%Y-%m-%d")
+            for garage_id in range(1, 5):
+                await storage.replace_rollup({
+                    "day": day, "garage_id": garage_id, "values": list(range(24)), "complete": True
+                })
+    await _timed(results, f"replace_rollup x{days * 4}", write_rollups)
+    await _timed(results, "get_rollup", lambda: storage.get_rollup(middle.strftime("%Y-%m-%d"), 1), repeat=20)
+    await _timed(results, "get_complete_rollups", storage.get_complete_rollups, repeat=5)
+    await _timed(results, "get_latest_complete_day", storage.get_latest_complete_day, repeat=20)
+
+    averages = [[hour for hour in range(24)] for _ in range(7)]
+    await _timed(results, "save_averages", lambda: storage.save_averages("south", averages), repeat=20)
+    await _timed(results, "get_averages", lambda: storage.get_averages("south"), repeat=20)
+    await _timed(results, "save_forecast", lambda: storage.save_forecast(middle, "south", list(range(48))), repeat=20)
+    await _timed(results, "get_forecast", lambda: storage.get_forecast(middle, "south"), repeat=20)
+    return results
+
+
+async def run_backend(kind: str, days: int) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        if kind == "sqlite":
+            storage = create_storage("sqlite", path=os.path.join(tmp, "benchmark.db"))
+        elif kind == "mongo":
+            storage = create_storage("mongo", database_name="sjparking_benchmark")
+            await storage.client.drop_database("sjparking_benchmark")
+        else:
+            storage = create_storage(kind)
+        await storage.init()
+        try:
+            return await run_suite(storage, days)
+        finally:
+            if kind == "mongo":
+                await storage.client.drop_database("sjparking_benchmark")
+            await storage.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the storage backends")
+    parser.add_argument("--backend", default="all", choices=["all", "mongo", "sqlite", "memory"])
+    parser.add_argument("--days", type=int, default=60, help="Days of synthetic 10-minute data")
+    args = parser.parse_args()
+
+    kinds = ["memory", "sqlite", "mongo"] if args.backend == "all" else [args.backend]
+    all_results = {}
+    for kind in kinds:
+        try:
+            all_results[kind] = await run_backend(kind, args.days)
+        except Exception as e:
+            print(f"Skipping {kind}: {e}")
+
+    operations = list(next(iter(all_results.values())).keys()) if all_results else []
+    print(f"\n{'operation (ms)':<40}" + "".join(f"{kind:>12}" for kind in all_results))
+    for operation in operations:
+        print(f"{operation:<40}" + "".join(f"{all_results[kind][operation]:>12.3f}" for kind in all_results))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
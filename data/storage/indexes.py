@@ -0,0 +1,73 @@
+"""
+Index manifest for the MongoDB collections.
+
+Every query MongoStorage runs for the API, the forecasting code and the logger should be
+served by one of these indexes; `python -m data.storage.query_plans` checks that it is.
+The SQLite backend declares the same indexes in its schema.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    name: str
+    keys: Tuple[Tuple[str, int], ...]
+    unique: bool = False
+
+
+INDEXES: Dict[str, List[IndexSpec]] = {
+    # Time series collection: secondary indexes only, it can't carry a unique index
+    "datapoints": [
+        # get_datapoint, get_latest_timestamp and the insert_datapoints dedup range query
+        IndexSpec("timestamp_1", (("timestamp", 1),)),
+        # Range queries on one series (get_datapoints, get_recent_datapoints, hourly means and series)
+        IndexSpec("metadata_1_timestamp_1", (("metadata", 1), ("timestamp", 1))),
+    ],
+    # Hourly min/mean/max of the datapoints the retention job archived (get_compacted, replace_compacted)
+    "datapoints_hourly": [
+        IndexSpec("metadata_1_hour_1", (("metadata", 1), ("hour", 1)), unique=True),
+    ],
+    "hourly_aggregates": [
+        # get_rollup, replace_rollup, delete_rollups and the distinct days
+        IndexSpec("day_1_garage_id_1", (("day", 1), ("garage_id", 1)), unique=True),
+        # get_complete_rollups and get_latest_complete_day (sorted by day)
+        IndexSpec("complete_1_day_1", (("complete", 1), ("day", 1))),
+    ],
+    "average_fullness": [
+        IndexSpec("garage_1", (("garage", 1),), unique=True),
+    ],
+    "predictions": [
+        IndexSpec("origin_1_garage_1_kind_1", (("origin", 1), ("garage", 1), ("kind", 1)), unique=True),
+    ],
+}
+
+
+async def apply_indexes(db, manifest: Dict[str, List[IndexSpec]] = INDEXES) -> List[str]:
+    """
+    Create the indexes of the manifest that don't exist yet (existing ones are left alone).
+
+    Args:
+        db: Motor database
+        manifest (dict): Collection name to the indexes it should have
+
+    Returns:
+        List[str]: Names of the indexes that were created
+    """
+    created = []
+    for collection_name, specs in manifest.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        for spec in specs:
+            if spec.name in existing:
+                continue
+            try:
+                await collection.create_index(list(spec.keys), name=spec.name, unique=spec.unique)
+                created.append(f"{collection_name}.{spec.name}")
+            except Exception as e:
+                # e.g. duplicate keys left over from before the unique index, or the same keys under another name.
+                # Startup goes on, query_plans reports the queries that end up scanning.
+                print(f"Could not create index {collection_name}.{spec.name}: {e}")
+    if created:
+        print(f"Created indexes: {', '.join(created)}")
+    return created
@@ -0,0 +1,160 @@
+import bisect
+import copy
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from data.storage.base import METADATA, Storage
+
+
+class MemoryStorage(Storage):
+    """
+    Storage that keeps everything in process memory.
+    Datapoints are kept sorted by timestamp so range reads are a bisect and a slice.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        self._timestamps: List[datetime] = []
+        self._datapoints: List[Dict[str, Any]] = []
+        self._keys: set = set()
+        self._compacted: Dict[Tuple[str, datetime], Dict[str, Any]] = {}
+        self._rollups: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        self._averages: Dict[str, List[List[int]]] = {}
+        self._forecasts: Dict[Tuple[datetime, str, str], List[Any]] = {}
+        self._leases: Dict[str, Tuple[str, float]] = {}
+
+    async def init(self) -> None:
+        return None
+
+    async def close(self) -> None:
+        return None
+
+    # ── DATAPOINTS ──────────────────────────────────────────────────────────────
+    async def insert_datapoints(self, docs: List[Dict[str, Any]]) -> int:
+        inserted = 0
+        for doc in docs:
+            key = (doc["metadata"], doc["timestamp"])
+            if key in self._keys:
+                continue
+            self._keys.add(key)
+            index = bisect.bisect_right(self._timestamps, doc["timestamp"])
+            self._timestamps.insert(index, doc["timestamp"])
+            self._datapoints.insert(index, dict(doc))
+            inserted += 1
+        return inserted
+
+    async def get_datapoint(self, timestamp: datetime) -> Optional[Dict[str, Any]]:
+        index = bisect.bisect_left(self._timestamps, timestamp)
+        if index < len(self._timestamps) and self._timestamps[index] == timestamp:
+            return dict(self._datapoints[index])
+        return None
+
+    async def get_latest_timestamp(self) -> Optional[datetime]:
+        return self._timestamps[-1] if self._timestamps else None
+
+    async def get_oldest_timestamp(self) -> Optional[datetime]:
+        return self._timestamps[0] if self._timestamps else None
+
+    async def get_datapoints(
+        self, start: datetime, end: datetime, metadata: str = METADATA
+    ) -> List[Dict[str, Any]]:
+        lo = bisect.bisect_left(self._timestamps, start)
+        hi = bisect.bisect_left(self._timestamps, end)
+        return [dict(doc) for doc in self._datapoints[lo:hi] if doc["metadata"] == metadata]
+
+    async def get_recent_datapoints(
+        self, before: datetime, limit: int, metadata: str = METADATA
+    ) -> List[Dict[str, Any]]:
+        hi = bisect.bisect_left(self._timestamps, before)
+        docs = []
+        for doc in reversed(self._datapoints[:hi]):
+            if len(docs) >= limit:
+                break
+            if doc["metadata"] == metadata:
+                docs.append(dict(doc))
+        return docs[::-1]
+
+    async def delete_datapoints(self, start: datetime, end: datetime, metadata: str = METADATA) -> int:
+        lo = bisect.bisect_left(self._timestamps, start)
+        hi = bisect.bisect_left(self._timestamps, end)
+        kept = [doc for doc in self._datapoints[lo:hi] if doc["metadata"] != metadata]
+        deleted = (hi - lo) - len(kept)
+        for doc in self._datapoints[lo:hi]:
+            if doc["metadata"] == metadata:
+                self._keys.discard((doc["metadata"], doc["timestamp"]))
+        self._datapoints[lo:hi] = kept
+        self._timestamps[lo:hi] = [doc["timestamp"] for doc in kept]
+        return deleted
+
+    async def get_datapoint_days(self) -> List[str]:
+        return sorted({timestamp.strftime("%Y-%m-%d") for timestamp in self._timestamps})
+
+    # ── COMPACTED DATAPOINTS ────────────────────────────────────────────────────
+    async def replace_compacted(self, docs: List[Dict[str, Any]]) -> None:
+        for doc in docs:
+            self._compacted[(doc["metadata"], doc["hour"])] = dict(doc)
+
+    async def get_compacted(
+        self, start: datetime, end: datetime, metadata: str = METADATA
+    ) -> List[Dict[str, Any]]:
+        return [
+            dict(doc) for (doc_metadata, hour), doc in sorted(self._compacted.items(), key=lambda item: item[0][1])
+            if doc_metadata == metadata and start <= hour < end
+        ]
+
+    # ── HOURLY ROLLUPS ──────────────────────────────────────────────────────────
+    async def get_rollup(self, day: str, garage_id: int) -> Optional[Dict[str, Any]]:
+        doc = self._rollups.get((day, garage_id))
+        return copy.deepcopy(doc) if doc else None
+
+    async def replace_rollup(self, doc: Dict[str, Any]) -> None:
+        self._rollups[(doc["day"], doc["garage_id"])] = copy.deepcopy(doc)
+
+    async def delete_rollups(self, day: str) -> None:
+        for key in [key for key in self._rollups if key[0] == day]:
+            del self._rollups[key]
+
+    async def get_complete_rollups(self) -> List[Dict[str, Any]]:
+        return [copy.deepcopy(doc) for doc in self._rollups.values() if doc["complete"] is True]
+
+    async def get_latest_complete_day(self) -> Optional[str]:
+        days = [doc["day"] for doc in self._rollups.values() if doc["complete"] is True]
+        return max(days) if days else None
+
+    async def get_rollup_days(self) -> List[str]:
+        return sorted({day for day, _ in self._rollups})
+
+    # ── LEASES ──────────────────────────────────────────────────────────────────
+    async def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.monotonic()
+        holder, expires_at = self._leases.get(name, (None, 0.0))
+        if holder not in (None, owner) and expires_at > now:
+            return False
+        self._leases[name] = (owner, now + ttl)
+        return True
+
+    async def release_lease(self, name: str, owner: str) -> None:
+        if self._leases.get(name, (None, 0.0))[0] == owner:
+            del self._leases[name]
+
+    # ── AVERAGES ────────────────────────────────────────────────────────────────
+    async def save_averages(self, garage: str, averages: List[List[int]]) -> None:
+        self._averages[garage] = copy.deepcopy(averages)
+
+    async def get_averages(self, garage: str) -> Optional[List[List[int]]]:
+        averages = self._averages.get(garage)
+        return copy.deepcopy(averages) if averages is not None else None
+
+    # ── FORECASTS ───────────────────────────────────────────────────────────────
+    async def save_forecast(
+        self, origin: datetime, garage: str, values: List[Any], kind: str = "hourly"
+    ) -> None:
+        self._forecasts[(origin, garage, kind)] = list(values)
+
+    async def get_forecast(
+        self, origin: datetime, garage: str, kind: str = "hourly"
+    ) -> Optional[List[Any]]:
+        values = self._forecasts.get((origin, garage, kind))
+        return list(values) if values is not None else None
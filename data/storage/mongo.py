@@ -0,0 +1,272 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReplaceOne
+from pymongo.errors import DuplicateKeyError
+
+from data.storage.base import METADATA, Storage
+from data.storage.indexes import apply_indexes
+
+
+class MongoStorage(Storage):
+    """Storage backed by the `sjparking` MongoDB database (time series `datapoints` collection)"""
+
+    name = "mongo"
+
+    def __init__(self, uri: Optional[str], database_name: str = "sjparking", **client_options):
+        self.client = AsyncIOMotorClient(uri, **client_options)
+        self.db = self.client[database_name]
+        self.collection = self.db["datapoints"]
+        self.compacted_collection = self.db["datapoints_hourly"]
+        self.averaged_collection = self.db["hourly_aggregates"]
+        self.prediction_collection = self.db["predictions"]
+        self.averages_collection = self.db["average_fullness"]
+        self.lease_collection = self.db["leases"]
+
+    async def init(self) -> None:
+        # Check if the time series collection exists
+        collections = await self.db.list_collection_names()
+        if "datapoints" not in collections:
+            # Create time series collection
+            await self.db.create_collection(
+                "datapoints",
+                timeseries={
+                    "timeField": "timestamp",
+                    "metaField": "metadata",
+                    "granularity": "minutes"
+                }
+            )
+        # Indexes of every collection, see indexes.py
+        await apply_indexes(self.db)
+
+    async def close(self) -> None:
+        self.client.close()
+
+    # ── DATAPOINTS ──────────────────────────────────────────────────────────────
+    async def insert_datapoints(self, docs: List[Dict[str, Any]]) -> int:
+        if not docs:
+            return 0
+        # Time series collections can't carry a unique index, so dedup with one range query
+        timestamps = [doc["timestamp"] for doc in docs]
+        cursor = self.collection.find(
+            {"timestamp": {"$gte": min(timestamps), "$lte": max(timestamps)}},
+            {"_id": 0, "timestamp": 1, "metadata": 1}
+        )
+        existing = {(doc["metadata"], doc["timestamp"]) for doc in await cursor.to_list(length=None)}
+        new_docs = []
+        for doc in docs:
+            key = (doc["metadata"], doc["timestamp"])
+            if key in existing:
+                continue
+            existing.add(key)
+            new_docs.append(dict(doc))
+        if new_docs:
+            await self.collection.insert_many(new_docs, ordered=False)
+        return len(new_docs)
+
+    async def get_datapoint(self, timestamp: datetime) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"timestamp": timestamp}, {"_id": 0})
+
+    async def get_latest_timestamp(self) -> Optional[datetime]:
+        most_recent = await self.collection.find_one(sort=[("timestamp", -1)])
+        return most_recent["timestamp"] if most_recent else None
+
+    async def get_oldest_timestamp(self) -> Optional[datetime]:
+        oldest = await self.collection.find_one(sort=[("timestamp", 1)])
+        return oldest["timestamp"] if oldest else None
+
+    async def get_datapoints(
+        self, start: datetime, end: datetime, metadata: str = METADATA
+    ) -> List[Dict[str, Any]]:
+        cursor = self.collection.find(
+            {"timestamp": {"$gte": start, "$lt": end}, "metadata": metadata},
+            {"_id": 0}
+        ).sort("timestamp", 1)
+        return await cursor.to_list(length=None)
+
+    async def get_recent_datapoints(
+        self, before: datetime, limit: int, metadata: str = METADATA
+    ) -> List[Dict[str, Any]]:
+        cursor = self.collection.find(
+            {"timestamp": {"$lt": before}, "metadata": metadata},
+            {"_id": 0}
+        ).sort("timestamp", -1).limit(limit)
+        docs = await cursor.to_list(length=None)
+        # Reverse to chronological order (oldest to newest)
+        return docs[::-1]
+
+    async def delete_datapoints(self, start: datetime, end: datetime, metadata: str = METADATA) -> int:
+        # Deleting from a time series collection by timeField needs MongoDB 7.0+
+        result = await self.collection.delete_many({"timestamp": {"$gte": start, "$lt": end}, "metadata": metadata})
+        return result.deleted_count
+
+    async def get_datapoint_days(self) -> List[str]:
+        pipeline = [
+            {
+                "$group": {
+                    "_id": {
+                        "$dateToString": {
+                            "format": "%Y-%m-%d",
+                            "date": "$timestamp"
+                        }
+                    }
+                }
+            }
+        ]
+        cursor = self.collection.aggregate(pipeline)
+        return sorted(doc["_id"] for doc in await cursor.to_list(length=None))
+
+    async def get_hourly_means(
+        self, start: datetime, end: datetime, status_field: str
+    ) -> Dict[int, float]:
+        pipeline = [
+            {
+                "$match": {
+                    "timestamp": {"$gte": start, "$lt": end},
+                    "metadata": METADATA
+                }
+            },
+            {
+                "$group": {
+                    "_id": {"$hour": "$timestamp"},
+                    "avg_value": {"$avg": f"${status_field}"}
+                }
+            },
+            {
+                "$sort": {"_id": 1}
+            }
+        ]
+        cursor = self.collection.aggregate(pipeline)
+        return {doc["_id"]: doc["avg_value"] for doc in await cursor.to_list(length=None)}
+
+    async def get_garage_series(
+        self, start: datetime, end: datetime, status_field: str
+    ) -> List[Dict[str, Any]]:
+        pipeline = [
+            {
+                "$match": {
+                    "timestamp": {"$gte": start, "$lt": end},
+                    "metadata": METADATA
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "time": {
+                        "$dateToString": {
+                            "format": "%H:%M",
+                            "date": "$timestamp"
+                        }
+                    },
+                    "value": f"${status_field}"
+                }
+            },
+            {
+                "$sort": {"time": 1}
+            }
+        ]
+        cursor = self.collection.aggregate(pipeline)
+        return await cursor.to_list(length=None)
+
+    # ── COMPACTED DATAPOINTS ────────────────────────────────────────────────────
+    async def replace_compacted(self, docs: List[Dict[str, Any]]) -> None:
+        if not docs:
+            return
+        await self.compacted_collection.bulk_write(
+            [ReplaceOne({"metadata": doc["metadata"], "hour": doc["hour"]}, dict(doc), upsert=True) for doc in docs],
+            ordered=False
+        )
+
+    async def get_compacted(
+        self, start: datetime, end: datetime, metadata: str = METADATA
+    ) -> List[Dict[str, Any]]:
+        cursor = self.compacted_collection.find(
+            {"metadata": metadata, "hour": {"$gte": start, "$lt": end}},
+            {"_id": 0}
+        ).sort("hour", 1)
+        return await cursor.to_list(length=None)
+
+    # ── HOURLY ROLLUPS ──────────────────────────────────────────────────────────
+    async def get_rollup(self, day: str, garage_id: int) -> Optional[Dict[str, Any]]:
+        return await self.averaged_collection.find_one({"day": day, "garage_id": garage_id}, {"_id": 0})
+
+    async def replace_rollup(self, doc: Dict[str, Any]) -> None:
+        await self.averaged_collection.update_one(
+            {"day": doc["day"], "garage_id": doc["garage_id"]},
+            {"$set": doc},
+            upsert=True
+        )
+
+    async def delete_rollups(self, day: str) -> None:
+        await self.averaged_collection.delete_many({"day": day})
+
+    async def get_complete_rollups(self) -> List[Dict[str, Any]]:
+        cursor = self.averaged_collection.find({"complete": True}, {"_id": 0})
+        return await cursor.to_list(length=None)
+
+    async def get_latest_complete_day(self) -> Optional[str]:
+        pipeline = [
+            {"$match": {"complete": True}},
+            {"$sort": {"day": -1}},
+            {"$limit": 1}
+        ]
+        result = await self.averaged_collection.aggregate(pipeline).to_list(length=1)
+        return result[0]["day"] if result else None
+
+    async def get_rollup_days(self) -> List[str]:
+        return await self.averaged_collection.distinct("day")
+
+    # ── LEASES ──────────────────────────────────────────────────────────────────
+    async def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        # Expiry is compared and set with the server's clock ($$NOW), so replica clocks don't matter.
+        # If another owner holds a live lease the filter doesn't match and the upsert hits the existing _id.
+        try:
+            await self.lease_collection.update_one(
+                {
+                    "_id": name,
+                    "$expr": {"$or": [{"$eq": ["$owner", owner]}, {"$lt": ["$expires_at", "$$NOW"]}]}
+                },
+                [{"$set": {"owner": owner, "expires_at": {"$add": ["$$NOW", int(ttl * 1000)]}}}],
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def release_lease(self, name: str, owner: str) -> None:
+        await self.lease_collection.delete_one({"_id": name, "owner": owner})
+
+    # ── AVERAGES ────────────────────────────────────────────────────────────────
+    async def save_averages(self, garage: str, averages: List[List[int]]) -> None:
+        await self.averages_collection.update_one(
+            {"garage": garage},
+            {"$set": {"garage": garage, "averages": averages, "updated_at": datetime.now()}},
+            upsert=True
+        )
+
+    async def get_averages(self, garage: str) -> Optional[List[List[int]]]:
+        doc = await self.averages_collection.find_one({"garage": garage})
+        return doc["averages"] if doc else None
+
+    # ── FORECASTS ───────────────────────────────────────────────────────────────
+    async def save_forecast(
+        self, origin: datetime, garage: str, values: List[Any], kind: str = "hourly"
+    ) -> None:
+        await self.prediction_collection.update_one(
+            {"origin": origin, "garage": garage, "kind": kind},
+            {"$set": {
+                "origin": origin,
+                "garage": garage,
+                "kind": kind,
+                "values": values,
+                "created_at": datetime.now()
+            }},
+            upsert=True
+        )
+
+    async def get_forecast(
+        self, origin: datetime, garage: str, kind: str = "hourly"
+    ) -> Optional[List[Any]]:
+        doc = await self.prediction_collection.find_one({"origin": origin, "garage": garage, "kind": kind})
+        return doc["values"] if doc else None
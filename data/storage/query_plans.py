@@ -0,0 +1,247 @@
+"""
+Query plan regression check for the storage backends.
+
+Seeds a scratch database with `--days` of synthetic 10-minute data, runs every storage call
+database.py, the retention job and the leader election make while recording the queries they send, then asks the database for the plan
+of each recorded query (explain() on Mongo, EXPLAIN QUERY PLAN on SQLite). A query that
+scans the whole collection/table instead of using an index fails the check (exit code 1):
+    python -m data.storage.query_plans --backend sqlite --days 120
+    python -m data.storage.query_plans --backend mongo
+
+The mongo run uses a separate `sjparking_plancheck` database, and the sqlite run uses a
+temporary file, so neither touches real data.
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+from data.storage import STATUS_FIELDS, Storage, create_storage
+from data.storage.benchmark import generate_datapoints
+from data.storage.retention import compact_hours
+
+PLANCHECK_DATABASE = "sjparking_plancheck"
+
+# Calls that have to read every datapoint whatever the indexes, with the reason
+ALLOWED_SCANS = {
+    "get_datapoint_days": "groups every datapoint by day (startup only)",
+}
+
+# Mongo commands that have a query plan
+_EXPLAINABLE = {"find", "aggregate", "distinct", "count", "update", "delete", "findAndModify"}
+# Bare "SCAN <table>" is a full table scan, "SCAN <table> USING [COVERING] INDEX" walks an index
+_SQLITE_TABLE_SCAN = re.compile(r"^SCAN (\w+)$")
+
+
+@dataclass
+class PlanResult:
+    operation: str
+    query: str
+    scans: List[str]
+
+    @property
+    def allowed(self) -> bool:
+        return not self.scans or self.operation in ALLOWED_SCANS
+
+
+class QueryLog:
+    """Queries sent by the storage backend, tagged with the storage call that sent them"""
+
+    def __init__(self):
+        self.operation: Optional[str] = None
+        self.queries: List[Tuple[str, Any]] = []
+
+    def record(self, query: Any) -> None:
+        if self.operation is not None:
+            self.queries.append((self.operation, query))
+
+
+async def run_workload(storage: Storage, log: QueryLog, start: datetime, days: int) -> None:
+    """Make each storage call of database.py, the retention job and the leader election against seeded data, recording its queries"""
+    middle = start + timedelta(days=days // 2)
+    day = middle.strftime("%Y-%m-%d")
+    field = STATUS_FIELDS[0]
+    duplicates = generate_datapoints(1, middle)
+    averages = [[hour for hour in range(24)] for _ in range(7)]
+    calls = [
+        ("insert_datapoints", lambda: storage.insert_datapoints(duplicates)),
+        ("get_datapoint", lambda: storage.get_datapoint(middle)),
+        ("get_latest_timestamp", storage.get_latest_timestamp),
+        ("get_oldest_timestamp", storage.get_oldest_timestamp),
+        ("get_datapoints", lambda: storage.get_datapoints(middle, middle + timedelta(days=1))),
+        ("get_recent_datapoints", lambda: storage.get_recent_datapoints(middle, 1000)),
+        ("get_datapoint_days", storage.get_datapoint_days),
+        ("get_hourly_means", lambda: storage.get_hourly_means(middle, middle + timedelta(days=1), field)),
+        ("get_garage_series", lambda: storage.get_garage_series(middle, middle + timedelta(days=1), field)),
+        ("get_compacted", lambda: storage.get_compacted(start, start + timedelta(days=1))),
+        ("delete_datapoints", lambda: storage.delete_datapoints(start - timedelta(days=1), start)),
+        ("get_rollup", lambda: storage.get_rollup(day, 1)),
+        ("replace_rollup", lambda: storage.replace_rollup(
+            {"day": day, "garage_id": 1, "values": list(range(24)), "complete": True})),
+        ("delete_rollups", lambda: storage.delete_rollups("1970-01-01")),
+        ("get_complete_rollups", storage.get_complete_rollups),
+        ("get_latest_complete_day", storage.get_latest_complete_day),
+        ("get_rollup_days", storage.get_rollup_days),
+        ("save_averages", lambda: storage.save_averages("south", averages)),
+        ("get_averages", lambda: storage.get_averages("south")),
+        ("save_forecast", lambda: storage.save_forecast(middle, "south", list(range(48)))),
+        ("get_forecast", lambda: storage.get_forecast(middle, "south")),
+        ("acquire_lease", lambda: storage.acquire_lease("plancheck", "owner", 30)),
+        ("release_lease", lambda: storage.release_lease("plancheck", "owner")),
+    ]
+    for operation, call in calls:
+        log.operation = operation
+        try:
+            await call()
+        finally:
+            log.operation = None
+
+
+async def seed(storage: Storage, start: datetime, days: int) -> None:
+    docs = generate_datapoints(days, start)
+    await storage.insert_datapoints(docs)
+    await storage.replace_compacted(compact_hours(docs))
+    for offset in range(days):
+        day = (start + timedelta(days=offset)).strftime("%Y-%m-%d")
+        for garage_id in range(1, 5):
+            await storage.replace_rollup({
+                "day": day, "garage_id": garage_id, "values": list(range(24)), "complete": offset < days - 1
+            })
+
+
+# ── SQLITE ──────────────────────────────────────────────────────────────────────
+def _sqlite_scans(conn, statement: str) -> List[str]:
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {statement}").fetchall()
+    return [detail for *_, detail in rows if _SQLITE_TABLE_SCAN.match(detail)]
+
+
+async def check_sqlite(days: int) -> List[PlanResult]:
+    start = datetime(2025, 1, 6)
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = create_storage("sqlite", path=os.path.join(tmp, "plancheck.db"))
+        await storage.init()
+        try:
+            await seed(storage, start, days)
+            log = QueryLog()
+            # The trace callback gets each statement with its parameters filled in
+            conn = storage._connect()
+            conn.set_trace_callback(log.record)
+            await run_workload(storage, log, start, days)
+            conn.set_trace_callback(None)
+
+            results = []
+            for operation, statement in log.queries:
+                if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+                    continue
+                scans = await storage._run(lambda conn: _sqlite_scans(conn, statement))
+                results.append(PlanResult(operation, statement, scans))
+            return results
+        finally:
+            await storage.close()
+
+
+# ── MONGO ───────────────────────────────────────────────────────────────────────
+def _winning_stages(node: Any, winning: bool = False) -> List[str]:
+    """Stage names of the winning plans anywhere in an explain() result"""
+    stages = []
+    if isinstance(node, dict):
+        if winning and "stage" in node:
+            stages.append(node["stage"])
+        for key, value in node.items():
+            if key == "rejectedPlans":
+                continue
+            stages.extend(_winning_stages(value, winning or key == "winningPlan"))
+    elif isinstance(node, list):
+        for value in node:
+            stages.extend(_winning_stages(value, winning))
+    return stages
+
+
+async def check_mongo(days: int) -> List[PlanResult]:
+    from pymongo import monitoring
+    from data.storage.mongo import MongoStorage
+
+    log = QueryLog()
+
+    class Recorder(monitoring.CommandListener):
+        def started(self, event):
+            if event.command_name in _EXPLAINABLE:
+                log.record(dict(event.command))
+
+        def succeeded(self, event):
+            pass
+
+        def failed(self, event):
+            pass
+
+    start = datetime(2025, 1, 6)
+    storage = MongoStorage(os.getenv("MONGO_URI"), PLANCHECK_DATABASE, event_listeners=[Recorder()])
+    await storage.client.drop_database(PLANCHECK_DATABASE)
+    await storage.init()
+    try:
+        await seed(storage, start, days)
+        await run_workload(storage, log, start, days)
+
+        results = []
+        for operation, command in log.queries:
+            # Session and routing fields belong to the original command, not to the explain
+            command = {key: value for key, value in command.items() if not key.startswith("$") and key != "lsid"}
+            explain = await storage.db.command({"explain": command, "verbosity": "queryPlanner"})
+            scans = [stage for stage in _winning_stages(explain) if stage == "COLLSCAN"]
+            results.append(PlanResult(operation, str(command), scans))
+        return results
+    finally:
+        await storage.client.drop_database(PLANCHECK_DATABASE)
+        await storage.close()
+
+
+async def check_query_plans(kind: str, days: int) -> List[PlanResult]:
+    """
+    Plans of every query the storage calls of database.py, the retention job and the leader election send, against `days` of seeded data.
+
+    Returns:
+        List[PlanResult]: One per query, with the full scans in its plan
+    """
+    if kind == "sqlite":
+        return await check_sqlite(days)
+    if kind == "mongo":
+        return await check_mongo(days)
+    raise ValueError(f"No query plans to check for backend: {kind}")
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Fail if a storage query scans a whole collection")
+    parser.add_argument("--backend", default="sqlite", choices=["mongo", "sqlite"])
+    parser.add_argument("--days", type=int, default=120, help="Days of synthetic 10-minute data to seed")
+    args = parser.parse_args()
+
+    results = await check_query_plans(args.backend, args.days)
+    failures = 0
+    for result in results:
+        if not result.scans:
+            status = "ok"
+        elif result.allowed:
+            status = f"scan allowed: {ALLOWED_SCANS[result.operation]}"
+        else:
+            status = f"FULL SCAN: {', '.join(result.scans)}"
+            failures += 1
+        print(f"{result.operation:<26} {status}")
+        if result.scans and not result.allowed:
+            print(f"    {result.query}")
+
+    print(f"\n{len(results)} queries checked, {failures} full scans")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
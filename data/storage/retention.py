@@ -0,0 +1,250 @@
+"""
+Retention policy for raw datapoints.
+
+Raw 10-minute datapoints older than RETENTION_MONTHS (whole calendar months) are compacted
+one month at a time:
+  1. the month's hourly rollups are checked against the raw datapoints,
+  2. the raw datapoints are written to the local archive (records/archive/datapoints-YYYY-MM.npz,
+     one array per column) and read back,
+  3. hourly min/mean/max documents are stored (Storage.replace_compacted),
+  4. the raw datapoints are deleted from storage.
+A month whose rollups don't match its datapoints is left alone and reported. Every step can be
+repeated, so a run that stops halfway is finished by the next one.
+
+    python -m data.storage.retention --dry-run
+    python -m data.storage.retention --months 6 --backend sqlite
+"""
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+import numpy as np
+
+from data.storage import METADATA, STATUS_FIELDS, Storage, create_storage
+from data.forecasting.time_grid import TimeGrid, rollup_values
+
+# Raw datapoints are kept for the current month and this many months before it
+RETENTION_MONTHS = int(os.getenv("RETENTION_MONTHS", "12"))
+ARCHIVE_DIRECTORY = Path(os.getenv(
+    "ARCHIVE_DIRECTORY", Path(__file__).resolve().parent.parent / "records" / "archive"
+))
+# Seconds between retention runs in the API (0 disables them)
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", str(24 * 3600)))
+
+GARAGE_IDS = range(1, len(STATUS_FIELDS) + 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """First day of the month `months` after (or before) the month of `month`"""
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def retention_cutoff(months: int = RETENTION_MONTHS, now: Optional[datetime] = None) -> datetime:
+    """Datapoints before this are compacted"""
+    return add_months(now or datetime.now(), -months)
+
+
+# ── ARCHIVE ─────────────────────────────────────────────────────────────────────
+def archive_path(month: datetime, directory: Path = ARCHIVE_DIRECTORY) -> Path:
+    return Path(directory) / f"datapoints-{month:%Y-%m}.npz"
+
+
+def read_archive(month: datetime, directory: Path = ARCHIVE_DIRECTORY) -> List[Dict[str, Any]]:
+    """Archived datapoints of a month, oldest first (empty if the month isn't archived)"""
+    path = archive_path(month, directory)
+    if not path.exists():
+        return []
+    with np.load(path) as archive:
+        columns = {name: archive[name] for name in archive.files}
+    timestamps = columns["timestamp"].astype("datetime64[us]").tolist()
+    statuses = np.stack([columns[field] for field in STATUS_FIELDS], axis=1).tolist()
+    return [
+        {"timestamp": timestamp, "metadata": str(metadata), **dict(zip(STATUS_FIELDS, values))}
+        for timestamp, metadata, values in zip(timestamps, columns["metadata"], statuses)
+    ]
+
+
+def write_archive(month: datetime, docs: List[Dict[str, Any]], directory: Path = ARCHIVE_DIRECTORY) -> Path:
+    """
+    Add datapoints to a month's archive (datapoints already archived are kept once).
+    The file is replaced atomically, so a crash never leaves a partial archive behind.
+
+    Returns:
+        Path: The archive file
+    """
+    path = archive_path(month, directory)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    merged = {(doc["metadata"], doc["timestamp"]): doc for doc in read_archive(month, directory)}
+    merged.update({(doc["metadata"], doc["timestamp"]): doc for doc in docs})
+    rows = [merged[key] for key in sorted(merged, key=lambda key: (key[1], key[0]))]
+
+    columns = {
+        "timestamp": np.array([row["timestamp"] for row in rows], dtype="datetime64[us]"),
+        "metadata": np.array([row["metadata"] for row in rows], dtype=str),
+    }
+    for field in STATUS_FIELDS:
+        columns[field] = np.array([row[field] for row in rows], dtype=np.int16)
+
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, **columns)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return path
+
+
+# ── COMPACTION ──────────────────────────────────────────────────────────────────
+def compact_hours(docs: List[Dict[str, Any]], metadata: str = METADATA) -> List[Dict[str, Any]]:
+    """Hourly min/mean/max documents of datapoints sorted by timestamp"""
+    if not docs:
+        return []
+    hours = np.array([doc["timestamp"] for doc in docs], dtype="datetime64[us]").astype("datetime64[h]")
+    values = np.array([[doc[field] for field in STATUS_FIELDS] for doc in docs], dtype=np.float64)
+    starts = np.flatnonzero(np.r_[True, hours[1:] != hours[:-1]])
+    counts = np.diff(np.r_[starts, len(docs)])
+    stats = {
+        "min": np.minimum.reduceat(values, starts),
+        "mean": np.round(np.add.reduceat(values, starts) / counts[:, None], 2),
+        "max": np.maximum.reduceat(values, starts),
+    }
+    compacted = []
+    for row, hour in enumerate(hours[starts].astype("datetime64[us]").tolist()):
+        doc = {"hour": hour, "metadata": metadata, "count": int(counts[row])}
+        for column, field in enumerate(STATUS_FIELDS):
+            for stat, table in stats.items():
+                doc[f"{field}_{stat}"] = float(table[row, column])
+        compacted.append(doc)
+    return compacted
+
+
+async def rollup_mismatches(storage: Storage, docs: List[Dict[str, Any]], start: datetime, end: datetime) -> List[str]:
+    """
+    Days in [start, end) whose stored rollups don't match the hourly means of `docs`.
+    Old days without data in the last hour are never marked complete, so the flag isn't
+    required; the rollup only has to exist and agree with the datapoints.
+    """
+    hourly = TimeGrid.from_datapoints(docs, start, end).daily_hourly_means()
+    days = sorted({doc["timestamp"].strftime("%Y-%m-%d") for doc in docs})
+    mismatches = []
+    for day in days:
+        expected = rollup_values(hourly[day])
+        for garage_id in GARAGE_IDS:
+            rollup = await storage.get_rollup(day, garage_id)
+            if rollup is None:
+                mismatches.append(f"{day} garage {garage_id}: no rollup")
+            elif rollup["values"] != expected[garage_id - 1]:
+                mismatches.append(f"{day} garage {garage_id}: rollup differs from the datapoints")
+    return mismatches
+
+
+async def compact_month(
+    storage: Storage, month: datetime, dry_run: bool = False, directory: Path = ARCHIVE_DIRECTORY
+) -> Dict[str, Any]:
+    """
+    Archive, compact and delete the raw datapoints of one month.
+
+    Returns:
+        Dict with the month, the datapoints and hours involved and the reason it was skipped (if it was)
+    """
+    end = add_months(month, 1)
+    stats: Dict[str, Any] = {"month": f"{month:%Y-%m}", "datapoints": 0, "hours": 0, "deleted": 0, "skipped": None}
+    docs = await storage.get_datapoints(month, end)
+    stats["datapoints"] = len(docs)
+    if not docs:
+        return stats
+
+    mismatches = await rollup_mismatches(storage, docs, month, end)
+    if mismatches:
+        stats["skipped"] = f"{len(mismatches)} rollups don't match, e.g. {mismatches[0]}"
+        return stats
+
+    compacted = compact_hours(docs)
+    stats["hours"] = len(compacted)
+    if dry_run:
+        return stats
+
+    write_archive(month, docs, directory)
+    archived = {(doc["metadata"], doc["timestamp"]) for doc in read_archive(month, directory)}
+    if any((doc["metadata"], doc["timestamp"]) not in archived for doc in docs):
+        stats["skipped"] = "archive is missing datapoints after writing it"
+        return stats
+
+    await storage.replace_compacted(compacted)
+    stats["deleted"] = await storage.delete_datapoints(month, end)
+    return stats
+
+
+async def apply_retention(
+    storage: Storage,
+    months: int = RETENTION_MONTHS,
+    dry_run: bool = False,
+    now: Optional[datetime] = None,
+    directory: Path = ARCHIVE_DIRECTORY
+) -> List[Dict[str, Any]]:
+    """
+    Compact every month of raw datapoints before the retention cutoff, oldest first.
+
+    Returns:
+        List of the compact_month stats of each month
+    """
+    cutoff = retention_cutoff(months, now)
+    oldest = await storage.get_oldest_timestamp()
+    results = []
+    month = datetime(oldest.year, oldest.month, 1) if oldest else cutoff
+    while month < cutoff:
+        stats = await compact_month(storage, month, dry_run, directory)
+        if stats["datapoints"]:
+            status = f"skipped, {stats['skipped']}" if stats["skipped"] else (
+                "would compact" if dry_run else f"archived and deleted {stats['deleted']}"
+            )
+            print(f"Retention {stats['month']}: {stats['datapoints']} datapoints -> {stats['hours']} hours, {status}")
+        results.append(stats)
+        month = add_months(month, 1)
+    return results
+
+
+async def retention_loop(storage: Storage, interval: float = RETENTION_INTERVAL) -> None:
+    """Apply the retention policy every `interval` seconds (run as a background task)"""
+    while True:
+        try:
+            await apply_retention(storage)
+        except Exception as e:
+            # Nothing is deleted before it is archived, the next run retries
+            print(f"Retention run failed: {e}")
+        await asyncio.sleep(interval)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Archive and compact raw datapoints older than the retention period")
+    parser.add_argument("--months", type=int, default=RETENTION_MONTHS, help="Months of raw datapoints to keep")
+    parser.add_argument("--backend", choices=["mongo", "sqlite", "memory"], help="Storage backend (default: STORAGE_BACKEND)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be compacted")
+    args = parser.parse_args()
+
+    storage = create_storage(args.backend)
+    await storage.init()
+    try:
+        results = await apply_retention(storage, args.months, args.dry_run)
+    finally:
+        await storage.close()
+    compacted = [stats for stats in results if stats["datapoints"] and not stats["skipped"]]
+    print(f"{len(compacted)} months {'to compact' if args.dry_run else 'compacted'}, "
+          f"{sum(1 for stats in results if stats['skipped'])} skipped")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,303 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from data.storage.base import COMPACTED_FIELDS, METADATA, STATUS_FIELDS, Storage
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS datapoints (
+    metadata TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    south_status INTEGER,
+    west_status INTEGER,
+    north_status INTEGER,
+    south_campus_status INTEGER,
+    PRIMARY KEY (metadata, timestamp)
+);
+CREATE INDEX IF NOT EXISTS datapoints_timestamp ON datapoints (timestamp);
+CREATE TABLE IF NOT EXISTS datapoints_hourly (
+    metadata TEXT NOT NULL,
+    hour TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    {compacted_columns},
+    PRIMARY KEY (metadata, hour)
+);
+CREATE TABLE IF NOT EXISTS hourly_aggregates (
+    day TEXT NOT NULL,
+    garage_id INTEGER NOT NULL,
+    hourly_values TEXT NOT NULL,
+    complete INTEGER NOT NULL,
+    PRIMARY KEY (day, garage_id)
+);
+CREATE INDEX IF NOT EXISTS hourly_aggregates_complete_day ON hourly_aggregates (complete, day);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS average_fullness (
+    garage TEXT PRIMARY KEY,
+    averages TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS predictions (
+    origin TEXT NOT NULL,
+    garage TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    forecast_values TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (origin, garage, kind)
+);
+""".format(compacted_columns=",\n    ".join(f"{column} REAL" for column in COMPACTED_FIELDS))
+
+_DATAPOINT_COLUMNS = ["metadata", "timestamp"] + STATUS_FIELDS
+_COMPACTED_COLUMNS = ["metadata", "hour", "count"] + COMPACTED_FIELDS
+
+
+def _encode_time(value: datetime) -> str:
+    # Fixed width so that text order is chronological order
+    return value.isoformat(sep=" ", timespec="microseconds")
+
+
+def _decode_time(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def _row_to_datapoint(row: sqlite3.Row) -> Dict[str, Any]:
+    doc = dict(zip(_DATAPOINT_COLUMNS, row))
+    doc["timestamp"] = _decode_time(doc["timestamp"])
+    return doc
+
+
+class SQLiteStorage(Storage):
+    """
+    Storage backed by a local SQLite file.
+
+    The connection is shared between worker threads and serialized with a lock,
+    so blocking queries never run on the event loop.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str | Path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        return self._conn
+
+    async def _run(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        def locked():
+            with self._lock:
+                conn = self._connect()
+                result = fn(conn)
+                conn.commit()
+                return result
+        return await asyncio.to_thread(locked)
+
+    async def init(self) -> None:
+        await self._run(lambda conn: conn.executescript(_SCHEMA))
+
+    async def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ── DATAPOINTS ──────────────────────────────────────────────────────────────
+    async def insert_datapoints(self, docs: List[Dict[str, Any]]) -> int:
+        rows = [
+            (doc["metadata"], _encode_time(doc["timestamp"]), *(doc[field] for field in STATUS_FIELDS))
+            for doc in docs
+        ]
+
+        def insert(conn: sqlite3.Connection) -> int:
+            before = conn.total_changes
+            conn.executemany(
+                f"INSERT OR IGNORE INTO datapoints ({', '.join(_DATAPOINT_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            return conn.total_changes - before
+        return await self._run(insert)
+
+    async def get_datapoint(self, timestamp: datetime) -> Optional[Dict[str, Any]]:
+        row = await self._run(lambda conn: conn.execute(
+            f"SELECT {', '.join(_DATAPOINT_COLUMNS)} FROM datapoints WHERE timestamp = ?",
+            (_encode_time(timestamp),)
+        ).fetchone())
+        return _row_to_datapoint(row) if row else None
+
+    async def get_latest_timestamp(self) -> Optional[datetime]:
+        row = await self._run(lambda conn: conn.execute("SELECT MAX(timestamp) FROM datapoints").fetchone())
+        return _decode_time(row[0]) if row and row[0] else None
+
+    async def get_oldest_timestamp(self) -> Optional[datetime]:
+        row = await self._run(lambda conn: conn.execute("SELECT MIN(timestamp) FROM datapoints").fetchone())
+        return _decode_time(row[0]) if row and row[0] else None
+
+    async def get_datapoints(
+        self, start: datetime, end: datetime, metadata: str = METADATA
+    ) -> List[Dict[str, Any]]:
+        rows = await self._run(lambda conn: conn.execute(
+            f"SELECT {', '.join(_DATAPOINT_COLUMNS)} FROM datapoints "
+            "WHERE metadata = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp",
+            (metadata, _encode_time(start), _encode_time(end))
+        ).fetchall())
+        return [_row_to_datapoint(row) for row in rows]
+
+    async def get_recent_datapoints(
+        self, before: datetime, limit: int, metadata: str = METADATA
+    ) -> List[Dict[str, Any]]:
+        rows = await self._run(lambda conn: conn.execute(
+            f"SELECT {', '.join(_DATAPOINT_COLUMNS)} FROM datapoints "
+            "WHERE metadata = ? AND timestamp < ? ORDER BY timestamp DESC LIMIT ?",
+            (metadata, _encode_time(before), limit)
+        ).fetchall())
+        return [_row_to_datapoint(row) for row in reversed(rows)]
+
+    async def delete_datapoints(self, start: datetime, end: datetime, metadata: str = METADATA) -> int:
+        return await self._run(lambda conn: conn.execute(
+            "DELETE FROM datapoints WHERE metadata = ? AND timestamp >= ? AND timestamp < ?",
+            (metadata, _encode_time(start), _encode_time(end))
+        ).rowcount)
+
+    async def get_datapoint_days(self) -> List[str]:
+        rows = await self._run(lambda conn: conn.execute(
+            "SELECT DISTINCT substr(timestamp, 1, 10) FROM datapoints ORDER BY 1"
+        ).fetchall())
+        return [row[0] for row in rows]
+
+    async def get_hourly_means(
+        self, start: datetime, end: datetime, status_field: str
+    ) -> Dict[int, float]:
+        if status_field not in STATUS_FIELDS:
+            raise ValueError(f"Invalid status field: {status_field}")
+        rows = await self._run(lambda conn: conn.execute(
+            f"SELECT CAST(substr(timestamp, 12, 2) AS INTEGER) AS hour, AVG({status_field}) FROM datapoints "
+            "WHERE metadata = ? AND timestamp >= ? AND timestamp < ? GROUP BY hour ORDER BY hour",
+            (METADATA, _encode_time(start), _encode_time(end))
+        ).fetchall())
+        return {hour: value for hour, value in rows}
+
+    # ── COMPACTED DATAPOINTS ────────────────────────────────────────────────────
+    async def replace_compacted(self, docs: List[Dict[str, Any]]) -> None:
+        rows = [
+            (doc["metadata"], _encode_time(doc["hour"]), *(doc[column] for column in _COMPACTED_COLUMNS[2:]))
+            for doc in docs
+        ]
+        await self._run(lambda conn: conn.executemany(
+            f"INSERT OR REPLACE INTO datapoints_hourly ({', '.join(_COMPACTED_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(_COMPACTED_COLUMNS))})",
+            rows
+        ))
+
+    async def get_compacted(
+        self, start: datetime, end: datetime, metadata: str = METADATA
+    ) -> List[Dict[str, Any]]:
+        rows = await self._run(lambda conn: conn.execute(
+            f"SELECT {', '.join(_COMPACTED_COLUMNS)} FROM datapoints_hourly "
+            "WHERE metadata = ? AND hour >= ? AND hour < ? ORDER BY hour",
+            (metadata, _encode_time(start), _encode_time(end))
+        ).fetchall())
+        docs = [dict(zip(_COMPACTED_COLUMNS, row)) for row in rows]
+        for doc in docs:
+            doc["hour"] = _decode_time(doc["hour"])
+        return docs
+
+    # ── HOURLY ROLLUPS ──────────────────────────────────────────────────────────
+    async def get_rollup(self, day: str, garage_id: int) -> Optional[Dict[str, Any]]:
+        row = await self._run(lambda conn: conn.execute(
+            "SELECT day, garage_id, hourly_values, complete FROM hourly_aggregates WHERE day = ? AND garage_id = ?",
+            (day, garage_id)
+        ).fetchone())
+        return self._row_to_rollup(row) if row else None
+
+    async def replace_rollup(self, doc: Dict[str, Any]) -> None:
+        await self._run(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO hourly_aggregates (day, garage_id, hourly_values, complete) VALUES (?, ?, ?, ?)",
+            (doc["day"], doc["garage_id"], json.dumps(doc["values"]), int(doc["complete"]))
+        ))
+
+    async def delete_rollups(self, day: str) -> None:
+        await self._run(lambda conn: conn.execute("DELETE FROM hourly_aggregates WHERE day = ?", (day,)))
+
+    async def get_complete_rollups(self) -> List[Dict[str, Any]]:
+        rows = await self._run(lambda conn: conn.execute(
+            "SELECT day, garage_id, hourly_values, complete FROM hourly_aggregates WHERE complete = 1"
+        ).fetchall())
+        return [self._row_to_rollup(row) for row in rows]
+
+    async def get_latest_complete_day(self) -> Optional[str]:
+        row = await self._run(lambda conn: conn.execute(
+            "SELECT MAX(day) FROM hourly_aggregates WHERE complete = 1"
+        ).fetchone())
+        return row[0] if row else None
+
+    async def get_rollup_days(self) -> List[str]:
+        rows = await self._run(lambda conn: conn.execute(
+            "SELECT DISTINCT day FROM hourly_aggregates ORDER BY day"
+        ).fetchall())
+        return [row[0] for row in rows]
+
+    @staticmethod
+    def _row_to_rollup(row) -> Dict[str, Any]:
+        day, garage_id, values, complete = row
+        return {"day": day, "garage_id": garage_id, "values": json.loads(values), "complete": bool(complete)}
+
+    # ── LEASES ──────────────────────────────────────────────────────────────────
+    async def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        # Wall clock, every process sharing the file runs on the same host
+        now = time.time()
+        return await self._run(lambda conn: conn.execute(
+            "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE leases.owner = excluded.owner OR leases.expires_at < ?",
+            (name, owner, now + ttl, now)
+        ).rowcount == 1)
+
+    async def release_lease(self, name: str, owner: str) -> None:
+        await self._run(lambda conn: conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner)))
+
+    # ── AVERAGES ────────────────────────────────────────────────────────────────
+    async def save_averages(self, garage: str, averages: List[List[int]]) -> None:
+        await self._run(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO average_fullness (garage, averages, updated_at) VALUES (?, ?, ?)",
+            (garage, json.dumps(averages), _encode_time(datetime.now()))
+        ))
+
+    async def get_averages(self, garage: str) -> Optional[List[List[int]]]:
+        row = await self._run(lambda conn: conn.execute(
+            "SELECT averages FROM average_fullness WHERE garage = ?", (garage,)
+        ).fetchone())
+        return json.loads(row[0]) if row else None
+
+    # ── FORECASTS ───────────────────────────────────────────────────────────────
+    async def save_forecast(
+        self, origin: datetime, garage: str, values: List[Any], kind: str = "hourly"
+    ) -> None:
+        await self._run(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO predictions (origin, garage, kind, forecast_values, created_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (_encode_time(origin), garage, kind, json.dumps(values), _encode_time(datetime.now()))
+        ))
+
+    async def get_forecast(
+        self, origin: datetime, garage: str, kind: str = "hourly"
+    ) -> Optional[List[Any]]:
+        row = await self._run(lambda conn: conn.execute(
+            "SELECT forecast_values FROM predictions WHERE origin = ? AND garage = ? AND kind = ?",
+            (_encode_time(origin), garage, kind)
+        ).fetchone())
+        return json.loads(row[0]) if row else None
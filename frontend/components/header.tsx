@@ -1,7 +1,7 @@
 "use client"
 
 import { useState, useEffect } from "react"
-import { getLatestUpdate, getWeather } from "@/lib/data"
+import { getLatestUpdate, getWeather, openUpdateStream } from "@/lib/data"
 
 export default function Header() {
   const [lastUpdated, setLastUpdated] = useState<string>("")
@@ -22,9 +22,18 @@ export default function Header() {
     }
     
     fetchLastUpdated()
-    // Update every minute
-    const interval = setInterval(fetchLastUpdated, 60000)
-    return () => clearInterval(interval)
+    // The API pushes every new datapoint instead of us polling for it
+    const stream = openUpdateStream()
+    stream.addEventListener("datapoint", (event) => {
+      const { timestamp } = JSON.parse((event as MessageEvent).data)
+      setLastUpdated(new Date(timestamp).toLocaleString())
+      setUpdateError(false)
+    })
+    stream.onerror = () => {
+      // EventSource retries on its own; only report it once the connection is given up
+      if (stream.readyState === EventSource.CLOSED) setUpdateError(true)
+    }
+    return () => stream.close()
   }, [])
 
   useEffect(() => {
@@ -213,6 +213,12 @@ export async function getLatestUpdate(): Promise<string> {
   }
 }
 
+// Open the API's live update stream (server-sent events: "datapoint", "hourly", "predictions").
+// EventSource reconnects by itself and the stream starts with the latest event of each type.
+export function openUpdateStream(): EventSource {
+  return new EventSource(`${API_BASE_URL}/stream`)
+}
+
 export async function getPredictions(garage: string): Promise<number[]> {
   const response = await fetch(`${API_BASE_URL}/predictions/${garage}`);
   if (!response.ok) throw new Error('Failed to fetch predictions');
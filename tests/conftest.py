@@ -0,0 +1,28 @@
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from data.standalone_logger.fixture_server import FixtureState, create_server
+
+
+@pytest.fixture
+def fixture_server():
+    """Local status page on a free port, stopped after the test"""
+    servers = []
+
+    def start(state: FixtureState):
+        server = create_server(port=0, state=state)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
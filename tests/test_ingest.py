@@ -0,0 +1,228 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+import requests
+
+from data.standalone_logger import ingest
+from data.standalone_logger.fixture_server import GARAGES, FixtureState
+from data.standalone_logger.ingest import IngestService, Spool, make_datapoint, parse_page
+from data.storage import STATUS_FIELDS
+from data.storage.memory import MemoryStorage
+
+START = datetime(2025, 1, 6)
+
+
+def datapoints(count: int):
+    return [make_datapoint((10, 20, 30, i), START + timedelta(minutes=10 * i)) for i in range(count)]
+
+
+def fetch(url: str) -> requests.Response:
+    return requests.get(url, timeout=5)
+
+
+class FullState(FixtureState):
+    """Every garage stays at 100%, which the page shows as "Full" """
+
+    def __init__(self):
+        super().__init__()
+        self.values = [100] * len(GARAGES)
+        self.random.randint = lambda low, high: high
+
+
+class FlakyStorage(MemoryStorage):
+    """Stores each batch but fails the first `failures` calls afterwards, like a lost acknowledgement"""
+
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+        self.calls = 0
+
+    async def insert_datapoints(self, docs):
+        self.calls += 1
+        inserted = await super().insert_datapoints(docs)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("connection reset")
+        return inserted
+
+
+# ── PARSING ─────────────────────────────────────────────────────────────────────
+def test_parse_page_reads_full_as_100(fixture_server):
+    url = fixture_server(FullState())
+    assert parse_page(fetch(url).text) == (100, 100, 100, 100)
+
+
+def test_parse_page_reads_percentages(fixture_server):
+    state = FixtureState(seed=1)
+    url = fixture_server(state)
+    values = parse_page(fetch(url).text)
+    assert values == tuple(state.values)
+
+
+def test_parse_page_rejects_unparseable_page(fixture_server):
+    url = fixture_server(FixtureState(fail_every=1))
+    response = fetch(url)
+    assert response.status_code == 200
+    assert parse_page(response.text) is None
+
+
+def test_parse_page_rejects_error_page(fixture_server):
+    url = fixture_server(FixtureState(error_every=1))
+    response = fetch(url)
+    assert response.status_code == 503
+    assert parse_page(response.text) is None
+
+
+def test_sample_skips_unparseable_page_and_raises_on_error(fixture_server, tmp_path):
+    spool = Spool(tmp_path / "spool.jsonl")
+    service = IngestService(MemoryStorage(), spool, fixture_server(FixtureState(fail_every=1)), notify_url=None)
+    assert asyncio.run(service.sample()) is None
+    assert spool.pending_bytes == 0
+
+    service.url = fixture_server(FixtureState(error_every=1))
+    with pytest.raises(requests.HTTPError):
+        asyncio.run(service.sample())
+    assert spool.pending_bytes == 0
+
+
+# ── SPOOL ───────────────────────────────────────────────────────────────────────
+def test_spool_drops_torn_line(tmp_path):
+    path = tmp_path / "spool.jsonl"
+    spool = Spool(path)
+    for doc in datapoints(2):
+        spool.append(doc)
+    with open(path, "a") as f:
+        f.write('{"timestamp": "2025-01-06T00:2')
+
+    spool = Spool(path)
+    spool.append(datapoints(3)[2])
+    docs, _ = spool.pending()
+    assert [doc["timestamp"] for doc in docs] == [doc["timestamp"] for doc in datapoints(3)]
+
+
+def test_spool_resumes_after_committed_offset(tmp_path):
+    path = tmp_path / "spool.jsonl"
+    spool = Spool(path)
+    for doc in datapoints(3):
+        spool.append(doc)
+    docs, offset = spool.pending(limit=2)
+    assert len(docs) == 2
+    spool.commit(offset)
+
+    spool = Spool(path)
+    docs, _ = spool.pending()
+    assert docs == datapoints(3)[2:]
+
+
+def test_spool_truncates_once_fully_flushed(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "SPOOL_COMPACT_BYTES", 0)
+    path = tmp_path / "spool.jsonl"
+    spool = Spool(path)
+    for doc in datapoints(3):
+        spool.append(doc)
+
+    # Partly flushed spools are kept
+    _, offset = spool.pending(limit=1)
+    spool.commit(offset)
+    assert path.stat().st_size > 0
+
+    _, offset = spool.pending()
+    spool.commit(offset)
+    assert path.stat().st_size == 0
+    assert spool.offset == 0
+    assert Spool(path).pending() == ([], 0)
+
+
+def test_spool_clamps_offset_past_end(tmp_path):
+    # A crash between truncating the spool and resetting the offset
+    path = tmp_path / "spool.jsonl"
+    Spool(path).append(datapoints(1)[0])
+    (tmp_path / "spool.jsonl.offset").write_text("1000000")
+    path.write_text("")
+
+    spool = Spool(path)
+    assert spool.offset == 0
+    spool.append(datapoints(1)[0])
+    assert len(spool.pending()[0]) == 1
+
+
+# ── FLUSH ───────────────────────────────────────────────────────────────────────
+def stored(storage: MemoryStorage):
+    return asyncio.run(storage.get_datapoints(START, START + timedelta(days=1)))
+
+
+def test_flush_retry_does_not_duplicate(tmp_path):
+    storage = FlakyStorage(failures=1)
+    spool = Spool(tmp_path / "spool.jsonl")
+    for doc in datapoints(5):
+        spool.append(doc)
+    service = IngestService(storage, spool, batch_size=2, notify_url=None)
+
+    # The first batch is stored but the call fails, so the spool offset stays put
+    with pytest.raises(ConnectionError):
+        asyncio.run(service.flush())
+    assert spool.pending_bytes == spool.path.stat().st_size
+
+    # Re-sending the first batch inserts nothing new
+    assert asyncio.run(service.flush()) == 3
+    assert spool.pending_bytes == 0
+    assert [doc["timestamp"] for doc in stored(storage)] == [doc["timestamp"] for doc in datapoints(5)]
+
+
+def test_flush_loop_backs_off_until_storage_recovers(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "BACKOFF_INITIAL", 0.01)
+    storage = FlakyStorage(failures=3)
+    spool = Spool(tmp_path / "spool.jsonl")
+    for doc in datapoints(4):
+        spool.append(doc)
+    service = IngestService(storage, spool, batch_size=10, notify_url=None)
+
+    async def run():
+        flusher = asyncio.create_task(service.flush_loop())
+        try:
+            await asyncio.wait_for(_drained(spool), timeout=5)
+        finally:
+            flusher.cancel()
+
+    asyncio.run(run())
+    assert storage.calls == 4
+    assert len(stored(storage)) == 4
+
+
+async def _drained(spool: Spool):
+    while spool.pending_bytes:
+        await asyncio.sleep(0.01)
+
+
+def test_poll_loop_keeps_sampling_after_spool_error(fixture_server, tmp_path):
+    spool = Spool(tmp_path / "spool.jsonl")
+    append = spool.append
+    failures = [OSError("No space left on device")]
+
+    def flaky_append(doc):
+        if failures:
+            raise failures.pop()
+        append(doc)
+
+    spool.append = flaky_append
+    service = IngestService(MemoryStorage(), spool, fixture_server(FixtureState(seed=3)), interval=0, notify_url=None)
+    asyncio.run(service.poll_loop(samples=2))
+    assert not failures
+    assert len(spool.pending()[0]) == 2
+
+
+def test_run_polls_fixture_page_into_storage(fixture_server, tmp_path):
+    state = FixtureState(seed=2, fail_every=3)
+    storage = MemoryStorage()
+    service = IngestService(
+        storage, Spool(tmp_path / "spool.jsonl"), fixture_server(state),
+        interval=0, retry_interval=0, notify_url=None
+    )
+    asyncio.run(service.run(samples=4))
+
+    docs = asyncio.run(storage.get_datapoints(datetime.min, datetime.max))
+    assert len(docs) == 4
+    # Every third request served a page that didn't parse
+    assert state.requests == 5
+    assert [doc[STATUS_FIELDS[0]] for doc in docs][-1] == state.values[0]
@@ -0,0 +1,10 @@
+import asyncio
+
+from data.storage.query_plans import check_query_plans
+
+
+def test_sqlite_queries_use_indexes():
+    results = asyncio.run(check_query_plans("sqlite", days=14))
+    assert results
+    scans = [f"{result.operation}: {result.query} ({', '.join(result.scans)})" for result in results if not result.allowed]
+    assert scans == []